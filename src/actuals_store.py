@@ -0,0 +1,326 @@
+# 📦 actuals_store.py
+# Actual race results per round (classification, DNFs, penalties) and cached per-round model scores
+#
+#   python cli.py actuals --seasons 2025 --rounds 1-12     # record from FastF1 and score
+#   python cli.py actuals --source store --seasons 2022-2025
+#
+# Results are recorded once per round, the first time a classified race is loaded,
+# into a season-partitioned store like the feature store. Scoring joins
+# predictions and results on the driver ID (names only for old rows that have none),
+# and every round's metrics are cached per model version, so accuracy views never
+# reload a session. Backfill workers, the app and live polling may write at the same
+# time: every read-modify-write holds the store's (or the metrics') file lock and
+# swaps the new file in with os.replace.
+
+import os
+import re
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from backtest import METRICS, score_race
+from cache_manager import file_lock, lock_path
+from feature_store import load_features, normalize_names, write_rounds
+from monte_carlo import FINISHED_STATUS
+
+# === Config ===
+ACTUALS_DIR = '../data/actuals'
+METRICS_DIR = '../data/actuals/_metrics'  # '_' paths are skipped by the results dataset
+
+ACTUALS_SCHEMA = pa.schema([
+    ('driver_id', pa.dictionary(pa.int16(), pa.string())),
+    ('abbreviation', pa.dictionary(pa.int16(), pa.string())),
+    ('driver', pa.dictionary(pa.int16(), pa.string())),
+    ('constructor', pa.dictionary(pa.int16(), pa.string())),
+    ('grid', pa.float64()),
+    ('quali_position', pa.float64()),
+    ('position', pa.float64()),
+    ('classified', pa.dictionary(pa.int8(), pa.string())),
+    ('status', pa.dictionary(pa.int16(), pa.string())),
+    ('dnf', pa.bool_()),
+    ('points', pa.float64()),
+    ('grid_penalty', pa.float64()),
+    ('time_penalty', pa.float64()),
+])
+ACTUALS_COLUMNS = ['season', 'round'] + ACTUALS_SCHEMA.names
+
+# ClassifiedPosition codes for drivers without a finishing position
+UNCLASSIFIED = {'R': 'retired', 'D': 'disqualified', 'E': 'excluded', 'W': 'withdrawn',
+                'F': 'failed to qualify', 'N': 'not classified'}
+TIME_PENALTY = re.compile(r'(\d+) SECOND TIME PENALTY FOR CAR \d+ \((\w+)\)')
+
+
+# ---------------------- extract ----------------------
+
+def _finalize(actuals):
+    # Columns every source fills the same way
+    status = actuals['status'].astype(object)
+    actuals['dnf'] = actuals['position'].isna() | (status.notna() & ~status.astype(str).str.match(FINISHED_STATUS))
+    # Pit-lane starters (grid 0) count from the back of the grid
+    grid = actuals['grid'].where(actuals['grid'] > 0, len(actuals))
+    actuals['grid_penalty'] = (grid - actuals['quali_position']).clip(lower=0)
+    actuals = normalize_names(actuals)
+    # Without a source ID the normalized name is the most stable key available
+    actuals['driver_id'] = actuals['driver_id'].fillna(actuals['driver'])
+    return actuals[ACTUALS_COLUMNS]
+
+
+def time_penalties(session_r):
+    """Seconds of time penalties per abbreviation from race control, or None if messages are not loaded."""
+    try:
+        messages = session_r.race_control_messages
+    except Exception:  # DataNotLoadedError when the session was loaded without messages
+        return None
+    found = messages['Message'].astype(str).str.extract(TIME_PENALTY).dropna()
+    return found[0].astype(float).groupby(found[1]).sum()
+
+
+def actuals_from_sessions(season, round_no, session_r, session_q=None):
+    """Final classification of a loaded race session, with qualifying position and penalties."""
+    results = session_r.results
+    actuals = pd.DataFrame({
+        'season': season,
+        'round': round_no,
+        'driver_id': results['DriverId'].values,
+        'abbreviation': results['Abbreviation'].values,
+        'driver': results['FullName'].values,
+        'constructor': results['TeamName'].values,
+        'grid': results['GridPosition'].values.astype('float64'),
+        'position': results['Position'].values.astype('float64'),
+        'classified': results['ClassifiedPosition'].astype(str).values,
+        'status': results['Status'].values,
+        'points': results['Points'].values.astype('float64'),
+    })
+    # Position is set for retired-but-classified drivers; only a numeric classification counts
+    actuals.loc[~actuals['classified'].str.isdigit(), 'position'] = np.nan
+
+    quali = None if session_q is None else session_q.results.set_index('Abbreviation')['Position']
+    actuals['quali_position'] = actuals['abbreviation'].map(quali) if quali is not None else np.nan
+    penalties = time_penalties(session_r)
+    actuals['time_penalty'] = np.nan if penalties is None else actuals['abbreviation'].map(penalties).fillna(0.0)
+    return _finalize(actuals)
+
+
+def actuals_from_rounds(rounds):
+    """Results of stored / cached round rows (feature store or load_round frames); no penalty data."""
+    actuals = rounds.copy()
+    for col in ('driver_id', 'abbreviation', 'points', 'quali_position', 'time_penalty'):
+        if col not in actuals.columns:
+            actuals[col] = np.nan
+    for col in ('driver_id', 'abbreviation', 'driver', 'constructor', 'status'):
+        actuals[col] = actuals[col].astype(object)
+    actuals['classified'] = actuals['position'].map(lambda p: str(int(p)) if pd.notna(p) else 'R')
+    return _finalize(actuals)
+
+
+# ---------------------- results store ----------------------
+
+def load_actuals(seasons=None, rounds=None, store_dir=ACTUALS_DIR):
+    if not os.path.isdir(store_dir):
+        return pd.DataFrame(columns=ACTUALS_COLUMNS)
+    actuals = load_features(seasons=seasons, rounds=rounds, store_dir=store_dir)
+    if actuals.empty:
+        return pd.DataFrame(columns=ACTUALS_COLUMNS)
+    for col in ('driver_id', 'abbreviation', 'driver', 'constructor', 'classified', 'status'):
+        actuals[col] = actuals[col].astype(object)
+    return actuals
+
+
+def round_actuals(season, round_no, store_dir=ACTUALS_DIR):
+    """Recorded results of one round, or None before the race is classified."""
+    actuals = load_actuals([season], [round_no], store_dir)
+    return actuals if len(actuals) else None
+
+
+def record_actuals(actuals, store_dir=ACTUALS_DIR, metrics_dir=METRICS_DIR, snapshot_dir=None):
+    """Store the results of the rounds in `actuals`; a round whose results changed loses its cached scores.
+
+    Returns the (season, round) keys that were written. `snapshot_dir` defaults to
+    snapshot_store.SNAPSHOT_DIR.
+    """
+    from snapshot_store import SNAPSHOT_DIR, drop_snapshots
+
+    actuals = actuals[actuals.groupby(['season', 'round'])['position'].transform(lambda p: p.notna().any())]
+    written = []
+    for (season, round_no), new in actuals.groupby(['season', 'round'], sort=True):
+        with file_lock(lock_path('actuals', store_dir)):
+            old = round_actuals(season, round_no, store_dir)
+            if old is not None and _same(old, new):
+                continue
+            write_rounds(new, store_dir, schema=ACTUALS_SCHEMA)
+        drop_metrics(season, round_no, metrics_dir)
+        drop_snapshots(season, round_no, snapshot_dir or SNAPSHOT_DIR)
+        written.append((int(season), int(round_no)))
+    return written
+
+
+def _same(old, new):
+    # Both sides in the stored types (dictionary columns as plain strings), so 3 and
+    # 3.0 or None and NaN compare equal while a real change in any column does not
+    cols = ['driver_id', 'grid', 'position', 'classified', 'status', 'time_penalty']
+    schema = pa.schema([(f.name, f.type.value_type if pa.types.is_dictionary(f.type) else f.type)
+                        for f in (ACTUALS_SCHEMA.field(c) for c in cols)])
+
+    def key(df):
+        df = df[cols].sort_values('driver_id', kind='mergesort').reset_index(drop=True)
+        for col in cols:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype(object)
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False).to_pandas(ignore_metadata=True)
+
+    return len(old) == len(new) and key(old).equals(key(new))
+
+
+# ---------------------- scoring ----------------------
+
+def attach_driver_ids(race, rounds):
+    """Add `driver_id` to a prediction from the round rows it was made from (same round, so names are unique)."""
+    if 'driver_id' in race.columns or 'driver_id' not in rounds.columns:
+        return race
+    ids = rounds.dropna(subset=['driver_id']).drop_duplicates('driver').set_index('driver')['driver_id']
+    return race.assign(driver_id=race['driver'].map(ids))
+
+
+def score_round(race_sorted, season, round_no, circuit=None):
+    """Metrics of one predicted round against its recorded results (unclassified drivers are not scored)."""
+    scored = race_sorted.assign(season=season, round=round_no, circuit=circuit, position=race_sorted['actual_position'])
+    row = score_race(scored)
+    row['dnfs'] = int(race_sorted['dnf'].fillna(False).astype(bool).sum()) if 'dnf' in race_sorted else 0
+    row['scored_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    return row
+
+
+def _metrics_path(model_key, metrics_dir=METRICS_DIR):
+    return os.path.join(metrics_dir, f"{model_key}.parquet")
+
+
+def load_metrics(model_key=None, metrics_dir=METRICS_DIR):
+    """Cached per-round metrics of one model version ('name@version'), or of every version."""
+    if not os.path.isdir(metrics_dir):
+        return pd.DataFrame(columns=['model', 'season', 'round', 'circuit', 'drivers'] + METRICS)
+    names = [f"{model_key}.parquet"] if model_key else sorted(n for n in os.listdir(metrics_dir) if n.endswith('.parquet'))
+    frames = [pd.read_parquet(os.path.join(metrics_dir, name)) for name in names
+              if os.path.exists(os.path.join(metrics_dir, name))]
+    if not frames:
+        return pd.DataFrame(columns=['model', 'season', 'round', 'circuit', 'drivers'] + METRICS)
+    return pd.concat(frames, ignore_index=True).sort_values(['model', 'season', 'round']).reset_index(drop=True)
+
+
+def cached_metrics(model_key, season, round_no, metrics_dir=METRICS_DIR):
+    metrics = load_metrics(model_key, metrics_dir)
+    hit = metrics[(metrics['season'] == season) & (metrics['round'] == round_no)]
+    return hit.iloc[0].to_dict() if len(hit) else None
+
+
+def _write_metrics(metrics, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    metrics.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def save_metrics(model_key, rows, metrics_dir=METRICS_DIR):
+    """Insert or replace per-round metric rows of one model version."""
+    new = pd.DataFrame(rows).assign(model=model_key)
+    with file_lock(lock_path('metrics', metrics_dir)):
+        old = load_metrics(model_key, metrics_dir)
+        keys = set(zip(new['season'], new['round']))
+        old = old[[key not in keys for key in zip(old['season'], old['round'])]]
+        merged = pd.concat([old, new], ignore_index=True) if len(old) else new
+        _write_metrics(merged.sort_values(['season', 'round']), _metrics_path(model_key, metrics_dir))
+
+
+def drop_metrics(season, round_no, metrics_dir=METRICS_DIR):
+    # Results of a round changed (e.g. a post-race penalty): every model's score for it is stale
+    if not os.path.isdir(metrics_dir):
+        return
+    with file_lock(lock_path('metrics', metrics_dir)):
+        for name in os.listdir(metrics_dir):
+            if not name.endswith('.parquet'):
+                continue
+            path = os.path.join(metrics_dir, name)
+            metrics = pd.read_parquet(path)
+            keep = ~((metrics['season'] == season) & (metrics['round'] == round_no))
+            if not keep.all():
+                _write_metrics(metrics[keep], path)
+
+
+def leaderboard(metrics_dir=METRICS_DIR):
+    """Mean metrics per model version over the rounds it was scored on, best MAE first."""
+    metrics = load_metrics(metrics_dir=metrics_dir)
+    if metrics.empty:
+        return metrics
+    board = metrics.groupby('model').agg(rounds=('round', 'size'), **{m: (m, 'mean') for m in METRICS})
+    return board.sort_values('mae').reset_index()
+
+
+def score_stored_rounds(model, seasons=None, metrics_dir=METRICS_DIR, store_dir=ACTUALS_DIR):
+    """Score `model` on every round with recorded results (as-of features from the feature store)."""
+    from backtest import build_backtest_frame, predict_all
+    from prediction_service import merge_actuals
+
+    actuals = load_actuals(seasons, store_dir=store_dir)
+    if actuals.empty:
+        return pd.DataFrame()
+    recorded = set(zip(actuals['season'], actuals['round']))
+    frame = predict_all(model, build_backtest_frame(seasons))
+    frame = frame[[key in recorded for key in zip(frame['season'], frame['round'])]]
+
+    rows = []
+    for (season, round_no), race in frame.groupby(['season', 'round'], sort=True):
+        results = actuals[(actuals['season'] == season) & (actuals['round'] == round_no)]
+        race = merge_actuals(race.drop(columns=['position', 'status']), results)
+        rows.append(score_round(race, int(season), int(round_no), race['circuit'].iloc[0]))
+    model_key = f"{model.name}@{model.version}"
+    save_metrics(model_key, rows, metrics_dir)
+    return load_metrics(model_key, metrics_dir)
+
+
+# ---------------------- backfill ----------------------
+
+def backfill(seasons, rounds=None, source='fastf1', store_dir=ACTUALS_DIR):
+    """Record results for past rounds from FastF1 (with penalties) or from the feature store."""
+    if source == 'store':
+        return record_actuals(actuals_from_rounds(load_features(seasons=seasons, rounds=rounds)), store_dir)
+
+    from cache_manager import enable_cache
+    from lap_features import season_rounds
+    from session_loader import RaceDataUnavailable, load_round
+
+    enable_cache()
+    written = []
+    for season in seasons:
+        for round_no in rounds or season_rounds(season):
+            if round_actuals(season, round_no, store_dir) is not None:
+                continue
+            try:
+                round_df = load_round(season, round_no)  # records the results when it fetches the sessions
+            except RaceDataUnavailable:
+                print(f"⚠️ {season} round {round_no}: not available yet, skipped")
+                continue
+            if round_actuals(season, round_no, store_dir) is None:
+                record_actuals(actuals_from_rounds(round_df), store_dir)
+            written.append((season, round_no))
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from ranges import parse_range
+    from model_registry import load_bundle
+
+    parser = argparse.ArgumentParser(description="Record actual race results and score the model against them")
+    parser.add_argument('--seasons', default='2025')
+    parser.add_argument('--rounds', default=None, help="e.g. 1-8 (default: every completed round)")
+    parser.add_argument('--source', choices=['fastf1', 'store'], default='fastf1')
+    parser.add_argument('--model', default='position')
+    args = parser.parse_args()
+
+    seasons = parse_range(args.seasons)
+    written = backfill(seasons, parse_range(args.rounds) if args.rounds else None, args.source)
+    print(f"✅ Recorded results for {len(written)} round(s) in {ACTUALS_DIR}")
+    metrics = score_stored_rounds(load_bundle(args.model), seasons)
+    print(f"📊 Scored {len(metrics)} round(s)")
+    print(leaderboard().round(3).to_string(index=False))
@@ -0,0 +1,346 @@
+# 📦 api.py
+# HTTP prediction API (plain ASGI): grid + qualifying time + form + weather -> predicted_position
+#
+#   python cli.py serve --port 8000
+#   uvicorn api:app --port 8000                  # from src/
+#
+#   POST /predict        {"season": 2025, "round": 9, "race_date": "2025-06-29",
+#                         "grid": [{"driver": "Max Verstappen", "grid": 1, "qualifying_time": 84.9,
+#                                   "air_temp": 24.0, "track_temp": 41.0, "humidity": 50.0}, ...]}
+#   POST /predict/batch  {"races": [<predict body>, ...]}
+#   GET  /health
+#
+# `race_date`, `constructor` and the weather fields are optional. Concurrent requests
+# are micro-batched: the batcher collects the grids queued within BATCH_WINDOW, builds
+# each grid's features and scores all of them with a single model.predict call.
+# Responses are kept in an LRU cache keyed by (season, round, input hash), which is
+# cleared whenever the feature store changes.
+
+import asyncio
+import hashlib
+import json
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from prediction_service import HISTORY_SEASONS, MODEL_NAME, PredictionService, rank_predictions
+
+# === Config ===
+BATCH_WINDOW = 0.002  # seconds to wait for more requests once one is queued
+MAX_BATCH = 256  # grids per model.predict call
+CACHE_SIZE = 1024
+REFRESH_INTERVAL = 30.0  # seconds between feature store checks
+MAX_BODY = 1 << 20
+
+INPUT_COLUMNS = ['driver', 'constructor', 'grid', 'qualifying_time', 'air_temp', 'track_temp', 'humidity']
+REQUIRED_FIELDS = ['driver', 'grid', 'qualifying_time']
+NUMERIC_FIELDS = ['grid', 'qualifying_time', 'air_temp', 'track_temp', 'humidity']
+OUTPUT_COLUMNS = ['simulated_finish', 'driver', 'constructor', 'grid', 'predicted_position', 'driver_form', 'constructor_form']
+
+
+class BadRequest(ValueError):
+    """Raised for request bodies that cannot be turned into a grid; answered with a 400."""
+
+
+class RaceRequest:
+    """One validated grid to predict: rows in INPUT_COLUMNS order plus the cache key."""
+
+    def __init__(self, season, round_no, race_date, rows, key):
+        self.season = season
+        self.round_no = round_no
+        self.race_date = race_date
+        self.rows = rows
+        self.key = key
+
+
+def _number(entry, field):
+    value = entry.get(field)
+    if value is None:
+        return float('nan')
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise BadRequest(f"{field} must be a number, got {value!r}")
+    # json.loads accepts NaN / Infinity; a missing value is sent as null instead
+    if not math.isfinite(value):
+        raise BadRequest(f"{field} must be finite, got {value!r}")
+    if field == 'grid' and value != int(value):
+        raise BadRequest(f"grid must be a whole number, got {value!r}")
+    return float(value)
+
+
+def parse_race(body):
+    """Validate one /predict body into a RaceRequest (raises BadRequest).
+
+    Plain Python on purpose: this runs on the event loop for every request.
+    """
+    if not isinstance(body, dict):
+        raise BadRequest("expected a JSON object")
+    try:
+        season, round_no = int(body['season']), int(body['round'])
+        entries = body['grid']
+        race_date = pd.Timestamp(body['race_date']).normalize() if body.get('race_date') else None
+    except KeyError as exc:
+        raise BadRequest(f"missing field {exc}") from None
+    except (TypeError, ValueError) as exc:
+        raise BadRequest(f"bad season / round / race_date: {exc}") from None
+    if not isinstance(entries, list) or not entries or not all(isinstance(e, dict) for e in entries):
+        raise BadRequest("grid must be a non-empty list of objects")
+
+    rows = []
+    for entry in entries:
+        missing = [f for f in REQUIRED_FIELDS if entry.get(f) is None]
+        if missing:
+            raise BadRequest(f"grid entry {entry} is missing {missing}")
+        if not isinstance(entry['driver'], str):
+            raise BadRequest(f"driver must be a string, got {entry['driver']!r}")
+        constructor = entry.get('constructor')
+        rows.append((entry['driver'], constructor if isinstance(constructor, str) else None)
+                    + tuple(_number(entry, f) for f in NUMERIC_FIELDS))
+
+    # Same drivers and inputs in any order hit the same cache entry
+    canonical = json.dumps({'race_date': str(race_date), 'grid': sorted(json.dumps(row) for row in rows)}, separators=(',', ':'))
+    key = (season, round_no, hashlib.sha256(canonical.encode()).hexdigest())
+    return RaceRequest(season, round_no, race_date, rows, key)
+
+
+class LRUCache:
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        if key not in self._items:
+            return None
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+
+class PredictionAPI:
+    """ASGI app around a PredictionService, loaded once at startup and shared by every request."""
+
+    def __init__(self, model_name=MODEL_NAME, history_seasons=HISTORY_SEASONS, batch_window=BATCH_WINDOW,
+                 max_batch=MAX_BATCH, cache_size=CACHE_SIZE):
+        self.model_name = model_name
+        self.history_seasons = history_seasons
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.cache = LRUCache(cache_size)
+        self.service = None
+        self.stats = {'requests': 0, 'races': 0, 'cache_hits': 0, 'batches': 0, 'batched_races': 0}
+
+        self._queue = None
+        self._batcher = None
+        self._start_lock = None
+        self._checked = 0.0
+
+    # ---------------------- lifecycle ----------------------
+
+    async def startup(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.service is not None:
+                return
+            self.service = await asyncio.to_thread(self._load)
+            self._checked = time.monotonic()
+            self._queue = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._run_batcher())
+            print(f"✅ Serving {self.service.model!r}")
+
+    def _load(self):
+        # History, form index and the native model are all loaded before the first request
+        service = PredictionService(model_name=self.model_name, history_seasons=self.history_seasons)
+        model = service.model
+        model.predict(pd.DataFrame(0.0, index=[0], columns=model.features))
+        return service
+
+    async def shutdown(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+            self._batcher = None
+
+    # ---------------------- predict ----------------------
+
+    async def predict(self, race):
+        self.stats['races'] += 1
+        cached = self.cache.get(race.key)
+        if cached is not None:
+            self.stats['cache_hits'] += 1
+            return cached
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((race, future))
+        body = await future
+        self.cache.put(race.key, body)
+        return body
+
+    async def _run_batcher(self):
+        while True:
+            batch = [await self._queue.get()]
+            self._drain(batch)
+            if len(batch) < self.max_batch and self.batch_window > 0:
+                await asyncio.sleep(self.batch_window)
+                self._drain(batch)
+            try:
+                await self._refresh_if_due()
+                results = await asyncio.to_thread(self._score, [race for race, _ in batch])
+            except Exception:  # keep serving: score the races one by one so only a bad one fails
+                results = await asyncio.to_thread(self._score_each, [race for race, _ in batch])
+            self.stats['batches'] += 1
+            self.stats['batched_races'] += len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _drain(self, batch):
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _refresh_if_due(self):
+        # A new round in the store changes form features, so cached answers are dropped
+        if time.monotonic() - self._checked < REFRESH_INTERVAL:
+            return
+        self._checked = time.monotonic()
+        if await asyncio.to_thread(self.service.refresh_if_stale):
+            self.cache.clear()
+
+    def _score_each(self, races):
+        results = []
+        for race in races:
+            try:
+                results.extend(self._score([race]))
+            except Exception as exc:
+                results.append(exc)
+        return results
+
+    def _score(self, races):
+        """Encoded response for each race, from one feature pass and one model.predict call."""
+        grid = pd.DataFrame([row for race in races for row in race.rows], columns=INPUT_COLUMNS)
+        grid.insert(0, 'race', np.repeat(np.arange(len(races)), [len(race.rows) for race in races]))
+        missing = grid['constructor'].isna().values
+        if missing.any():
+            # Seat on the race date from the entity index
+            for i in np.unique(grid['race'].values[missing]):
+                race, rows = races[i], missing & (grid['race'].values == i)
+                date = race.race_date or self.service.forms.race_date(race.season, race.round_no)
+                grid.loc[rows, 'constructor'] = self.service.forms.constructor_of(grid.loc[rows, 'driver'], date)
+
+        keys = [(race.season, race.round_no, race.race_date) for race in races]
+        features = self.service.build_features_many(grid, keys)
+        ranked = rank_predictions(features, self.service.model.predict(features), by='race')
+
+        model = self.service.model
+        records = json.loads(ranked[OUTPUT_COLUMNS].to_json(orient='records'))
+        bounds = np.searchsorted(ranked['race'].values, np.arange(len(races) + 1))
+        return [
+            json.dumps({
+                'season': race.season,
+                'round': race.round_no,
+                'model': f"{model.name}@{model.version}",
+                'prediction': records[bounds[i]:bounds[i + 1]],
+            }).encode()
+            for i, race in enumerate(races)
+        ]
+
+    # ---------------------- HTTP ----------------------
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.startup()
+            status, body = await self._handle(scope, receive)
+            await send({'type': 'http.response.start', 'status': status, 'headers': [
+                (b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+            ]})
+            await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as exc:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(exc)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _handle(self, scope, receive):
+        method, path = scope['method'], scope['path'].rstrip('/')
+        self.stats['requests'] += 1
+        if path == '/health':
+            return 200, json.dumps(self.health()).encode()
+        if path not in ('/predict', '/predict/batch'):
+            return 404, b'{"error": "not found"}'
+        if method != 'POST':
+            return 405, b'{"error": "use POST"}'
+
+        try:
+            body = await _read_json(receive)
+            if path == '/predict':
+                return 200, await self.predict(parse_race(body))
+            races = body.get('races') if isinstance(body, dict) else None
+            if not isinstance(races, list) or not races:
+                raise BadRequest("races must be a non-empty list")
+            # Every race joins the shared queue, so a batch request is scored alongside the others
+            bodies = await asyncio.gather(*(self.predict(parse_race(race)) for race in races))
+            return 200, b'{"races":[' + b','.join(bodies) + b']}'
+        except BadRequest as exc:
+            return 400, json.dumps({'error': str(exc)}).encode()
+        except Exception as exc:
+            return 500, json.dumps({'error': f"{type(exc).__name__}: {exc}"}).encode()
+
+    def health(self):
+        model = self.service.model
+        batches = self.stats['batches']
+        return {
+            'model': f"{model.name}@{model.version}",
+            'history_seasons': list(self.history_seasons),
+            'cache_entries': len(self.cache),
+            'mean_batch': round(self.stats['batched_races'] / batches, 2) if batches else None,
+            **self.stats,
+        }
+
+
+async def _read_json(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY:
+            raise BadRequest(f"body larger than {MAX_BODY} bytes")
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            break
+    try:
+        return json.loads(b''.join(chunks))
+    except ValueError:
+        raise BadRequest("body is not valid JSON") from None
+
+
+# `uvicorn api:app`; nothing is loaded until the server starts
+app = PredictionAPI()
@@ -1,16 +1,48 @@
-import fastf1
-import pandas as pd
-import joblib
 import streamlit as st
 import matplotlib.pyplot as plt
+import pandas as pd
 import seaborn as sns
-from datetime import datetime
 
-# Enable cache for FastF1
-fastf1.Cache.enable_cache('../cache')
+from actuals_store import leaderboard, load_metrics
+from instrumentation import count, trace
+from live_weekend import read_live
+from model_registry import load_bundle
+from prediction_service import MODEL_NAME, PredictionService, RaceDataUnavailable
+from snapshot_store import ERROR_PALETTE, read_snapshot, snapshot_round
+
+
+# Model, history and simulated rounds are shared by every session and rerun
+@st.cache_resource
+def get_prediction_service():
+    return PredictionService()
+
+
+# Only loaded for rounds without a snapshot (or Monte Carlo); snapshots need no model work
+def get_service():
+    service = get_prediction_service()
+    service.refresh_if_stale()
+    return service
+
+
+bundle = load_bundle(MODEL_NAME)
+MODEL_KEY = f"{bundle.name}@{bundle.version}"
+
+LIVE_REFRESH_SECONDS = 10
 
-# Load trained model
-model = joblib.load('../models/f1_position_model_2025.pkl')
+
+# Re-reads the file published by `python cli.py live` without rerunning the whole page
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_panel(season, round_no):
+    state = read_live(season, round_no)
+    if state is None:
+        st.info(f"No live data yet. Start it with: python cli.py live --season {season} --round {round_no}")
+        return
+    sessions = ", ".join(f"{name} {status}" for name, status in state['sessions'].items() if status != 'waiting')
+    st.caption(f"Updated {state['updated']} ({sessions or 'no sessions yet'})")
+    if state['prediction']:
+        live = pd.DataFrame(state['prediction'])
+        columns = [c for c in ['simulated_finish', 'driver', 'grid', 'predicted_position', 'sprint_position', 'actual_position', 'error'] if c in live.columns]
+        st.dataframe(live[columns])
 
 # Full F1 2025 calendar with round numbers
 rounds_map = {
@@ -51,121 +83,78 @@ selected_round_name = st.selectbox("Select a completed 2025 race round:", round_
 ROUND = [k for k, v in rounds_map.items() if v == selected_round_name][0]
 SEASON = 2025
 
+# Drop cached results (e.g. after a new round was added to the feature store)
+if st.sidebar.button("\U0001F504 Reload data"):
+    get_service().invalidate(reload_history=True)
+
+# cProfile + tracemalloc for the next simulation (F1_PROFILE=1 turns it on for every run)
+profile = st.sidebar.checkbox("\u23F1\uFE0F Profile simulation") or None
+
+# Live weekend: predictions pushed by the live scheduler as sessions finish
+if st.sidebar.checkbox("\U0001F4E1 Live weekend"):
+    st.subheader(f"\U0001F4E1 Live - {selected_round_name} 2025")
+    live_panel(SEASON, ROUND)
+
+# Optional Monte Carlo mode
+monte_carlo = st.checkbox("\U0001F3B2 Monte Carlo probabilities (win / podium / points)")
+n_draws = st.select_slider("Simulated races", options=[10_000, 25_000, 50_000, 100_000], value=100_000) if monte_carlo else None
+
 # Simulate button
 if st.button("\U0001F52E Simulate Race"):
-    try:
-        session_q = fastf1.get_session(SEASON, ROUND, 'Q')
-        session_q.load()
-        session_r = fastf1.get_session(SEASON, ROUND, 'R')
-        session_r.load()
-    except Exception:
+    with trace('app.simulate', profile=profile, memory=profile, season=SEASON, round=ROUND, monte_carlo=n_draws) as timings:
+        # Completed rounds come from the snapshot store (`python cli.py snapshot`)
+        snapshot = read_snapshot(MODEL_KEY, SEASON, ROUND)
+        count('snapshot.hit' if snapshot is not None else 'snapshot.miss')
+        if snapshot is None:
+            try:
+                snapshot = snapshot_round(get_service(), SEASON, ROUND)
+            except RaceDataUnavailable:
+                snapshot = None
+        probabilities = None
+        if monte_carlo and snapshot:
+            try:
+                probabilities = get_service().simulate_probabilities(SEASON, ROUND, n_draws)
+            except FileNotFoundError as exc:
+                st.warning(f"⚠️ {exc}")
+    if snapshot is None:
         st.warning("⚠️ Data not available yet. Please select a race after its qualifying session is completed.")
         st.stop()
 
-    # Driver info
-    driver_lookup = session_r.results.set_index('Abbreviation')['FullName'].to_dict()
-
-    # Grid
-    grid_data = session_r.results[['Abbreviation', 'GridPosition']].copy()
-    grid_data['driver'] = grid_data['Abbreviation'].map(driver_lookup)
-    grid_data['grid'] = grid_data['GridPosition'].astype(int)
-    grid_data = grid_data[['driver', 'grid']]
-
-    # Quali times
-    laps_q = session_q.laps.pick_quicklaps()
-    best_laps = laps_q.groupby('Driver')['LapTime'].min().reset_index()
-    best_laps['qualifying_time'] = best_laps['LapTime'].dt.total_seconds()
-    best_laps['driver'] = best_laps['Driver'].map(driver_lookup)
-    best_laps = best_laps[['driver', 'qualifying_time']]
-
-    # Merge input
-    race_input = pd.merge(grid_data, best_laps, on='driver', how='left')
-
-    # Weather
-    weather_row = session_q.weather_data.iloc[0]
-    race_input['air_temp'] = weather_row['AirTemp']
-    race_input['track_temp'] = weather_row['TrackTemp']
-    race_input['humidity'] = weather_row['Humidity']
-
-    # Add form features
-    hist_df_2024 = pd.read_csv("../data/f1_features_2024_with_features.csv")
-    hist_df_2025 = pd.read_csv("../data/f1_features_2025_enriched.csv")
-    hist_df_2024['season'] = 2024
-    hist_df_2025['season'] = 2025
-    hist_df = pd.concat([hist_df_2024, hist_df_2025], ignore_index=True)
-    hist_df['date'] = pd.to_datetime(hist_df['date'], format='mixed')
-
-    date_row = hist_df[(hist_df['season'] == SEASON) & (hist_df['round'] == ROUND)]['date']
-    race_date = pd.to_datetime(date_row.values[0]) if not date_row.empty else datetime.today()
-
-    driver_forms = []
-    constructor_forms = []
-
-    for _, row in race_input.iterrows():
-        driver = row['driver']
-        constructor = hist_df[hist_df['driver'] == driver]['constructor'].values[0] if not hist_df[hist_df['driver'] == driver].empty else None
-        past_driver = hist_df[(hist_df['driver'] == driver) & (hist_df['date'] < race_date)].sort_values('date')
-        past_constructor = hist_df[(hist_df['constructor'] == constructor) & (hist_df['date'] < race_date)].sort_values('date')
-        driver_form = past_driver['position'].rolling(3).mean().iloc[-1] if len(past_driver) >= 3 else 10.0
-        constructor_form = past_constructor['position'].rolling(3).mean().iloc[-1] if len(past_constructor) >= 3 else 10.0
-        driver_forms.append(driver_form)
-        constructor_forms.append(constructor_form)
-
-    race_input['driver_form'] = driver_forms
-    race_input['constructor_form'] = constructor_forms
-    race_input['grid_advantage'] = race_input['grid'] - race_input['driver_form']
-    race_input['circuit_encoded'] = ROUND
-
-    # Predict
-    features = [
-        'grid', 'driver_form', 'constructor_form',
-        'circuit_encoded', 'grid_advantage', 'qualifying_time',
-        'air_temp', 'track_temp', 'humidity'
-    ]
-    X = race_input[features]
-    race_input['predicted_position'] = model.predict(X)
-
-    # Sort and assign simulated finish
-    race_sorted = race_input.sort_values('predicted_position').reset_index(drop=True)
-    race_sorted['simulated_finish'] = range(1, len(race_sorted) + 1)
-
-    # Actual positions
-    actual_positions = session_r.results[['Abbreviation', 'Position']].copy()
-    actual_positions['driver'] = actual_positions['Abbreviation'].map(driver_lookup)
-    actual_positions['actual_position'] = actual_positions['Position'].astype(int)
-    actual_positions = actual_positions[['driver', 'actual_position']]
-
-    # Merge and calculate error
-    race_sorted = pd.merge(race_sorted, actual_positions, on='driver', how='left')
-    race_sorted['error'] = race_sorted['simulated_finish'] - race_sorted['actual_position']
-
     # Display table
-    race_name = session_r.event['EventName']
-    st.subheader(f"\U0001F3C1 {race_name} GP 2025 - Predicted Finishing Order")
-    st.dataframe(race_sorted[['simulated_finish', 'driver', 'grid', 'predicted_position', 'actual_position', 'error']])
+    race_sorted = snapshot.prediction
+    st.subheader(f"\U0001F3C1 {snapshot.race_name} GP 2025 - Predicted Finishing Order")
+    st.dataframe(race_sorted[[c for c in ['simulated_finish', 'driver', 'grid', 'predicted_position', 'actual_position', 'status', 'error'] if c in race_sorted.columns]])
+
+    # Scores of this model on this round, stored with the snapshot
+    metrics = snapshot.metrics
+    if metrics is not None:
+        cols = st.columns(4)
+        cols[0].metric("MAE", f"{metrics['mae']:.2f}")
+        cols[1].metric("Spearman", f"{metrics['spearman']:.2f}")
+        cols[2].metric("Podium hits", f"{metrics['podium_hit_rate']:.0%}")
+        cols[3].metric("DNFs", int(metrics['dnfs']))
+
+    if probabilities is not None:
+        st.subheader("\U0001F3B2 Monte Carlo Outcome Probabilities")
+        st.dataframe(probabilities.style.format({
+            'predicted_position': '{:.2f}', 'expected_finish': '{:.2f}', 'expected_points': '{:.1f}',
+            'win_prob': '{:.1%}', 'podium_prob': '{:.1%}', 'points_prob': '{:.1%}', 'dnf_prob': '{:.1%}'
+        }))
 
     # 📊 Improved Plotting
     st.subheader("\U0001F4CA Prediction vs Actual")
-    race_sorted = race_sorted.sort_values('actual_position')
-    race_sorted['error_class'] = race_sorted['error'].apply(
-        lambda x: 'Accurate (±1)' if abs(x) <= 1 else ('Close (±3)' if abs(x) <= 3 else 'Off (>3)')
-    )
-    palette = {
-        'Accurate (±1)': 'green',
-        'Close (±3)': 'orange',
-        'Off (>3)': 'red'
-    }
+    chart = snapshot.chart
     fig, ax = plt.subplots(figsize=(11, 8))
     sns.barplot(
         x='predicted_position',
         y='driver',
-        data=race_sorted,
+        data=chart,
         hue='error_class',
         dodge=False,
-        palette=palette,
+        palette=ERROR_PALETTE,
         ax=ax
     )
-    ax.scatter(race_sorted['actual_position'], race_sorted['driver'], color='black', label='Actual', zorder=5)
+    ax.scatter(chart['actual_position'], chart['driver'], color='black', label='Actual', zorder=5)
     ax.set_title('Prediction vs Actual Finishing Positions', fontsize=14, weight='bold')
     ax.set_xlabel('Position')
     ax.set_ylabel('')
@@ -173,3 +162,21 @@ if st.button("\U0001F52E Simulate Race"):
     ax.legend()
     ax.grid(axis='x', linestyle='--', alpha=0.5)
     st.pyplot(fig)
+
+    # Per-round history of this model against the actual results
+    with st.expander("\U0001F4C8 Model accuracy"):
+        history = load_metrics(MODEL_KEY)
+        if history.empty:
+            st.write("No scored rounds yet. Run: python cli.py actuals --score")
+        else:
+            st.dataframe(history[['season', 'round', 'circuit', 'mae', 'spearman', 'podium_hit_rate', 'top10_accuracy', 'dnfs']])
+            st.dataframe(leaderboard())
+
+    # Where the time went for this run
+    with st.expander("\u23F1\uFE0F Timings"):
+        st.dataframe(timings.to_frame().style.format({'ms': '{:.1f}'}))
+        st.json(timings.counters)
+        if timings.peak_mb is not None:
+            st.write(f"Peak traced memory: {timings.peak_mb:.1f} MB")
+        if timings.profile:
+            st.code(timings.profile)
@@ -0,0 +1,176 @@
+# 📦 backfill.py
+# Parallel, resumable backfill of enriched features (grid, best quali lap, weather, result) for whole seasons
+#
+#   python cli.py backfill --seasons 2022-2025 --workers 8
+#   python cli.py backfill --seasons 2024 --retry-failed
+#
+# Rounds are spread over a process pool; each worker loads the round's Q and R
+# sessions and checkpoints the enriched rows atomically into the round cache, the
+# same file `load_round` reads. A restart skips every round that is already there,
+# so an interruption only costs the rounds in flight. Rounds that fail are written
+# to a report and can be retried on their own. Once every round of a season is in,
+# the season's enriched CSV is exported from the checkpoints into data/backfill/
+# (untracked; the checked-in data/*_enriched.csv files are feature store sources and
+# are never overwritten).
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from cache_manager import enable_cache
+from lap_features import season_rounds
+from session_loader import ROUND_CACHE_DIR, RaceDataUnavailable, fetch_round, read_cached_round, save_round
+
+# === Config ===
+WORKERS = os.cpu_count() or 4
+FAILURES_JSON = '../data/backfill_failures.json'
+ENRICHED_CSV = '../data/backfill/f1_features_{season}_enriched.csv'
+ENRICHED_COLUMNS = [
+    'date', 'season', 'round', 'circuit', 'driver', 'constructor', 'grid', 'position',
+    'qualifying_time', 'air_temp', 'track_temp', 'humidity',
+]
+
+
+# ---------------------- worker ----------------------
+
+def _init_worker():
+    enable_cache()
+
+
+def backfill_round(season, round_no, cache_dir=ROUND_CACHE_DIR):
+    """Runs in a worker process: fetch one round and checkpoint it once the race is classified.
+
+    Returns (status, results) where status is 'done' or 'pending' (not classified yet).
+    The results are recorded by the parent; other processes (the app, live polling) may
+    write the actuals store too, which record_actuals serialises with a file lock.
+    """
+    round_df, actuals = fetch_round(season, round_no)
+    if actuals is None:
+        return 'pending', None
+    save_round(round_df, cache_dir)
+    return 'done', actuals
+
+
+# ---------------------- failure report ----------------------
+
+def load_failures(path=FAILURES_JSON):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_failures(failures, path=FAILURES_JSON):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(failures, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+# ---------------------- driver ----------------------
+
+def backfill(seasons, rounds=None, workers=WORKERS, refresh=False, retry_failed=False,
+             cache_dir=ROUND_CACHE_DIR, failures_path=FAILURES_JSON, write_csv=True):
+    """Backfill every past round of `seasons` (or just `rounds`); returns a summary dict.
+
+    Checkpointed rounds are skipped unless `refresh` is set. `retry_failed` only runs
+    the rounds listed in the last failure report.
+    """
+    from actuals_store import record_actuals
+
+    schedules = {season: season_rounds(season, dates=True) for season in seasons}
+    if retry_failed:
+        targets = [(f['season'], f['round']) for f in load_failures(failures_path) if f['season'] in seasons]
+    else:
+        targets = [(season, r) for season in seasons for r in (rounds or sorted(schedules[season]))]
+    todo = [t for t in targets if refresh or read_cached_round(*t, cache_dir) is None]
+    print(f"🧱 {len(targets)} round(s), {len(targets) - len(todo)} already checkpointed, {len(todo)} to fetch "
+          f"on {min(workers, len(todo)) or 0} worker(s)")
+
+    done, pending, failures = [], [], []
+    # Failures of rounds outside this run stay in the report
+    covered = set(targets)
+    kept = [f for f in load_failures(failures_path) if (f['season'], f['round']) not in covered]
+    try:
+        if todo:
+            with ProcessPoolExecutor(max_workers=min(workers, len(todo)), initializer=_init_worker) as pool:
+                futures = {pool.submit(backfill_round, season, round_no, cache_dir): (season, round_no)
+                           for season, round_no in todo}
+                try:
+                    for future in as_completed(futures):
+                        season, round_no = futures[future]
+                        try:
+                            status, actuals = future.result()
+                        except Exception as exc:  # one bad round never stops the others
+                            failures.append({
+                                'season': season, 'round': round_no,
+                                'reason': 'unavailable' if isinstance(exc, RaceDataUnavailable) else 'error',
+                                'error': f"{type(exc).__name__}: {exc}",
+                                'at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                            })
+                            print(f"⚠️ {failures[-1]['error']}")
+                            continue
+                        if status == 'pending':
+                            pending.append((season, round_no))
+                            continue
+                        record_actuals(actuals)
+                        done.append((season, round_no))
+                        print(f"✅ {season} round {round_no} ({len(done) + len(failures) + len(pending)}/{len(todo)})")
+                except KeyboardInterrupt:
+                    # Queued rounds are dropped; the ones in flight finish and keep their checkpoints
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    print("🛑 Interrupted: rerun the same command to resume")
+                    raise
+    finally:
+        # Also written on Ctrl-C, so the report always matches the checkpoints
+        save_failures(sorted(kept + failures, key=lambda f: (f['season'], f['round'])), failures_path)
+
+    written = []
+    if write_csv:
+        for season in seasons:
+            path = write_enriched(season, schedules[season], cache_dir)
+            if path is not None:
+                written.append(path)
+    return {'targets': len(targets), 'fetched': done, 'pending': pending, 'failed': failures, 'csv': written}
+
+
+def write_enriched(season, schedule, cache_dir=ROUND_CACHE_DIR, path=None):
+    """Export the season's enriched CSV from its checkpoints; skipped while any past round is missing."""
+    frames = [read_cached_round(season, round_no, cache_dir) for round_no in sorted(schedule)]
+    missing = [r for r, frame in zip(sorted(schedule), frames) if frame is None]
+    if missing or not frames:
+        print(f"⏳ {season}: rounds {missing} not checkpointed yet, enriched CSV left as is")
+        return None
+    df = pd.concat(frames, ignore_index=True)
+    df['date'] = df['round'].map(schedule)
+    df['circuit'] = df['event_name']
+    path = path or ENRICHED_CSV.format(season=season)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df[ENRICHED_COLUMNS].to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    print(f"💾 {season}: {len(df)} rows from {len(frames)} rounds -> {path}")
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from ranges import parse_range
+
+    parser = argparse.ArgumentParser(description="Parallel, resumable backfill of enriched features")
+    parser.add_argument('--seasons', default='2024-2025')
+    parser.add_argument('--rounds', default=None, help="e.g. 1-8 (default: every past round)")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--refresh', action='store_true', help="re-fetch rounds that are already checkpointed")
+    parser.add_argument('--retry-failed', action='store_true', help=f"only the rounds listed in {FAILURES_JSON}")
+    args = parser.parse_args()
+
+    summary = backfill(parse_range(args.seasons), parse_range(args.rounds) if args.rounds else None,
+                       args.workers, args.refresh, args.retry_failed)
+    print(f"🏁 {len(summary['fetched'])} fetched, {len(summary['pending'])} not classified yet, "
+          f"{len(summary['failed'])} failed (see {FAILURES_JSON})")
@@ -0,0 +1,116 @@
+# 📦 backtest.py
+# Score every historical race in one run: as-of features, one batched predict, parallel metrics
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from feature_store import load_features
+from form_engine import FormEngine
+from model_registry import load_bundle
+from ranges import parse_range
+
+# === Config ===
+MODEL_NAME = 'position'
+OUTPUT_CSV = '../data/backtest_results.csv'
+INPUT_COLUMNS = [
+    'season', 'round', 'date', 'circuit', 'driver', 'driver_id', 'constructor',
+    'grid', 'position', 'status', 'qualifying_time', 'air_temp', 'track_temp', 'humidity'
+]
+METRICS = ['mae', 'spearman', 'podium_hit_rate', 'top10_accuracy']
+
+
+def build_backtest_frame(seasons=None):
+    """Model inputs for every race, with forms computed strictly from earlier races."""
+    history = load_features(columns=INPUT_COLUMNS)
+    races = history if seasons is None else history[history['season'].isin(seasons)]
+
+    # FormEngine only looks at rows dated before each race, so nothing leaks forward
+    frame = FormEngine(history).compute_batch(races.reset_index(drop=True))
+    frame['grid_advantage'] = frame['grid'] - frame['driver_form']
+    frame['circuit_encoded'] = frame['round']
+    return frame
+
+
+def predict_all(model, frame):
+    # One model call for every race in the backtest (the bundle picks its own features)
+    frame = frame.copy()
+    frame['predicted_position'] = model.predict(frame)
+    frame = frame.sort_values(['season', 'round', 'predicted_position'], kind='mergesort')
+    frame['simulated_finish'] = frame.groupby(['season', 'round']).cumcount() + 1
+    return frame.reset_index(drop=True)
+
+
+def _spearman(a, b):
+    ra = pd.Series(a).rank().values
+    rb = pd.Series(b).rank().values
+    if ra.std() == 0 or rb.std() == 0:
+        return float('nan')
+    return float(np.corrcoef(ra, rb)[0, 1])
+
+
+def score_race(race):
+    """Metrics for one race; unclassified drivers are ranked but not scored."""
+    scored = race.dropna(subset=['position'])
+    predicted = scored['simulated_finish'].values
+    actual = scored['position'].values
+    return {
+        'season': int(race['season'].iloc[0]),
+        'round': int(race['round'].iloc[0]),
+        'circuit': race['circuit'].iloc[0],
+        'drivers': len(scored),
+        'mae': float(np.abs(predicted - actual).mean()),
+        'spearman': _spearman(predicted, actual),
+        'podium_hit_rate': len(set(race.loc[race['simulated_finish'] <= 3, 'driver'])
+                               & set(scored.loc[scored['position'] <= 3, 'driver'])) / 3,
+        'top10_accuracy': len(set(race.loc[race['simulated_finish'] <= 10, 'driver'])
+                              & set(scored.loc[scored['position'] <= 10, 'driver'])) / 10,
+    }
+
+
+def _score_chunk(races):
+    return [score_race(race) for race in races]
+
+
+def score_races(frame, workers=None):
+    """Per-race metrics, with races spread over a process pool."""
+    races = [race for _, race in frame.groupby(['season', 'round'], sort=True)]
+    workers = min(workers or os.cpu_count() or 1, len(races)) or 1
+    chunks = [races[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = [row for chunk in pool.map(_score_chunk, chunks) for row in chunk]
+    return pd.DataFrame(results).sort_values(['season', 'round']).reset_index(drop=True)
+
+
+def aggregate(per_race):
+    summary = per_race.groupby('season').agg(races=('round', 'size'), **{m: (m, 'mean') for m in METRICS})
+    summary.loc['all'] = [len(per_race)] + per_race[METRICS].mean().tolist()
+    summary['races'] = summary['races'].astype(int)
+    return summary
+
+
+def run_backtest(model, seasons=None, workers=None):
+    frame = predict_all(model, build_backtest_frame(seasons))
+    per_race = score_races(frame, workers)
+    return frame, per_race, aggregate(per_race)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the position model on every stored race")
+    parser.add_argument('--seasons', default=None, help="e.g. 2022-2025 or 2024,2025 (default: all)")
+    parser.add_argument('--model', default=MODEL_NAME, help="registry model name")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=OUTPUT_CSV)
+    args = parser.parse_args()
+
+    model = load_bundle(args.model)
+    seasons = parse_range(args.seasons) if args.seasons else None
+    _, per_race, summary = run_backtest(model, seasons, args.workers)
+
+    per_race.to_csv(args.output, index=False)
+    print("\n📊 Backtest summary:")
+    print(summary.round(3))
+    print(f"✅ Saved per-race metrics to {args.output}")
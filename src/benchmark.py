@@ -0,0 +1,315 @@
+# 📦 benchmark.py
+# Pipeline benchmarks on synthetic history at 10x / 100x / 1000x the real data, with stored baselines
+#
+#   python benchmark.py                          # 10x, 100x and 1000x against the stored baseline
+#   python benchmark.py --scales 10,100          # quick run (1000x takes ~7 minutes on one core)
+#   python benchmark.py --save                   # record a new baseline
+#
+# Every stage is timed (best of --repeat runs) and then run once more under
+# tracemalloc for its peak Python-side allocation.
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from feature_store import COLUMNS, load_features, write_rounds
+from form_engine import FormEngine
+from generate_2024_features import BASE_COLUMNS, add_features, empty_state
+from model_registry import load_bundle, save_bundle
+from monte_carlo import fit_noise_model, simulate_outcomes
+from ranges import parse_range
+
+# === Config ===
+BENCH_DATA_DIR = '../cache/bench'
+BASELINE_JSON = '../data/benchmark_baseline.json'
+SCALES = [10, 100, 1000]
+
+# 1x ~ the real store: 4 seasons x 24 rounds x 20 drivers
+BASE_SEASONS = 4
+ROUNDS_PER_SEASON = 24
+GRID_SIZE = 20
+CAREER_SEASONS = 6
+FIRST_SEASON = 1000
+# One race a day keeps 1000x (96k races) inside the datetime64[ns] range
+EPOCH = pd.Timestamp('1700-01-01')
+
+FEATURES = [
+    'grid', 'driver_form', 'constructor_form',
+    'circuit_encoded', 'grid_advantage', 'qualifying_time',
+    'air_temp', 'track_temp', 'humidity'
+]
+SEASON_DRAWS = 10_000
+
+# Slower / bigger than baseline by more than this is reported as a regression
+TIME_TOLERANCE = 0.5
+MEMORY_TOLERANCE = 0.2
+POINTS = [25, 18, 15, 12, 10, 8, 6, 4, 2, 1]
+STATUSES = np.array(['Finished', '+1 Lap', 'Engine', 'Collision', 'Gearbox'])
+
+
+# ---------------------- synthetic data ----------------------
+
+def synthetic_results(scale=1, seed=0):
+    """Race history in the feature store schema with `scale` x the real number of rows.
+
+    Drivers arrive in cohorts of GRID_SIZE every CAREER_SEASONS seasons, so the number
+    of distinct drivers grows with the history the way it would going back to 1950.
+    """
+    rng = np.random.default_rng(seed)
+    n_races = BASE_SEASONS * scale * ROUNDS_PER_SEASON
+    race = np.repeat(np.arange(n_races), GRID_SIZE)
+    slot = np.tile(np.arange(GRID_SIZE), n_races)
+    season_idx = race // ROUNDS_PER_SEASON
+    round_no = race % ROUNDS_PER_SEASON + 1
+
+    # Car pace by slot, plus per-race noise for qualifying and the race itself
+    pace = np.tile(np.linspace(0.0, 2.0, GRID_SIZE), n_races).reshape(n_races, GRID_SIZE)
+    quali = pace + rng.normal(0, 0.4, pace.shape)
+    result = quali + rng.normal(0, 0.8, pace.shape)
+    grid = quali.argsort(axis=1).argsort(axis=1).ravel() + 1
+    position = result.argsort(axis=1).argsort(axis=1).ravel() + 1
+
+    cohort = season_idx // CAREER_SEASONS
+    driver_ids = [f"driver_{c:04d}_{s:02d}" for c, s in zip(cohort, slot)]
+    points = np.zeros(len(race))
+    points[position <= len(POINTS)] = np.array(POINTS)[position[position <= len(POINTS)] - 1]
+    air_temp = rng.uniform(12, 35, n_races)
+
+    frame = pd.DataFrame({
+        'season': (FIRST_SEASON + season_idx).astype('int16'),
+        'round': round_no.astype('int16'),
+        'date': (EPOCH + pd.to_timedelta(race, unit='D')).astype('datetime64[ns]'),
+        'circuit': pd.Categorical([f"Circuit {r:02d}" for r in round_no]),
+        'driver': pd.Categorical([d.replace('_', ' ').title() for d in driver_ids]),
+        'driver_id': pd.Categorical(driver_ids),
+        'constructor': pd.Categorical([f"Team {s // 2:02d}" for s in slot]),
+        'grid': grid.astype('float64'),
+        'position': position.astype('float64'),
+        'status': pd.Categorical(np.where(rng.random(len(race)) < 0.9, 'Finished', rng.choice(STATUSES, len(race)))),
+        'points': points,
+        'qualifying_time': pd.to_timedelta(np.round((80 + quali.ravel()) * 1000), unit='ms'),
+        'air_temp': np.repeat(air_temp, GRID_SIZE),
+        'track_temp': np.repeat(air_temp + rng.uniform(5, 20, n_races), GRID_SIZE),
+        'humidity': np.repeat(rng.uniform(20, 90, n_races), GRID_SIZE),
+    })
+    return frame[COLUMNS]
+
+
+def write_synthetic(scale, data_dir=BENCH_DATA_DIR):
+    """Generate (once) the CSV and feature store for one scale and return their paths."""
+    root = os.path.join(data_dir, f"{scale}x")
+    csv_path = os.path.join(root, 'results.csv')
+    store_dir = os.path.join(root, 'store')
+    if not os.path.exists(csv_path):
+        print(f"📦 Generating {scale}x synthetic history...")
+        frame = synthetic_results(scale)
+        os.makedirs(root, exist_ok=True)
+        write_rounds(frame, store_dir)
+        out = frame[BASE_COLUMNS].copy()
+        out['qualifying_time'] = out['qualifying_time'].dt.total_seconds()
+        out.to_csv(csv_path + '.tmp', index=False)
+        os.replace(csv_path + '.tmp', csv_path)
+    return csv_path, store_dir
+
+
+# ---------------------- stages ----------------------
+
+class Workload:
+    """Inputs shared by the stages of one scale; built outside the timed region."""
+
+    def __init__(self, scale, registry_dir):
+        self.scale = scale
+        self.csv_path, self.store_dir = write_synthetic(scale)
+        self.history = load_features(store_dir=self.store_dir)
+        self.rounds = self.history.sort_values(['date', 'season', 'round'], kind='mergesort').reset_index(drop=True)
+        for col in ['circuit', 'driver', 'constructor']:
+            self.rounds[col] = self.rounds[col].astype(object)
+
+        self.forms = FormEngine(self.history)
+        self.frame = self.forms.compute_batch(self.history)
+        self.frame['grid_advantage'] = self.frame['grid'] - self.frame['driver_form']
+        self.frame['circuit_encoded'] = self.frame['round']
+
+        last_season = self.history['season'].max()
+        self.season = [race for _, race in self.history[self.history['season'] == last_season].groupby('round')]
+        self.race = self.season[-1]
+
+        self.model = self._fit_model(registry_dir)
+        sample = self.frame.iloc[-len(self.season) * GRID_SIZE * 4:].copy()
+        sample['predicted_position'] = self.model.predict(sample)
+        self.noise = fit_noise_model(sample)
+
+    def _fit_model(self, registry_dir):
+        # A small model trained on the most recent rows stands in for the registry model
+        import xgboost as xgb
+
+        train = self.frame.dropna(subset=FEATURES + ['position']).iloc[-20_000:]
+        model = xgb.XGBRegressor(n_estimators=100, learning_rate=0.1, max_depth=4, random_state=42)
+        model.fit(train[FEATURES], train['position'])
+        save_bundle(model, 'bench', FEATURES, registry_dir=registry_dir)
+        return load_bundle('bench', registry_dir=registry_dir)
+
+    # Each stage mirrors one hot path of the real pipeline
+
+    def load_csv(self):
+        return pd.read_csv(self.csv_path)
+
+    def load_store(self):
+        return load_features(store_dir=self.store_dir)
+
+    def build_features(self):
+        # generate_2024_features.py --full
+        return add_features(self.rounds, empty_state(), [])
+
+    def form_index(self):
+        # PredictionService start-up / history reload
+        return FormEngine(self.history)
+
+    def race_form(self):
+        # One race grid as requested from app.py
+        race = self.race
+        return self.forms.compute(race[['driver']], race['date'].iloc[0])
+
+    def inference(self):
+        return self.model.predict(self.frame)
+
+    def season_simulation(self):
+        # Every round of the latest season: forms, prediction and Monte Carlo odds
+        tables = []
+        for race in self.season:
+            race_input = self.forms.compute(race[['driver', 'constructor', 'circuit', 'grid', 'qualifying_time',
+                                                  'air_temp', 'track_temp', 'humidity']], race['date'].iloc[0])
+            race_input['grid_advantage'] = race_input['grid'] - race_input['driver_form']
+            race_input['circuit_encoded'] = race['round'].iloc[0]
+            race_input['predicted_position'] = self.model.predict(race_input)
+            tables.append(simulate_outcomes(race_input, self.noise, SEASON_DRAWS, seed=0))
+        return tables
+
+
+STAGES = ['load_csv', 'load_store', 'build_features', 'form_index', 'race_form', 'inference', 'season_simulation']
+
+
+def measure(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'peak_mb': peak / 2 ** 20}
+
+
+def run_benchmarks(scales=SCALES, stages=STAGES, repeat=3):
+    """{'<scale>x': {stage: {'seconds', 'peak_mb'}}} for every scale and stage."""
+    results = {}
+    with tempfile.TemporaryDirectory() as registry_dir:
+        for scale in scales:
+            work = Workload(scale, registry_dir)
+            print(f"📊 {scale}x: {len(work.history):,} rows, {work.history['driver'].nunique():,} drivers")
+            results[f"{scale}x"] = {}
+            for stage in stages:
+                results[f"{scale}x"][stage] = measure(getattr(work, stage), repeat)
+    return results
+
+
+# ---------------------- baselines ----------------------
+
+def machine_info():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def _read_baseline_file(path):
+    # {scale: {'machine': {...}, 'stages': {stage: {'seconds', 'peak_mb'}}}}
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def load_baseline(path=BASELINE_JSON):
+    """{scale: {stage: measurement}} of the stored baseline."""
+    return {scale: entry['stages'] for scale, entry in _read_baseline_file(path).items()}
+
+
+def baseline_machines(path=BASELINE_JSON):
+    return {scale: entry['machine'] for scale, entry in _read_baseline_file(path).items()}
+
+
+def save_baseline(results, path=BASELINE_JSON):
+    """Record `results` per scale with the machine they ran on; other scales are kept.
+
+    Stages of a scale measured on the same machine are merged, so a `--stages` run
+    only replaces what it measured; a different machine replaces the whole scale.
+    """
+    from cache_manager import file_lock, lock_path
+
+    machine = machine_info()
+    with file_lock(lock_path('benchmark_baseline')):
+        stored = _read_baseline_file(path)
+        for scale, stages in results.items():
+            previous = stored.get(scale)
+            kept = previous['stages'] if previous and previous['machine'] == machine else {}
+            stored[scale] = {'machine': machine, 'stages': {**kept, **stages}}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'results': stored}, f, indent=1)
+        os.replace(tmp_path, path)
+
+
+def compare(results, baseline):
+    """One row per (scale, stage) with the baseline ratio and a regression flag."""
+    rows = []
+    for scale, stages in results.items():
+        for stage, m in stages.items():
+            base = baseline.get(scale, {}).get(stage)
+            row = {'scale': scale, 'stage': stage, 'seconds': m['seconds'], 'peak_mb': m['peak_mb']}
+            if base:
+                row['time_ratio'] = m['seconds'] / base['seconds'] if base['seconds'] else float('nan')
+                row['mem_ratio'] = m['peak_mb'] / base['peak_mb'] if base['peak_mb'] else float('nan')
+                row['regression'] = bool(row['time_ratio'] > 1 + TIME_TOLERANCE or row['mem_ratio'] > 1 + MEMORY_TOLERANCE)
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main(scales=SCALES, stages=STAGES, repeat=3, save=False, baseline_path=BASELINE_JSON):
+    results = run_benchmarks(scales, stages, repeat)
+    report = compare(results, load_baseline(baseline_path))
+    print("\n📊 Benchmark results:")
+    print(report.round(3).to_string(index=False))
+    machine = machine_info()
+    for scale, recorded_on in baseline_machines(baseline_path).items():
+        if scale in results and recorded_on != machine:
+            print(f"⚠️ The {scale} baseline was recorded on another machine: {recorded_on}")
+
+    if save:
+        save_baseline(results, baseline_path)
+        print(f"💾 Saved baseline to {baseline_path}")
+        return 0
+    if 'regression' in report.columns and report['regression'].fillna(False).any():
+        print("⚠️ Regressions against the stored baseline")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic scaled history")
+    parser.add_argument('--scales', default=','.join(map(str, SCALES)), help="e.g. 10,100,1000")
+    parser.add_argument('--stages', default=','.join(STAGES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--baseline', default=BASELINE_JSON)
+    args = parser.parse_args()
+    raise SystemExit(main(parse_range(args.scales), args.stages.split(','), args.repeat, args.save, args.baseline))
@@ -0,0 +1,247 @@
+# 📦 cache_manager.py
+# Shared FastF1 cache: one absolute root, per-session file locks, LRU eviction, warm-up and hit/miss stats
+#
+#   python cli.py cache stats
+#   python cli.py cache warm --season 2025                  # Q and R of every past round
+#   python cli.py cache evict --max-gb 5 --max-age-days 90
+#
+# The root comes from F1_CACHE_DIR (default: the repo's cache/ folder, whatever the
+# working directory). Every session load goes through `load_session`, which holds an
+# exclusive lock on that session while FastF1 reads or writes its files: app
+# workers, backfill processes and live polling share one download per session and
+# never see each other's half-written pickles. FastF1 keeps a session's parsed data
+# in <root>/<year>/<event>/<session>/; those directories are the eviction unit,
+# dropped least recently used first once they are older than the age limit or the
+# cache is over its size limit. The HTTP cache (fastf1_http_cache.sqlite) expires on
+# its own and is left alone.
+
+import json
+import os
+import re
+import shutil
+import time
+from contextlib import contextmanager
+
+from instrumentation import count
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# === Config ===
+CACHE_ROOT = os.path.abspath(os.environ.get('F1_CACHE_DIR', os.path.join(os.path.dirname(__file__), '..', 'cache')))
+MAX_CACHE_GB = float(os.environ.get('F1_CACHE_MAX_GB', 20))
+MAX_AGE_DAYS = float(os.environ.get('F1_CACHE_MAX_AGE_DAYS', 365))
+LOCK_DIRNAME = '_locks'
+STATS_JSON = 'cache_stats.json'
+WARM_SESSIONS = ('Q', 'R')
+SEASON_DIR = re.compile(r'^\d{4}$')
+
+
+# ---------------------- locks ----------------------
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """Exclusive inter-process lock on `path` (created if missing); yields False if busy and not `blocking`."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a+b') as f:
+        try:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            if blocking:
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def lock_path(name, root=CACHE_ROOT):
+    return os.path.join(root, LOCK_DIRNAME, re.sub(r'[^\w.-]', '_', name) + '.lock')
+
+
+# ---------------------- sessions ----------------------
+
+def enable_cache(root=CACHE_ROOT):
+    import fastf1
+
+    os.makedirs(root, exist_ok=True)
+    fastf1.Cache.enable_cache(root)
+
+
+def session_dir(session, root=CACHE_ROOT):
+    # Where FastF1 writes the session's pickles (its api_path without '/static/')
+    return os.path.join(root, *session.api_path[len('/static/'):].strip('/').split('/'))
+
+
+def _pickles(path):
+    if not os.path.isdir(path):
+        return 0
+    return sum(name.endswith('.ff1pkl') for name in os.listdir(path))
+
+
+def _load(session, root, load_args):
+    # True if everything came from the cache, False if FastF1 had to download and write files
+    path = session_dir(session, root)
+    with file_lock(lock_path(os.path.relpath(path, root), root)):
+        before = _pickles(path)
+        session.load(**load_args)
+        hit = _pickles(path) == before
+        if os.path.isdir(path):
+            os.utime(path)  # last use, for LRU eviction
+    count('fastf1_cache.hit' if hit else 'fastf1_cache.miss')
+    record_stats(hits=int(hit), misses=int(not hit), root=root)
+    if not hit:
+        evict(root=root, blocking=False)
+    return hit
+
+
+def load_session(session, root=CACHE_ROOT, **load_args):
+    """`session.load(**load_args)` under the session's lock, counted as a cache hit or miss."""
+    _load(session, root, load_args)
+    return session
+
+
+# ---------------------- stats ----------------------
+
+def read_stats(root=CACHE_ROOT):
+    path = os.path.join(root, STATS_JSON)
+    if not os.path.exists(path):
+        return {'hits': 0, 'misses': 0, 'evicted': 0, 'evicted_bytes': 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def record_stats(root=CACHE_ROOT, **counts):
+    # Read-modify-write under a lock: every process adds to the same totals
+    with file_lock(lock_path('stats', root)):
+        stats = read_stats(root)
+        for name, n in counts.items():
+            stats[name] = stats.get(name, 0) + n
+        tmp_path = os.path.join(root, f"{STATS_JSON}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(stats, f, indent=1)
+        os.replace(tmp_path, os.path.join(root, STATS_JSON))
+
+
+def _dir_size(path):
+    total = 0
+    for base, _, names in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(base, name)) for name in names)
+    return total
+
+
+def cache_entries(root=CACHE_ROOT):
+    """One dict per cached session (path, bytes, last_used), least recently used first."""
+    entries = []
+    if not os.path.isdir(root):
+        return entries
+    for season in sorted(os.listdir(root)):
+        season_path = os.path.join(root, season)
+        if not SEASON_DIR.match(season) or not os.path.isdir(season_path):
+            continue
+        for event in os.listdir(season_path):
+            event_path = os.path.join(season_path, event)
+            if not os.path.isdir(event_path):
+                continue
+            for name in os.listdir(event_path):
+                path = os.path.join(event_path, name)
+                if os.path.isdir(path):
+                    entries.append({'path': path, 'bytes': _dir_size(path), 'last_used': os.path.getmtime(path)})
+    return sorted(entries, key=lambda e: e['last_used'])
+
+
+def cache_stats(root=CACHE_ROOT):
+    """Hit/miss totals of every process plus the current size of the cache."""
+    stats = read_stats(root)
+    entries = cache_entries(root)
+    lookups = stats['hits'] + stats['misses']
+    http_cache = os.path.join(root, 'fastf1_http_cache.sqlite')
+    return {
+        **stats,
+        'hit_rate': stats['hits'] / lookups if lookups else float('nan'),
+        'sessions': len(entries),
+        'session_bytes': sum(e['bytes'] for e in entries),
+        'http_bytes': os.path.getsize(http_cache) if os.path.exists(http_cache) else 0,
+        'oldest_use': min((e['last_used'] for e in entries), default=None),
+    }
+
+
+# ---------------------- eviction ----------------------
+
+def evict(max_gb=MAX_CACHE_GB, max_age_days=MAX_AGE_DAYS, root=CACHE_ROOT, blocking=True):
+    """Drop cached sessions unused for `max_age_days`, then least recently used ones until under `max_gb`.
+
+    Sessions being loaded by another process are skipped. Returns the evicted entries.
+    """
+    with file_lock(lock_path('evict', root), blocking) as locked:
+        if not locked:  # another process is already evicting
+            return []
+        entries = cache_entries(root)
+        total = sum(e['bytes'] for e in entries)
+        cutoff = time.time() - max_age_days * 86400
+        evicted = []
+        for entry in entries:
+            if entry['last_used'] >= cutoff and total <= max_gb * 1024 ** 3:
+                break
+            name = os.path.relpath(entry['path'], root)
+            with file_lock(lock_path(name, root), blocking=False) as free:
+                if not free:
+                    continue
+                shutil.rmtree(entry['path'], ignore_errors=True)
+            total -= entry['bytes']
+            evicted.append(entry)
+        for event_path in {os.path.dirname(e['path']) for e in evicted}:
+            if os.path.isdir(event_path) and not os.listdir(event_path):
+                os.rmdir(event_path)
+    if evicted:
+        record_stats(evicted=len(evicted), evicted_bytes=sum(e['bytes'] for e in evicted), root=root)
+    return evicted
+
+
+# ---------------------- warm-up ----------------------
+
+def warm_season(season, sessions=WARM_SESSIONS, rounds=None, root=CACHE_ROOT):
+    """Prefetch `sessions` of every past round of `season` with the slices the pipeline loads.
+
+    Q and R get the session_loader slices; any other session gets the lap features' slice.
+    Returns the hit / miss / skipped session counts.
+    """
+    import fastf1
+
+    from lap_features import LAP_LOAD, season_rounds
+    from session_loader import QUALI_LOAD, RACE_LOAD
+
+    enable_cache(root)
+    loads = {'Q': QUALI_LOAD, 'R': RACE_LOAD}
+    totals = {'hits': 0, 'misses': 0, 'skipped': 0}
+    for round_no in rounds or season_rounds(season):
+        for identifier in sessions:
+            try:
+                session = fastf1.get_session(season, round_no, identifier)
+                hit = _load(session, root, loads.get(identifier, LAP_LOAD))
+            except Exception as exc:  # no such session (sprint weekends) or not published yet
+                print(f"⚠️ {season} round {round_no} {identifier}: {exc}")
+                totals['skipped'] += 1
+                continue
+            totals['hits' if hit else 'misses'] += 1
+            print(f"{'✅' if hit else '📥'} {season} round {round_no} {identifier}")
+    return totals
+
+
+if __name__ == "__main__":
+    stats = cache_stats()
+    print(f"📦 {CACHE_ROOT}: {stats['sessions']} sessions, {stats['session_bytes'] / 1024 ** 2:.0f} MB, "
+          f"{stats['hits']} hits / {stats['misses']} misses")
@@ -0,0 +1,354 @@
+# 📦 cli.py
+# One entry point for the pipeline: ingest, backfill, build-features, lap-features, train, simulate, sweep, live,
+# serve, actuals, snapshot, cache, backtest, benchmark
+#
+#   python cli.py simulate --season 2025 --round 1-8 --output results.csv
+#
+# Heavy modules are imported inside each command, so `--help` returns instantly.
+
+import argparse
+import os
+import sys
+
+from ranges import parse_range
+
+
+def write_results(df, path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.parquet':
+        df.to_parquet(path, index=False)
+    elif ext == '.json':
+        df.to_json(path, orient='records', indent=1)
+    else:
+        df.to_csv(path, index=False)
+
+
+# ---------------------- commands ----------------------
+
+def cmd_ingest(args):
+    from ingest import FIXTURE_DIR, ingest_results, make_source
+
+    source_args = {'http': {'base_url': args.base_url} if args.base_url else {}, 'replay': {'directory': args.replay_dir or FIXTURE_DIR}}
+    source = make_source(args.source, **source_args.get(args.source, {}))
+    df = ingest_results(parse_range(args.seasons), parse_range(args.rounds),
+                        source=source, max_workers=args.workers, refresh=args.refresh)
+    write_results(df, args.output)
+    print(f"✅ Saved {len(df)} rows to {args.output}")
+
+
+def cmd_backfill(args):
+    from backfill import FAILURES_JSON, backfill
+
+    rounds = parse_range(args.rounds) if args.rounds else None
+    summary = backfill(parse_range(args.seasons), rounds, args.workers, args.refresh, args.retry_failed)
+    print(f"🏁 {len(summary['fetched'])} fetched, {len(summary['pending'])} not classified yet, "
+          f"{len(summary['failed'])} failed (see {FAILURES_JSON})")
+
+
+def cmd_build_features(args):
+    if args.store:
+        from feature_store import build_store
+        frame = build_store()
+        print(f"✅ Rebuilt feature store ({len(frame)} rows)")
+
+    from generate_2024_features import build
+    build(full=args.full)
+
+
+def cmd_lap_features(args):
+    from cache_manager import enable_cache
+    from lap_features import LAP_STORE_DIR, build_lap_store
+
+    enable_cache()
+    rounds = parse_range(args.rounds) if args.rounds else None
+    n = build_lap_store(parse_range(args.seasons), rounds, args.refresh)
+    print(f"✅ Wrote {n} round(s) to {LAP_STORE_DIR}")
+
+
+def cmd_train(args):
+    from train import train
+    train(seasons=parse_range(args.seasons), model_name=args.model, n_candidates=args.candidates, workers=args.workers)
+
+
+def cmd_simulate(args):
+    import pandas as pd
+
+    from instrumentation import trace
+    from prediction_service import PredictionService, RaceDataUnavailable
+
+    seasons = parse_range(args.season)
+    # One service for every round: model, history and round cache are loaded once
+    history = sorted(set(seasons) | {s - 1 for s in seasons})
+    profile = args.profile or None
+
+    tables = []
+    with trace('cli.simulate', profile=profile, memory=profile, season=args.season, round=args.round) as timings:
+        service = PredictionService(model_name=args.model, history_seasons=history)
+        for season in seasons:
+            for round_no in parse_range(args.round):
+                try:
+                    race_name, race = service.simulate(season, round_no)
+                except RaceDataUnavailable:
+                    print(f"⚠️ {season} round {round_no}: data not available yet, skipped")
+                    continue
+                if args.monte_carlo:
+                    probabilities = service.simulate_probabilities(season, round_no, args.monte_carlo)
+                    race = race.merge(probabilities.drop(columns='predicted_position'), on='driver', how='left')
+                race.insert(0, 'race', race_name)
+                race.insert(0, 'round', round_no)
+                race.insert(0, 'season', season)
+                tables.append(race)
+
+                if not args.output:
+                    print(f"\n\U0001F3C1 {race_name} {season} - Predicted Finishing Order:")
+                    print(race[['simulated_finish', 'driver', 'grid', 'predicted_position']].to_string(index=False))
+
+    if args.output and tables:
+        results = pd.concat(tables, ignore_index=True)
+        write_results(results, args.output)
+        print(f"✅ Saved {len(tables)} race(s) to {args.output}")
+
+    if args.profile:
+        print("\n⏱️ Timings:")
+        print(timings.to_frame().round(1).to_string(index=False))
+        print(f"Counters: {timings.counters}")
+        print(f"Peak traced memory: {timings.peak_mb:.1f} MB")
+        print(timings.profile)
+
+
+def cmd_sweep(args):
+    from cache_manager import enable_cache
+    from scenario_sweep import sweep_round
+
+    enable_cache()
+    axes = dict(
+        permute_top=args.permute_top, penalties=args.penalty, quali_delta=args.quali_delta, form_shifts=args.form_shift,
+        weather={'air_temp': args.air_temp, 'track_temp': args.track_temp, 'humidity': args.humidity},
+    )
+    race_name, result = sweep_round(args.season, args.round, axes, args.model)
+    print(f"\n\U0001F9EA {race_name} {args.season}: {len(result):,} scenarios in {result.seconds:.2f}s")
+    print(result.driver_summary().round(3).to_string(index=False))
+    print(f"\n\U0001F500 Biggest changes{f' for {args.focus}' if args.focus else ''}:")
+    ranked = result.ranked(args.focus, args.top)
+    print(ranked.to_string(index=False))
+    if args.output:
+        write_results(ranked, args.output)
+        print(f"✅ Saved {len(ranked)} scenario(s) to {args.output}")
+
+
+def cmd_live(args):
+    from live_weekend import run_live
+
+    run_live(args.season, args.round, source=args.source, model_name=args.model, replay_dir=args.replay_dir,
+             poll_interval=args.interval, max_backoff=args.max_backoff)
+
+
+def cmd_serve(args):
+    import uvicorn
+
+    from api import PredictionAPI
+
+    app = PredictionAPI(model_name=args.model, history_seasons=parse_range(args.history),
+                        batch_window=args.batch_window / 1000, cache_size=args.cache_size)
+    uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+
+
+def cmd_actuals(args):
+    from actuals_store import ACTUALS_DIR, backfill, leaderboard, score_stored_rounds
+    from model_registry import load_bundle
+
+    seasons = parse_range(args.seasons)
+    written = backfill(seasons, parse_range(args.rounds) if args.rounds else None, args.source)
+    print(f"✅ Recorded results for {len(written)} round(s) in {ACTUALS_DIR}")
+    if args.score:
+        metrics = score_stored_rounds(load_bundle(args.model), seasons)
+        print(f"📊 Scored {len(metrics)} round(s)")
+    board = leaderboard()
+    if len(board):
+        print("\n🏆 Model accuracy:")
+        print(board.round(3).to_string(index=False))
+
+
+def cmd_snapshot(args):
+    from snapshot_store import SNAPSHOT_DIR, build_snapshots
+
+    built = build_snapshots(parse_range(args.seasons), parse_range(args.rounds) if args.rounds else None,
+                            args.model, args.refresh)
+    print(f"✅ Built {len(built)} snapshot(s) in {SNAPSHOT_DIR}")
+
+
+def cmd_cache(args):
+    from cache_manager import CACHE_ROOT, MAX_AGE_DAYS, MAX_CACHE_GB, cache_stats, evict, warm_season
+
+    if args.action == 'warm':
+        rounds = parse_range(args.rounds) if args.rounds else None
+        for season in parse_range(args.seasons):
+            totals = warm_season(season, args.sessions.split(','), rounds)
+            print(f"✅ {season}: {totals['misses']} downloaded, {totals['hits']} already cached, "
+                  f"{totals['skipped']} unavailable")
+    elif args.action == 'evict':
+        evicted = evict(args.max_gb or MAX_CACHE_GB, args.max_age_days or MAX_AGE_DAYS)
+        print(f"🧹 Evicted {len(evicted)} session(s), {sum(e['bytes'] for e in evicted) / 1024 ** 2:.0f} MB")
+
+    stats = cache_stats()
+    print(f"📦 {CACHE_ROOT}: {stats['sessions']} sessions, {stats['session_bytes'] / 1024 ** 2:.0f} MB "
+          f"(+{stats['http_bytes'] / 1024 ** 2:.0f} MB HTTP cache)")
+    rate = 'n/a' if stats['hits'] + stats['misses'] == 0 else f"{stats['hit_rate']:.0%}"
+    print(f"   {stats['hits']} hits / {stats['misses']} misses (hit rate {rate}), {stats['evicted']} evicted")
+
+
+def cmd_backtest(args):
+    from backtest import run_backtest
+    from model_registry import load_bundle
+
+    seasons = parse_range(args.seasons) if args.seasons else None
+    _, per_race, summary = run_backtest(load_bundle(args.model), seasons, args.workers)
+    if args.output:
+        write_results(per_race, args.output)
+    print("\n📊 Backtest summary:")
+    print(summary.round(3))
+
+
+def cmd_benchmark(args):
+    from benchmark import STAGES, main as run
+
+    stages = args.stages.split(',') if args.stages else STAGES
+    return run(parse_range(args.scales), stages, args.repeat, args.save)
+
+
+# ---------------------- parser ----------------------
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="F1 race outcome predictor")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('ingest', help="fetch historical results (http / replay / fastf1)")
+    p.add_argument('--seasons', default='2022-2025')
+    p.add_argument('--rounds', default='1-24')
+    p.add_argument('--source', choices=['http', 'replay', 'fastf1'], default='http')
+    p.add_argument('--base-url', default=None)
+    p.add_argument('--replay-dir', default=None)
+    p.add_argument('--workers', type=int, default=8)
+    p.add_argument('--refresh', action='store_true')
+    p.add_argument('--output', default='../data/f1_results_ingested.csv')
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser('backfill', help="parallel, resumable backfill of enriched features from FastF1")
+    p.add_argument('--seasons', default='2024-2025')
+    p.add_argument('--rounds', default=None, help="e.g. 1-8 (default: every past round)")
+    p.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    p.add_argument('--refresh', action='store_true', help="re-fetch rounds that are already checkpointed")
+    p.add_argument('--retry-failed', action='store_true', help="only the rounds in the last failure report")
+    p.set_defaults(func=cmd_backfill)
+
+    p = sub.add_parser('build-features', help="append new rounds to the engineered feature set")
+    p.add_argument('--full', action='store_true', help="rebuild every round")
+    p.add_argument('--store', action='store_true', help="rebuild the feature store from the CSVs first")
+    p.set_defaults(func=cmd_build_features)
+
+    p = sub.add_parser('lap-features', help="extract practice / quali / race lap features into the lap store")
+    p.add_argument('--seasons', default='2018-2025')
+    p.add_argument('--rounds', default=None, help="e.g. 1-8 (default: every completed round)")
+    p.add_argument('--refresh', action='store_true', help="re-extract rounds already in the store")
+    p.set_defaults(func=cmd_lap_features)
+
+    p = sub.add_parser('train', help="train and register a new model version")
+    p.add_argument('--seasons', default='2024-2025')
+    p.add_argument('--model', default='position')
+    p.add_argument('--candidates', type=int, default=16, help="hyperparameter sets to cross-validate")
+    p.add_argument('--workers', type=int, default=None)
+    p.set_defaults(func=cmd_train)
+
+    p = sub.add_parser('simulate', help="predict one or many rounds")
+    p.add_argument('--season', default='2025', help="e.g. 2025 or 2024-2025")
+    p.add_argument('--round', default='8', help="e.g. 8, 1-8 or 1,3,5")
+    p.add_argument('--model', default='position', help="registry model name")
+    p.add_argument('--monte-carlo', type=int, default=0, metavar='DRAWS', help="add outcome probabilities (fit the noise model with `python monte_carlo.py` first)")
+    p.add_argument('--output', default=None, help="write results to .csv / .parquet / .json")
+    p.add_argument('--profile', action='store_true', help="print stage timings, cProfile and peak memory")
+    p.set_defaults(func=cmd_simulate)
+
+    p = sub.add_parser('sweep', help="what-if sweep over grid orders, penalties, weather and form")
+    p.add_argument('--season', type=int, default=2025)
+    p.add_argument('--round', type=int, required=True)
+    p.add_argument('--model', default='position', help="registry model name")
+    p.add_argument('--permute-top', type=int, default=None, metavar='K', help="every order of the top K on the grid")
+    p.add_argument('--penalty', action='append', default=[], metavar='"DRIVER:3,5,10"', help="grid places dropped")
+    p.add_argument('--air-temp', default=None, metavar='LO:HI:STEP', help="or a list like 15,25,35")
+    p.add_argument('--track-temp', default=None, metavar='LO:HI:STEP')
+    p.add_argument('--humidity', default=None, metavar='LO:HI:STEP')
+    p.add_argument('--quali-delta', default=None, metavar='LO:HI:STEP', help="seconds added to every quali time")
+    p.add_argument('--form-shift', action='append', default=[], metavar='"DRIVER:-1,0,1"', help="driver_form shift")
+    p.add_argument('--focus', default=None, help="rank scenarios by this driver's gain")
+    p.add_argument('--top', type=int, default=20, help="scenarios to list")
+    p.add_argument('--output', default=None, help="write the ranked scenarios to .csv / .parquet / .json")
+    p.set_defaults(func=cmd_sweep)
+
+    p = sub.add_parser('live', help="follow a race weekend and update the prediction as sessions land")
+    p.add_argument('--season', type=int, default=2025)
+    p.add_argument('--round', type=int, required=True)
+    p.add_argument('--source', choices=['fastf1', 'replay'], default='fastf1')
+    p.add_argument('--replay-dir', default='../data/fixtures/live')
+    p.add_argument('--model', default='position', help="registry model name")
+    p.add_argument('--interval', type=float, default=30.0, help="seconds between polls of a due session")
+    p.add_argument('--max-backoff', type=float, default=600.0, help="longest wait after failed fetches (doubles up to it)")
+    p.set_defaults(func=cmd_live)
+
+    p = sub.add_parser('serve', help="HTTP prediction API with micro-batching and a response cache")
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8000)
+    p.add_argument('--model', default='position', help="registry model name")
+    p.add_argument('--history', default='2024-2025', help="seasons loaded for form features")
+    p.add_argument('--batch-window', type=float, default=2.0, help="ms to wait for more requests per batch")
+    p.add_argument('--cache-size', type=int, default=1024)
+    p.add_argument('--log-level', default='warning')
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser('actuals', help="record actual results (DNFs, penalties) and score models against them")
+    p.add_argument('--seasons', default='2025')
+    p.add_argument('--rounds', default=None, help="e.g. 1-8 (default: every completed round)")
+    p.add_argument('--source', choices=['fastf1', 'store'], default='fastf1')
+    p.add_argument('--model', default='position', help="registry model name")
+    p.add_argument('--score', action='store_true', help="cache this model's per-round metrics")
+    p.set_defaults(func=cmd_actuals)
+
+    p = sub.add_parser('snapshot', help="precompute dashboard snapshots of completed rounds")
+    p.add_argument('--seasons', default='2025')
+    p.add_argument('--rounds', default=None, help="e.g. 1-8 (default: every round with recorded results)")
+    p.add_argument('--model', default='position', help="registry model name")
+    p.add_argument('--refresh', action='store_true', help="rebuild snapshots that already exist")
+    p.set_defaults(func=cmd_snapshot)
+
+    p = sub.add_parser('cache', help="FastF1 cache: hit/miss stats, warm-up of a season, LRU eviction")
+    p.add_argument('action', choices=['stats', 'warm', 'evict'])
+    p.add_argument('--seasons', default='2025', help="seasons to warm")
+    p.add_argument('--rounds', default=None, help="e.g. 1-8 (default: every past round)")
+    p.add_argument('--sessions', default='Q,R', help="sessions to warm, e.g. FP2,Q,R")
+    p.add_argument('--max-gb', type=float, default=None, help="size limit (default: F1_CACHE_MAX_GB or 20)")
+    p.add_argument('--max-age-days', type=float, default=None, help="age limit (default: F1_CACHE_MAX_AGE_DAYS or 365)")
+    p.set_defaults(func=cmd_cache)
+
+    p = sub.add_parser('backtest', help="score the model on every stored race")
+    p.add_argument('--seasons', default=None)
+    p.add_argument('--model', default='position')
+    p.add_argument('--workers', type=int, default=None)
+    p.add_argument('--output', default=None)
+    p.set_defaults(func=cmd_backtest)
+
+    p = sub.add_parser('benchmark', help="time pipeline stages on synthetic 10x / 100x / 1000x history")
+    p.add_argument('--scales', default='10,100,1000')
+    p.add_argument('--stages', default=None, help="comma-separated subset (default: all)")
+    p.add_argument('--repeat', type=int, default=3)
+    p.add_argument('--save', action='store_true', help="store the results as the new baseline")
+    p.set_defaults(func=cmd_benchmark)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
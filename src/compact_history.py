@@ -0,0 +1,221 @@
+# 📦 compact_history.py
+# Compact race history: int-coded entities, int16 positions, float32 values, one contiguous array set per season
+#
+# Each season is a directory of .npy files, one per column, next to the entity index
+# inside the store. Loading memory-maps them read-only, so app workers, backtests and
+# the API share one copy of the pages through the OS cache instead of each holding a
+# parsed frame. Driver / constructor / circuit codes are the EntityIndex IDs.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from feature_store import STORE_DIR, load_features, store_signature
+
+# === Config ===
+HISTORY_DIRNAME = '_history'  # pyarrow skips '_' paths, like the index
+MISSING = -1  # code / grid / position of a missing value
+
+# Column -> stored dtype ('season' is the directory)
+SCHEMA = {
+    'round': 'int16',
+    'date': 'datetime64[ns]',
+    'circuit': 'int16',
+    'driver': 'int32',
+    'constructor': 'int16',
+    'status': 'int16',
+    'grid': 'int16',
+    'position': 'int16',
+    'points': 'float32',
+    'qualifying_time': 'float32',
+    'air_temp': 'float32',
+    'track_temp': 'float32',
+    'humidity': 'float32',
+}
+ENTITIES = ('circuit', 'driver', 'constructor', 'status')
+INTEGERS = ('grid', 'position')
+
+
+def assign_ids(names, known):
+    """Extend `known` (ID order) with unseen names in first-seen order; return name -> ID."""
+    ids = {name: i for i, name in enumerate(known)}
+    for name in names:
+        if name not in ids and pd.notna(name):
+            ids[name] = len(known)
+            known.append(name)
+    return ids
+
+
+def save_arrays(path, arrays):
+    """One .npy per array, each replaced atomically, so they can be memory-mapped later."""
+    os.makedirs(path, exist_ok=True)
+    for name, values in arrays.items():
+        tmp_path = os.path.join(path, f"{name}.npy.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(values))
+        os.replace(tmp_path, os.path.join(path, f"{name}.npy"))
+
+
+def load_arrays(path, mmap=True):
+    return {
+        name[:-4]: np.load(os.path.join(path, name), mmap_mode='r' if mmap else None)
+        for name in sorted(os.listdir(path)) if name.endswith('.npy')
+    }
+
+
+class CompactHistory:
+    """Race history as per-season column arrays plus the entity vocabularies.
+
+    Rows keep the store order ((season, round), then file order). Entities are codes
+    into `vocab`, grid and position are int16 with MISSING for NaN, everything else is
+    float32; `to_frame()` turns it back into the store's pandas layout when needed.
+    """
+
+    def __init__(self, vocab, seasons, lengths=None, mmap=True):
+        self.vocab = vocab
+        # season -> {column: array}, or season -> directory of .npy files opened on access
+        self._seasons = seasons
+        self._lengths = lengths if lengths is not None else {s: len(arrays['round']) for s, arrays in seasons.items()}
+        self._mmap = mmap
+        self._lookup = {}
+
+    @classmethod
+    def from_frame(cls, df, vocab=None):
+        vocab = {kind: list((vocab or {}).get(kind, [])) for kind in ENTITIES}
+        # IDs are handed out in date order, as in the entity index
+        by_date = df.iloc[np.argsort(pd.to_datetime(df['date']).values, kind='stable')]
+        for kind in ENTITIES:
+            if kind in df.columns:
+                assign_ids(by_date[kind].astype(object).values, vocab[kind])
+
+        seasons = {}
+        for season, rows in df.groupby('season', sort=True):
+            arrays = {}
+            for col, dtype in SCHEMA.items():
+                if col in ENTITIES:
+                    values = pd.Index(vocab[col]).get_indexer(rows[col].astype(object).values) if col in rows else MISSING
+                elif col in INTEGERS:
+                    values = rows[col].fillna(MISSING).values if col in rows else MISSING
+                elif col == 'date':
+                    values = pd.to_datetime(rows[col]).values
+                else:
+                    values = rows[col].values if col in rows else np.nan
+                arrays[col] = np.broadcast_to(np.asarray(values), len(rows)).astype(dtype)
+            seasons[int(season)] = arrays
+        return cls(vocab, seasons)
+
+    # ---------------------- queries ----------------------
+
+    @property
+    def seasons(self):
+        return sorted(self._seasons)
+
+    def __len__(self):
+        return sum(self._lengths.values())
+
+    @property
+    def nbytes(self):
+        return len(self) * sum(np.dtype(dtype).itemsize for dtype in SCHEMA.values())
+
+    def _array(self, season, name):
+        arrays = self._seasons[season]
+        if isinstance(arrays, str):
+            return np.load(os.path.join(arrays, f"{name}.npy"), mmap_mode='r' if self._mmap else None)
+        return arrays[name]
+
+    def column(self, name, seasons=None):
+        """Raw stored values; a view for a single season, one concatenated copy otherwise."""
+        picked = [s for s in self.seasons if seasons is None or s in seasons]
+        if name == 'season':
+            parts = [np.full(self._lengths[s], s, dtype='int16') for s in picked]
+        else:
+            parts = [self._array(s, name) for s in picked]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.empty(0, SCHEMA.get(name, 'int16'))
+
+    def values(self, name, seasons=None):
+        """Numeric column as float with NaN for missing (grid / position / float columns)."""
+        values = self.column(name, seasons).astype('float64')
+        if name in INTEGERS:
+            values[values == MISSING] = np.nan
+        return values
+
+    def names(self, kind, seasons=None):
+        """Entity column as a pandas Categorical over the shared vocabulary (no per-row strings)."""
+        return pd.Categorical.from_codes(self.column(kind, seasons), categories=pd.Index(self.vocab[kind], dtype=object))
+
+    def codes(self, kind, names):
+        """Vocabulary codes for `names` (MISSING for unknown names)."""
+        if kind not in self._lookup:
+            self._lookup[kind] = pd.Index(self.vocab[kind], dtype=object)
+        return self._lookup[kind].get_indexer(np.asarray(names, dtype=object))
+
+    def to_frame(self, columns=None, seasons=None):
+        """The history as a store-like frame (categoricals, NaN for missing, qualifying_time in seconds)."""
+        out = {}
+        for col in columns or ['season'] + list(SCHEMA):
+            if col in ENTITIES:
+                out[col] = self.names(col, seasons)
+            elif col in ('season', 'round', 'date'):
+                out[col] = self.column(col, seasons)
+            else:
+                out[col] = self.values(col, seasons)
+        return pd.DataFrame(out)
+
+    # ---------------------- persistence ----------------------
+
+    def save(self, path, signature=None):
+        for season in self.seasons:
+            save_arrays(os.path.join(path, f"season={season}"), {col: self._array(season, col) for col in SCHEMA})
+        tmp_path = os.path.join(path, 'vocab.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'signature': signature, 'rows': {str(s): n for s, n in self._lengths.items()}, **self.vocab}, f, indent=1)
+        os.replace(tmp_path, os.path.join(path, 'vocab.json'))
+
+    @classmethod
+    def load(cls, path, seasons=None, mmap=True):
+        """The saved history; columns are only opened (memory-mapped by default) when read."""
+        with open(os.path.join(path, 'vocab.json')) as f:
+            meta = json.load(f)
+        lengths = {int(s): n for s, n in meta['rows'].items() if seasons is None or int(s) in seasons}
+        directories = {s: os.path.join(path, f"season={s}") for s in lengths}
+        return cls({kind: meta[kind] for kind in ENTITIES}, directories, lengths, mmap), meta.get('signature')
+
+
+def history_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, HISTORY_DIRNAME)
+
+
+def build_compact_history(store_dir=STORE_DIR):
+    """Rewrite the compact copy of the store, with codes from the (up to date) entity index."""
+    from entity_index import load_index
+
+    path = history_path(store_dir)
+    vocab = dict(load_index(store_dir).vocab)
+    if os.path.exists(os.path.join(path, 'vocab.json')):
+        with open(os.path.join(path, 'vocab.json')) as f:
+            vocab['status'] = json.load(f)['status']
+    history = CompactHistory.from_frame(load_features(store_dir=store_dir), vocab)
+    history.save(path, list(store_signature(store_dir)))
+    return history
+
+
+def load_compact_history(seasons=None, store_dir=STORE_DIR, mmap=True):
+    """Memory-mapped compact history of the store, rebuilt first if the store changed."""
+    path = history_path(store_dir)
+    if os.path.exists(os.path.join(path, 'vocab.json')):
+        history, signature = CompactHistory.load(path, seasons, mmap)
+        if signature == list(store_signature(store_dir)):
+            return history
+    build_compact_history(store_dir)
+    return CompactHistory.load(path, seasons, mmap)[0]
+
+
+if __name__ == "__main__":
+    history = build_compact_history()
+    frame_mb = load_features().memory_usage(deep=True).sum() / 1e6
+    print(f"✅ {len(history)} rows, {len(history.seasons)} seasons in {history_path()}: "
+          f"{history.nbytes / 1e6:.2f} MB of arrays (pandas frame: {frame_mb:.2f} MB)")
@@ -0,0 +1,219 @@
+# 📦 entity_index.py
+# Driver / constructor / circuit index: stable integer IDs, dated seats and per-entity result arrays
+#
+# Results are kept as one flat array per field, sorted by (entity, date), with an
+# offsets array marking where each entity starts (CSR layout). Every result also has a
+# composite key, entity * (number of race dates + 1) + rank of its date, so "as of a
+# date" for a whole batch of entities is a single vectorized binary search.
+# The arrays are saved as .npy files and memory-mapped when the index is loaded.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from compact_history import assign_ids, load_arrays, save_arrays
+from feature_store import STORE_DIR, load_features, store_signature
+
+# === Config ===
+INDEX_DIRNAME = '_index'  # pyarrow skips '_' paths, so the index can live inside the store
+INDEX_COLUMNS = ['season', 'round', 'date', 'circuit', 'driver', 'constructor', 'position']
+KINDS = ('driver', 'constructor', 'circuit')
+
+
+def _as_ns(date, n):
+    # One date for every row, or one per row, as int64 nanoseconds (NaT sorts first)
+    if np.ndim(date) == 0:
+        return np.full(n, pd.Timestamp(date).as_unit('ns').value, dtype='int64')
+    return pd.DatetimeIndex(date).as_unit('ns').asi8
+
+
+def pair_codes(drivers, circuits, n_circuits):
+    # One code per (driver, circuit) pair, -1 when either side is missing
+    return np.where((drivers >= 0) & (circuits >= 0), drivers * n_circuits + circuits, -1)
+
+
+class EntityIndex:
+    """Integer IDs and date-sorted result arrays for every driver, constructor and circuit.
+
+    IDs never change once assigned: pass the previous `vocab` and new entities are
+    appended in first-seen (date) order. A driver's seat on a date is the constructor
+    of their latest result on or before it, so mid-season team changes are followed.
+    Positions are stored as float16 (exact for whole numbers, NaN for unclassified).
+    """
+
+    def __init__(self, vocab, arrays):
+        self.vocab = vocab
+        self._ids = {kind: {name: i for i, name in enumerate(vocab[kind])} for kind in KINDS}
+        self._lookup = {}
+        self._arrays = arrays
+        self._span = len(arrays['dates']) + 1
+        # simulate_race.py encodes circuits by their rank in the sorted circuit list
+        self.circuit_rank = {name: i for i, name in enumerate(sorted(vocab['circuit']))}
+
+    @staticmethod
+    def encode(hist, vocab=None):
+        """(vocab, {kind: per-row IDs}) for the entity columns of `hist`, extending `vocab`."""
+        vocab = {kind: list((vocab or {}).get(kind, [])) for kind in KINDS}
+        by_date = hist.iloc[np.argsort(pd.to_datetime(hist['date']).values, kind='stable')]
+        codes = {}
+        for kind in KINDS:
+            if kind in hist.columns:
+                assign_ids(by_date[kind].astype(object).values, vocab[kind])
+                codes[kind] = pd.Index(vocab[kind], dtype=object).get_indexer(hist[kind].astype(object).values)
+        return vocab, codes
+
+    @classmethod
+    def from_history(cls, hist, vocab=None):
+        vocab, codes = cls.encode(hist, vocab)
+        positions = hist['position'].values.astype('float64')
+        return cls.from_codes(vocab, hist['date'].values, codes['driver'], codes['constructor'], positions)
+
+    @classmethod
+    def from_codes(cls, vocab, dates, drivers, constructors, positions, circuits=None, states=None):
+        """Build from already-encoded columns (IDs into `vocab`, -1 for none), e.g. a CompactHistory.
+
+        With `circuits`, (driver, circuit) pairs are indexed too, as kind 'driver_circuit'.
+        `states` ({kind: {name: (per-row values as of each row's date, per-entity values
+        after the last row)}}) are stored next to the positions and read with `state_at`.
+        """
+        dates = pd.to_datetime(dates).astype('datetime64[ns]').values.view('int64')
+        drivers = np.asarray(drivers, dtype='int64')
+        constructors = np.asarray(constructors, dtype='int64')
+        race_dates = np.unique(dates)
+        rank = np.searchsorted(race_dates, dates)
+        span = len(race_dates) + 1
+        entities = {'driver': (drivers, len(vocab['driver'])), 'constructor': (constructors, len(vocab['constructor']))}
+        if circuits is not None:
+            pairs = pair_codes(drivers, np.asarray(circuits, dtype='int64'), len(vocab['circuit']))
+            entities['driver_circuit'] = (pairs, len(vocab['driver']) * len(vocab['circuit']))
+        n_entities = max(size for _, size in entities.values())
+        key_dtype = 'int32' if (n_entities + 1) * span < np.iinfo('int32').max else 'int64'
+
+        arrays = {'dates': race_dates}
+        # Date order first (ties in file order); a stable sort then groups the rows by entity
+        order = np.argsort(dates, kind='stable')
+        for kind, (entity, size) in entities.items():
+            rows = order[np.argsort(entity[order], kind='stable')]
+            rows = rows[entity[rows] >= 0]
+            arrays[f'{kind}_offsets'] = np.searchsorted(entity[rows], np.arange(max(size, 1) + 1))
+            arrays[f'{kind}_keys'] = (entity[rows] * span + rank[rows]).astype(key_dtype)
+            arrays[f'{kind}_positions'] = np.asarray(positions)[rows].astype('float16')
+            if kind == 'driver':
+                arrays['driver_seats'] = constructors[rows].astype('int16')
+            for name, (values, final) in (states or {}).get(kind, {}).items():
+                arrays[f'{kind}_{name}'] = np.asarray(values)[rows]
+                arrays[f'{kind}_{name}_final'] = np.asarray(final)
+        return cls(vocab, arrays)
+
+    # ---------------------- lookups ----------------------
+
+    def id_of(self, kind, name):
+        return self._ids[kind].get(name, -1)
+
+    def ids_of(self, kind, names):
+        if kind not in self._lookup:
+            self._lookup[kind] = pd.Index(self.vocab[kind], dtype=object)
+        return self._lookup[kind].get_indexer(np.asarray(names, dtype=object)).astype('int64')
+
+    def pair_ids(self, drivers, circuits):
+        """IDs of (driver, circuit) pairs for the 'driver_circuit' kind (-1 if either is unknown)."""
+        return pair_codes(self.ids_of('driver', drivers), self.ids_of('circuit', circuits), len(self.vocab['circuit']))
+
+    def name_of(self, kind, entity_id):
+        return self.vocab[kind][entity_id] if entity_id >= 0 else None
+
+    def results(self, kind, name):
+        """(dates, positions) of one entity's results, oldest first."""
+        entity = self.id_of(kind, name)
+        if entity < 0:
+            return np.empty(0, 'int64'), np.empty(0, 'float16')
+        offsets = self._arrays[f'{kind}_offsets']
+        lo, hi = offsets[entity], offsets[entity + 1]
+        rank = self._arrays[f'{kind}_keys'][lo:hi] - entity * self._span
+        return self._arrays['dates'][rank], self._arrays[f'{kind}_positions'][lo:hi]
+
+    def _bounds(self, kind, entity, date, side):
+        # (first result, end of the results before `date`) per entity; `side='right'` includes the date itself
+        entity = np.where(entity >= 0, entity, 0)
+        offsets = self._arrays[f'{kind}_offsets']
+        rank = np.searchsorted(self._arrays['dates'], _as_ns(date, len(entity)), side=side)
+        end = np.searchsorted(self._arrays[f'{kind}_keys'], entity * self._span + rank, side='left')
+        return offsets[entity], offsets[entity + 1], end
+
+    def constructor_of(self, drivers, date=None):
+        """Each driver's constructor at their latest result on or before `date` (latest overall if None).
+
+        `date` is one date for every driver or one per driver. Drivers with no result
+        before their date get the team of their first result.
+        """
+        entity = self.ids_of('driver', drivers)
+        lo, hi, end = self._bounds('driver', entity, pd.Timestamp.max if date is None else date, 'right')
+        pos = np.maximum(end - 1, lo)
+        known = (entity >= 0) & (hi > lo)
+        seats = self._arrays['driver_seats'][np.where(known, pos, 0)] if known.any() else np.zeros(len(entity), 'int16')
+        names = np.array(self.vocab['constructor'] + [None], dtype=object)
+        return names[np.where(known & (seats >= 0), seats, -1)]
+
+    def state_at(self, kind, entity, date, name, fallback):
+        """Stored `name` value of each entity as of `date` (from earlier results only), else `fallback`.
+
+        That is the value stored with the entity's first result on or after `date`, or
+        its value after its last result. `entity` are IDs (see `ids_of` / `pair_ids`);
+        `date` is one date for every ID or one per ID.
+        """
+        lo, hi, end = self._bounds(kind, entity, date, 'left')
+        known = entity >= 0
+        out = np.full(len(entity), fallback, dtype='float64')
+        later = known & (end < hi)
+        out[later] = self._arrays[f'{kind}_{name}'][end[later]]
+        last = known & (end == hi) & (hi > lo)
+        out[last] = self._arrays[f'{kind}_{name}_final'][entity[last]]
+        return out
+
+    # ---------------------- persistence ----------------------
+
+    def save(self, path, signature=None):
+        save_arrays(os.path.join(path, 'arrays'), self._arrays)
+        with open(os.path.join(path, 'entities.json.tmp'), 'w') as f:
+            json.dump({'signature': signature, **self.vocab}, f, indent=1)
+        os.replace(os.path.join(path, 'entities.json.tmp'), os.path.join(path, 'entities.json'))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, 'entities.json')) as f:
+            meta = json.load(f)
+        arrays = load_arrays(os.path.join(path, 'arrays'), mmap)
+        return cls({kind: meta[kind] for kind in KINDS}, arrays), meta.get('signature')
+
+
+def index_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, INDEX_DIRNAME)
+
+
+def build_index(store_dir=STORE_DIR):
+    """Rebuild the persisted index from the store, keeping every previously assigned ID."""
+    path = index_path(store_dir)
+    vocab = None
+    if os.path.exists(os.path.join(path, 'entities.json')):
+        with open(os.path.join(path, 'entities.json')) as f:
+            vocab = json.load(f)
+    index = EntityIndex.from_history(load_features(columns=INDEX_COLUMNS, store_dir=store_dir), vocab)
+    index.save(path, list(store_signature(store_dir)))
+    return index
+
+
+def load_index(store_dir=STORE_DIR):
+    """The persisted index of the store, rebuilt first if the store changed since it was saved."""
+    path = index_path(store_dir)
+    if os.path.exists(os.path.join(path, 'arrays', 'dates.npy')):
+        index, signature = EntityIndex.load(path)
+        if signature == list(store_signature(store_dir)):
+            return index
+    return build_index(store_dir)
+
+
+if __name__ == "__main__":
+    index = build_index()
+    print(f"✅ Indexed {', '.join(f'{len(index.vocab[k])} {k}s' for k in KINDS)} in {index_path()}")
@@ -0,0 +1,209 @@
+# 📦 feature_store.py
+# Typed, season-partitioned Parquet feature store replacing the overlapping CSVs in data/
+#
+# One file per season (season=YYYY/part-0.parquet), rows sorted by round: a round
+# filter is answered from the row-group statistics instead of opening one tiny file
+# per race. Rewriting a round rewrites its season file.
+
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from instrumentation import count, span
+
+# === Config ===
+STORE_DIR = '../data/store'
+
+# Canonical sources, in order of precedence for a given (season, round)
+SOURCE_CSVS = {
+    'enriched_2024': '../data/f1_features_2024_enriched.csv',
+    'combined': '../data/f1_features_combined_with_features.csv',
+    'raw': '../data/f1_raw_2022_2024.csv',
+}
+
+PARTITIONING = ds.partitioning(pa.schema([('season', pa.int16())]), flavor='hive')
+SEASON_FILE = 'part-0.parquet'
+ROW_GROUP_ROWS = 4096
+
+# `season` lives in the directory name, `round` is the first column of every file
+SCHEMA = pa.schema([
+    ('date', pa.timestamp('ns')),
+    ('circuit', pa.dictionary(pa.int16(), pa.string())),
+    ('driver', pa.dictionary(pa.int16(), pa.string())),
+    ('driver_id', pa.dictionary(pa.int16(), pa.string())),
+    ('constructor', pa.dictionary(pa.int16(), pa.string())),
+    ('grid', pa.float64()),
+    ('position', pa.float64()),
+    ('status', pa.dictionary(pa.int16(), pa.string())),
+    ('points', pa.float64()),
+    ('qualifying_time', pa.duration('ms')),
+    ('air_temp', pa.float64()),
+    ('track_temp', pa.float64()),
+    ('humidity', pa.float64()),
+])
+COLUMNS = ['season', 'round'] + SCHEMA.names
+DURATION_COLUMNS = ['qualifying_time']
+
+# Ergast and FastF1 spell a few entities differently; store the FastF1 spelling
+DRIVER_ALIASES = {
+    'Sergio Pérez': 'Sergio Perez',
+    'Nico Hülkenberg': 'Nico Hulkenberg',
+    'Andrea Kimi Antonelli': 'Kimi Antonelli',
+}
+CONSTRUCTOR_ALIASES = {
+    'Red Bull': 'Red Bull Racing',
+    'Alpine F1 Team': 'Alpine',
+    'RB F1 Team': 'RB',
+    'Sauber': 'Kick Sauber',
+}
+
+
+def normalize_names(df):
+    df = df.copy()
+    df['driver'] = df['driver'].replace(DRIVER_ALIASES)
+    df['constructor'] = df['constructor'].replace(CONSTRUCTOR_ALIASES)
+    return df
+
+
+# ---------------------- build ----------------------
+
+def _read_sources(source_csvs=SOURCE_CSVS):
+    enriched = pd.read_csv(source_csvs['enriched_2024'])
+
+    combined = pd.read_csv(source_csvs['combined'])
+    combined = combined[combined['season'] == 2025]
+
+    # Ergast rows use race_name for the event, the FastF1 files call it circuit
+    raw = pd.read_csv(source_csvs['raw'])
+    raw['qualifying_time'] = raw[['Q1', 'Q2', 'Q3']].min(axis=1)
+    raw = raw.drop(columns=['circuit']).rename(columns={'race_name': 'circuit'})
+
+    return [enriched, combined, raw]
+
+
+def _typed(df):
+    # Cast the merged sources to the store schema in pandas terms
+    df = normalize_names(df)
+    out = pd.DataFrame({'season': df['season'].astype('int16'), 'round': df['round'].astype('int16')})
+    out['date'] = pd.to_datetime(df['date'], format='mixed').dt.normalize().astype('datetime64[ns]')
+    for col in ['circuit', 'driver', 'driver_id', 'constructor', 'status']:
+        out[col] = df[col].astype('category') if col in df.columns else pd.Categorical([None] * len(df))
+    for col in ['grid', 'position', 'points', 'air_temp', 'track_temp', 'humidity']:
+        out[col] = df[col].astype('float64') if col in df.columns else float('nan')
+    out['qualifying_time'] = pd.to_timedelta((df['qualifying_time'] * 1000).round(), unit='ms')
+    return out
+
+
+def build_frame(source_csvs=SOURCE_CSVS):
+    """One deduplicated, typed frame from the canonical CSVs (first source wins per round)."""
+    frames = []
+    seen = set()
+    for df in _read_sources(source_csvs):
+        keys = list(zip(df['season'], df['round']))
+        keep = [key not in seen for key in keys]
+        seen.update(keys)
+        frames.append(df[keep])
+    frame = _typed(pd.concat(frames, ignore_index=True))
+    frame = frame.drop_duplicates(['season', 'round', 'driver'])
+    return frame.sort_values(['season', 'round', 'position'], kind='mergesort').reset_index(drop=True)
+
+
+def _file_schema(schema):
+    return pa.schema([('round', pa.int16())] + list(schema))
+
+
+def _write_season(season_dir, table, schema, rounds):
+    # Existing rows of the other rounds, then the new ones, stably sorted by round and
+    # swapped in atomically so readers never see a half-written season
+    path = os.path.join(season_dir, SEASON_FILE)
+    existing = [pq.read_table(path, schema=_file_schema(schema))] if os.path.exists(path) else []
+    drop = pa.array(list(rounds), pa.int16())
+    existing = [t.filter(pc.invert(pc.is_in(t['round'], value_set=drop))) for t in existing]
+    table = pa.concat_tables(existing + [table])
+    table = table.take(pc.sort_indices(table, [('round', 'ascending')]))
+    os.makedirs(season_dir, exist_ok=True)
+    tmp_path = os.path.join(season_dir, f".{SEASON_FILE}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_ROWS)
+    os.replace(tmp_path, path)
+
+
+def write_rounds(frame, store_dir=STORE_DIR, schema=SCHEMA):
+    """Write (or replace) the (season, round)s present in `frame`, keeping the other rounds of their seasons."""
+    frame = frame.sort_values(['season', 'round'], kind='mergesort')
+    for col in DURATION_COLUMNS:
+        if col in schema.names:
+            frame[col] = pd.to_timedelta(frame[col]).astype('timedelta64[ms]')
+    for season, rows in frame.groupby('season', sort=True):
+        table = pa.Table.from_pandas(rows[['round'] + schema.names], preserve_index=False).cast(_file_schema(schema))
+        _write_season(os.path.join(store_dir, f"season={season}"), table, schema, rows['round'].unique())
+
+
+def build_store(store_dir=STORE_DIR, source_csvs=SOURCE_CSVS):
+    from compact_history import build_compact_history
+    from entity_index import build_index
+
+    frame = build_frame(source_csvs)
+    write_rounds(frame, store_dir)
+    build_index(store_dir)
+    build_compact_history(store_dir)
+    return frame
+
+
+# ---------------------- load ----------------------
+
+def open_dataset(store_dir=STORE_DIR, memory_map=True):
+    filesystem = fs.LocalFileSystem(use_mmap=memory_map)
+    return ds.dataset(os.path.abspath(store_dir), format='parquet', partitioning=PARTITIONING, filesystem=filesystem)
+
+
+def load_features(columns=None, seasons=None, rounds=None, filter=None, store_dir=STORE_DIR,
+                  memory_map=True, as_seconds=True):
+    """Read the store with column projection and partition / row filters pushed down.
+
+    `seasons` prunes whole season files and `rounds` row groups; `filter` is any extra
+    pyarrow expression. Durations come back in seconds unless `as_seconds=False`.
+    """
+    expr = filter
+    for name, values in (('season', seasons), ('round', rounds)):
+        if values is not None:
+            part = ds.field(name).isin(list(values))
+            expr = part if expr is None else expr & part
+
+    # Partition keys are always read so rows come back in (season, round) order
+    read_columns = None if columns is None else ['season', 'round'] + [c for c in columns if c not in ('season', 'round')]
+    dataset = open_dataset(store_dir, memory_map)
+    if not dataset.files:  # nothing written yet: `round` is a file column, so there is no schema to filter on
+        return pd.DataFrame(columns=columns or ['season', 'round'])
+    with span('read_store'):
+        df = dataset.to_table(columns=read_columns, filter=expr).to_pandas()
+    count('store_rows_scanned', len(df))
+    df = df.sort_values(['season', 'round'], kind='mergesort').reset_index(drop=True)
+    if columns is None:  # schema order, then season and round
+        df = df[[c for c in df.columns if c not in ('season', 'round')] + ['season', 'round']]
+    else:
+        df = df[columns]
+    if as_seconds:
+        for col in DURATION_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].dt.total_seconds()
+    return df
+
+
+def store_signature(store_dir=STORE_DIR):
+    # Changes whenever a partition is added or rewritten ('_' / '.' paths are not data)
+    stamps = []
+    for root, dirs, files in os.walk(store_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(('_', '.'))]
+        stamps.extend(os.path.getmtime(os.path.join(root, name)) for name in files if not name.startswith(('_', '.')))
+    return len(stamps), max(stamps, default=0.0)
+
+
+if __name__ == "__main__":
+    print("📥 Building feature store from CSVs...")
+    frame = build_store()
+    print(f"✅ Saved {len(frame)} rows ({frame.groupby('season')['round'].nunique().to_dict()} rounds) to {STORE_DIR}")
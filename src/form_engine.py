@@ -0,0 +1,104 @@
+# 📦 form_engine.py
+# Shared as-of form engine: trailing driver / constructor form for whole grids in one pass
+
+import numpy as np
+import pandas as pd
+
+from compact_history import CompactHistory
+from entity_index import EntityIndex, pair_codes
+from form_kernel import EWM_HALFLIFE, FALLBACK_FORM, FORM_KINDS, FORM_WINDOW, FormState, sequential_forms
+
+# === Defaults ===
+# The model's inputs; every column of form_columns() (EWM, driver-at-circuit) can be asked for
+FORM_COLUMNS = ['driver_form', 'constructor_form']
+
+
+class FormEngine:
+    """Race history indexed for as-of form queries on single grids and whole seasons.
+
+    `history` is a CompactHistory or a frame with season, round, date, driver,
+    constructor, position and optionally circuit. One pass of the form kernel
+    (form_kernel.py) gives every result its forms as of its date, and those plus the
+    forms after the last result are kept in the per-entity arrays of an `EntityIndex`:
+    a query for any number of (driver, date) rows is then a couple of vectorized
+    binary searches.
+    The windowed form is the mean of the last `window` results, or `fallback` when
+    fewer than `window` exist; ties on the same date keep file order. `columns` picks
+    the forms added to the targets.
+    """
+
+    def __init__(self, history, window=FORM_WINDOW, fallback=FALLBACK_FORM, halflife=EWM_HALFLIFE,
+                 columns=FORM_COLUMNS):
+        self.window = window
+        self.fallback = fallback
+        self.columns = list(columns)
+
+        if isinstance(history, CompactHistory):
+            vocab = history.vocab
+            dates, positions = history.column('date'), history.values('position')
+            codes = {kind: history.column(kind) for kind in ('driver', 'constructor', 'circuit')}
+            races = pd.DataFrame({'season': history.column('season'), 'round': history.column('round'),
+                                  'date': dates})
+        else:
+            vocab, codes = EntityIndex.encode(history[[c for c in ('date', 'driver', 'constructor', 'circuit')
+                                                       if c in history.columns]])
+            dates, positions = history['date'].values, history['position'].values.astype('float64')
+            races = history[['season', 'round', 'date']]
+
+        drivers = np.asarray(codes['driver'], dtype='int64')
+        circuits = np.asarray(codes['circuit'], dtype='int64') if 'circuit' in codes else np.full(len(drivers), -1)
+        entities = {'driver': drivers, 'constructor': codes['constructor'],
+                    'driver_circuit': pair_codes(drivers, circuits, len(vocab['circuit']))}
+        forms, state = sequential_forms(dates, entities, positions, FormState(FORM_KINDS, window, halflife), fallback)
+        states = {}
+        for kind in FORM_KINDS:
+            size = len(vocab['driver']) * len(vocab['circuit']) if kind == 'driver_circuit' else len(vocab[kind])
+            final = dict(zip(('form', 'ewm'), state.read_kind(kind, size, fallback)))
+            states[kind] = {stat: (forms[f'{kind}_{stat}'], final[stat]) for stat in ('form', 'ewm')}
+        self.index = EntityIndex.from_codes(vocab, dates, drivers, codes['constructor'], positions, circuits, states)
+
+        # First listed date per round
+        races = races.drop_duplicates(['season', 'round'])
+        self._race_dates = pd.Series(pd.to_datetime(races['date']).astype('datetime64[ns]').values,
+                                     index=pd.MultiIndex.from_frame(races[['season', 'round']].astype('int64')))
+
+    def race_date(self, season, round_no, default=None):
+        return self._race_dates.get((season, round_no), default)
+
+    def constructor_of(self, drivers, date=None):
+        return self.index.constructor_of(drivers, date)
+
+    def _add_forms(self, out, dates):
+        drivers = out['driver'].values
+        constructors = out['constructor'].values if 'constructor' in out.columns else self.constructor_of(drivers, dates)
+        circuits = out['circuit'].values if 'circuit' in out.columns else np.full(len(out), None, dtype=object)
+        entities = {
+            'driver': self.index.ids_of('driver', drivers),
+            'constructor': self.index.ids_of('constructor', constructors),
+            'driver_circuit': self.index.pair_ids(drivers, circuits),
+        }
+        for column in self.columns:
+            kind, stat = column.rsplit('_', 1)
+            out[column] = self.index.state_at(kind, entities[kind], dates, stat, self.fallback)
+        return out
+
+    def compute_batch(self, targets, race_date=None):
+        """Add the form columns to `targets`, one row per (race, driver).
+
+        Each row is dated by `race_date`, its own `date` column or its `season` / `round`
+        (in that order); a missing `constructor` column is filled with each driver's
+        seat on that date. Driver-at-circuit forms need a `circuit` column.
+        """
+        out = targets.copy()
+        if race_date is not None:
+            dates = race_date
+        elif 'date' in out.columns:
+            dates = pd.to_datetime(out['date']).values
+        else:
+            keys = pd.MultiIndex.from_arrays([out['season'].values.astype('int64'), out['round'].values.astype('int64')])
+            dates = self._race_dates.reindex(keys).values
+        return self._add_forms(out, dates)
+
+    def compute(self, grid, race_date):
+        """Forms for a single race grid as of `race_date` (same values as `compute_batch`)."""
+        return self._add_forms(grid.copy(), race_date)
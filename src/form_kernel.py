@@ -0,0 +1,169 @@
+# 📦 form_kernel.py
+# Sequential as-of form kernel: one walk over the date-sorted history, O(1) state update per result
+#
+# Every entity (driver, constructor, driver-at-circuit) carries a ring buffer of its
+# last `window` results and the running sums of an exponentially weighted mean. Rows
+# are visited in date order and all rows of a race date read the state before any of
+# them updates it, so a form never includes its own race (nor a teammate's result in
+# it). The training features (generate_2024_features.py) and inference (FormEngine)
+# both come from this kernel, so "form" has a single definition.
+
+import numpy as np
+import pandas as pd
+
+# === Config ===
+FORM_WINDOW = 3
+EWM_HALFLIFE = 3.0  # races
+FALLBACK_FORM = 10.0
+FORM_KINDS = ('driver', 'constructor', 'driver_circuit')
+
+
+def form_columns(kinds=FORM_KINDS):
+    return [f'{kind}_{stat}' for kind in kinds for stat in ('form', 'ewm')]
+
+
+class FormState:
+    """Running form state of every entity, one row per (entity, kind).
+
+    Kinds are interleaved (row = code * len(kinds) + kind), so new entities of any
+    kind only ever append rows. The windowed form is the mean of the last `window`
+    results (NaN if one of them is unclassified) and needs `window` results; the
+    exponentially weighted form skips unclassified results and needs one.
+    """
+
+    def __init__(self, kinds=FORM_KINDS, window=FORM_WINDOW, halflife=EWM_HALFLIFE):
+        self.kinds = tuple(kinds)
+        self.window = window
+        self.halflife = halflife
+        self.decay = 0.5 ** (1.0 / halflife)
+        self.recent = np.zeros((0, window))
+        self.count = np.zeros(0, dtype='int64')
+        self.num = np.zeros(0)
+        self.den = np.zeros(0)
+
+    def __len__(self):
+        return len(self.count)
+
+    def reserve(self, size):
+        grow = size - len(self)
+        if grow > 0:
+            self.recent = np.vstack([self.recent, np.zeros((grow, self.window))])
+            self.count = np.concatenate([self.count, np.zeros(grow, dtype='int64')])
+            self.num = np.concatenate([self.num, np.zeros(grow)])
+            self.den = np.concatenate([self.den, np.zeros(grow)])
+
+    def read(self, rows, fallback=FALLBACK_FORM):
+        """(windowed, ewm) form of `rows` as of now."""
+        full = self.count[rows] >= self.window
+        form = np.where(full, self.recent[rows].sum(axis=1) / self.window, fallback)
+        den = self.den[rows]
+        with np.errstate(invalid='ignore'):
+            ewm = np.where(den > 0, self.num[rows] / den, fallback)
+        return form, ewm
+
+    def read_kind(self, kind, size, fallback=FALLBACK_FORM):
+        """(windowed, ewm) form of entity codes 0..size-1 of `kind`."""
+        rows = np.arange(size) * len(self.kinds) + self.kinds.index(kind)
+        self.reserve(size * len(self.kinds))
+        return self.read(rows, fallback)
+
+    def update(self, rows, positions):
+        """Add one result to each of `rows` (no duplicates)."""
+        self.recent[rows, self.count[rows] % self.window] = positions
+        self.count[rows] += 1
+        classified = ~np.isnan(positions)
+        rows, positions = rows[classified], positions[classified]
+        self.num[rows] = positions + self.decay * self.num[rows]
+        self.den[rows] = 1.0 + self.decay * self.den[rows]
+
+    # ---------------------- persistence ----------------------
+
+    def to_json(self, vocab):
+        """{kind: {name: {'recent', 'num', 'den'}}} with `vocab[kind]` giving each code's name."""
+        out = {}
+        for k, kind in enumerate(self.kinds):
+            out[kind] = {}
+            for code, name in enumerate(vocab.get(kind, [])):
+                row = code * len(self.kinds) + k
+                if row >= len(self) or self.count[row] == 0:
+                    continue
+                n = int(min(self.count[row], self.window))
+                slots = (self.count[row] - n + np.arange(n)) % self.window  # oldest first
+                recent = [None if np.isnan(p) else float(p) for p in self.recent[row, slots]]
+                out[kind][name] = {'recent': recent, 'num': float(self.num[row]), 'den': float(self.den[row])}
+        return out
+
+    @classmethod
+    def from_json(cls, data, vocab, kinds=FORM_KINDS, window=FORM_WINDOW, halflife=EWM_HALFLIFE):
+        state = cls(kinds, window, halflife)
+        state.reserve(max((len(vocab.get(kind, [])) for kind in kinds), default=0) * len(kinds))
+        for k, kind in enumerate(kinds):
+            for code, name in enumerate(vocab.get(kind, [])):
+                entry = data.get(kind, {}).get(name)
+                if entry is None:
+                    continue
+                row = code * len(kinds) + k
+                recent = np.array([np.nan if p is None else p for p in entry['recent']], dtype='float64')
+                state.recent[row, :len(recent)] = recent
+                state.count[row] = len(recent)
+                state.num[row], state.den[row] = entry['num'], entry['den']
+        return state
+
+
+def sequential_forms(dates, codes, positions, state=None, fallback=FALLBACK_FORM, **params):
+    """Walk the rows once in date order (ties in row order) and return (forms, state).
+
+    `codes` maps each kind to per-row entity codes (-1: none). `forms` holds every
+    row's `form_columns(kinds)` as of its race date, i.e. from earlier dates only, in
+    row order; the returned `state` has every result in and continues with later rows
+    when passed back in.
+    """
+    state = state or FormState(**params)
+    kinds = state.kinds
+    n, width = len(positions), len(kinds)
+    dates = pd.to_datetime(pd.Series(dates)).astype('datetime64[ns]').values.view('int64')
+
+    # One flat slot per (row, kind); slots without an entity are skipped
+    rows = np.full((n, width), -1, dtype='int64')
+    for k, kind in enumerate(kinds):
+        entity = np.asarray(codes.get(kind, rows[:, k]), dtype='int64')
+        rows[:, k] = np.where(entity >= 0, entity * width + k, -1)
+    slots = np.flatnonzero(rows.ravel() >= 0)
+    rows = rows.ravel()[slots]
+    values = np.asarray(positions, dtype='float64')[slots // width]
+    day = np.searchsorted(np.unique(dates), dates)[slots // width]
+    state.reserve(rows.max() + 1 if len(rows) else 0)
+
+    # Teammates share a constructor on the same date, so each date is applied in layers:
+    # every entity's first result of the day, then the second ones, ... (file order kept)
+    key = day * (len(state) + 1) + rows
+    by_entity = np.argsort(key, kind='stable')
+    key = key[by_entity]
+    first = np.flatnonzero(np.diff(key, prepend=-1))
+    layer = np.empty(len(rows), dtype='int64')
+    layer[by_entity] = np.arange(len(rows)) - np.repeat(first, np.diff(np.append(first, len(rows))))
+    del key, by_entity, first
+    order = np.argsort(day * (layer.max(initial=0) + 1) + layer, kind='stable')
+    rows, values, day, layer, slots = rows[order], values[order], day[order], layer[order], slots[order]
+    del order
+
+    new_day = np.diff(day, prepend=-1) != 0
+    cuts = np.flatnonzero(new_day | (np.diff(layer, prepend=-1) != 0))
+    bounds = np.append(cuts, len(rows))
+    day_ends = np.searchsorted(day, day[cuts], side='right')
+
+    form, ewm = np.empty(len(rows)), np.empty(len(rows))
+    for lo, hi, day_end in zip(bounds[:-1], bounds[1:], day_ends):
+        if new_day[lo]:
+            form[lo:day_end], ewm[lo:day_end] = state.read(rows[lo:day_end], fallback)
+        state.update(rows[lo:hi], values[lo:hi])
+
+    # Back to (row, kind) in the caller's row order
+    forms = {}
+    for stat, flat in (('form', form), ('ewm', ewm)):
+        grid = np.full(n * width, fallback)
+        grid[slots] = flat
+        grid = grid.reshape(n, width)
+        for k, kind in enumerate(kinds):
+            forms[f'{kind}_{stat}'] = grid[:, k]
+    return forms, state
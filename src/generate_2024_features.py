@@ -1,41 +1,152 @@
 # 📄 generate_features_from_base.py
 # Adds engineered features like driver_form, constructor_form, circuit_encoded, grid_advantage
+#
+# Forms come from the sequential kernel in form_kernel.py, the same definition the
+# FormEngine serves at inference: windowed and exponentially weighted driver,
+# constructor and driver-at-circuit form, each strictly from earlier race dates.
+# Incremental by default: the kernel state (last results and EWM sums per entity) and
+# the circuit vocabulary are persisted, so a post-race run only processes the new
+# rounds and appends them. `--full` rebuilds from scratch and produces the same bytes.
+
+import argparse
+import json
+import os
 
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
+
+from compact_history import assign_ids
+from feature_store import load_features
+from form_kernel import EWM_HALFLIFE, FORM_KINDS, FORM_WINDOW, FormState, form_columns, sequential_forms
 
 # === Config ===
-INPUT_CSV = "../data/f1_features_2024_enriched.csv"
+SEASONS = [2024]
 OUTPUT_CSV = "../data/f1_features_2024_with_features.csv"
+STATE_JSON = "../data/f1_features_2024_state.json"
+CIRCUIT_VOCAB_JSON = "../data/circuit_vocab.json"
+
+BASE_COLUMNS = [
+    'date', 'season', 'round', 'circuit', 'driver', 'constructor', 'grid', 'position',
+    'qualifying_time', 'air_temp', 'track_temp', 'humidity'
+]
+
+
+# === State ===
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def empty_state():
+    return {'processed': [], 'window': FORM_WINDOW, 'halflife': EWM_HALFLIFE, 'forms': {}}
+
+
+def state_matches(state):
+    # Older state files (or other form settings) can't be continued
+    return 'forms' in state and (state['window'], state['halflife']) == (FORM_WINDOW, EWM_HALFLIFE)
+
+
+def load_circuit_vocab(path=CIRCUIT_VOCAB_JSON):
+    # Codes are assigned in first-seen order and never change once written
+    return load_json(path, [])
+
+
+# === Feature computation ===
+def add_features(df, state, circuits):
+    """Engineer features for `df` (date-ordered) on top of the form state; updates both."""
+    codes = {name: i for i, name in enumerate(circuits)}
+    circuit_encoded = []
+    for circuit in df['circuit']:
+        if circuit not in codes:
+            codes[circuit] = len(circuits)
+            circuits.append(circuit)
+        circuit_encoded.append(codes[circuit])
+
+    # Entities are keyed by name in the state file; codes only live for this run
+    entities = {
+        'driver': df['driver'].values,
+        'constructor': df['constructor'].values,
+        'driver_circuit': (df['driver'].astype(str) + ' @ ' + df['circuit'].astype(str)).values,
+    }
+    vocab = {kind: list(state['forms'].get(kind, {})) for kind in FORM_KINDS}
+    for kind, names in entities.items():
+        assign_ids(names, vocab[kind])
+    ids = {kind: pd.Index(vocab[kind], dtype=object).get_indexer(names) for kind, names in entities.items()}
+    forms = FormState.from_json(state['forms'], vocab, FORM_KINDS, state['window'], state['halflife'])
+    before, forms = sequential_forms(df['date'].values, ids, df['position'].values.astype('float64'), forms)
+
+    out = df[BASE_COLUMNS].copy()
+    out['circuit_encoded'] = circuit_encoded
+    out['driver_form'] = before['driver_form']
+    out['constructor_form'] = before['constructor_form']
+
+    # === Grid Advantage (lower is better) ===
+    # Against the driver's form, not the race result, exactly as at prediction time
+    out['grid_advantage'] = out['grid'] - out['driver_form']
+    for column in form_columns():
+        if column not in out.columns:
+            out[column] = before[column]
+
+    state['forms'] = forms.to_json(vocab)
+    state['processed'] += [[int(s), int(r)] for s, r in out[['season', 'round']].drop_duplicates().values]
+    return out
+
+
+def load_rounds(seasons, skip=()):
+    df = load_features(columns=BASE_COLUMNS, seasons=seasons)
+    if skip:
+        done = pd.MultiIndex.from_tuples([tuple(k) for k in skip])
+        df = df[~pd.MultiIndex.from_arrays([df['season'], df['round']]).isin(done)]
+    df = df.sort_values(['date', 'season', 'round'], kind='mergesort').reset_index(drop=True)
+    for col in ['circuit', 'driver', 'constructor']:
+        df[col] = df[col].astype(object)
+    return df
+
+
+def write_rows(out, path, append):
+    out = out.copy()
+    out['date'] = out['date'].dt.strftime('%Y-%m-%d')
+    out.to_csv(path, index=False, mode='a' if append else 'w', header=not append)
+
+
+def build(full=False):
+    state = load_json(STATE_JSON, None)
+    if full or state is None or not state_matches(state) or not os.path.exists(OUTPUT_CSV):
+        state, full = empty_state(), True
+
+    print("📥 Loading data...")
+    df = load_rounds(SEASONS, skip=state['processed'])
+    if df.empty:
+        print("✅ No new rounds to process")
+        return
+
+    # Form state only moves forward; an older round showing up needs a rebuild
+    if not full and state['processed']:
+        last = max(tuple(k) for k in state['processed'])
+        if min(zip(df['season'], df['round'])) < last:
+            print("↩️ Out-of-order round found, rebuilding from scratch")
+            return build(full=True)
+
+    print("📊 Calculating features for", df[['season', 'round']].drop_duplicates().shape[0], "round(s)...")
+    circuits = load_circuit_vocab()
+    out = add_features(df, state, circuits)
+
+    print("💾 Saving with engineered features...")
+    write_rows(out, OUTPUT_CSV, append=not full)
+    save_json(CIRCUIT_VOCAB_JSON, circuits)
+    save_json(STATE_JSON, state)
+    print(f"✅ Saved: {OUTPUT_CSV}")
+
 
-# === Load base/enriched data ===
-print("📥 Loading data...")
-df = pd.read_csv(INPUT_CSV)
-df['date'] = pd.to_datetime(df['date'])
-
-# === Encode circuit names ===
-print("🔤 Encoding circuit names...")
-circuit_encoder = LabelEncoder()
-df['circuit_encoded'] = circuit_encoder.fit_transform(df['circuit'])
-
-# === Driver and Constructor Form ===
-print("📊 Calculating driver and constructor form...")
-df = df.sort_values(by=['driver', 'date'])
-df['driver_form'] = (
-    df.groupby('driver')['position']
-    .transform(lambda x: x.shift(1).rolling(window=3, min_periods=1).mean())
-)
-
-df = df.sort_values(by=['constructor', 'date'])
-df['constructor_form'] = (
-    df.groupby('constructor')['position']
-    .transform(lambda x: x.shift(1).rolling(window=3, min_periods=1).mean())
-)
-
-# === Grid Advantage (lower is better) ===
-df['grid_advantage'] = df['grid'] - df['position']
-
-# === Save final feature set ===
-print("💾 Saving with engineered features...")
-df.to_csv(OUTPUT_CSV, index=False)
-print(f"✅ Saved: {OUTPUT_CSV}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build engineered features")
+    parser.add_argument('--full', action='store_true', help="rebuild every round instead of appending new ones")
+    build(full=parser.parse_args().full)
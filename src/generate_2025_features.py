@@ -1,46 +1,14 @@
-import requests
 import pandas as pd
-from tqdm import tqdm
+
+from ingest import ingest_results
 
 # ------------------------
 # Generate 2025 F1 Data
 # ------------------------
 
-def fetch_2025_race_data(upto_round=7):
-    all_data = []
-
-    for rnd in tqdm(range(1, upto_round + 1)):
-        url = f"https://ergast.com/api/f1/2025/{rnd}/results.json?limit=100"
-        resp = requests.get(url)
-        data = resp.json()
-
-        try:
-            race = data['MRData']['RaceTable']['Races'][0]
-            date = race['date']
-            circuit = race['Circuit']['circuitName']
-            season = int(race['season'])
-            round_no = int(race['round'])
-
-            for result in race['Results']:
-                driver_name = f"{result['Driver']['givenName']} {result['Driver']['familyName']}"
-                constructor = result['Constructor']['name']
-                position = int(result['position'])
-
-                all_data.append({
-                    'date': date,
-                    'season': season,
-                    'round': round_no,
-                    'circuit': circuit,
-                    'driver': driver_name,
-                    'constructor': constructor,
-                    'position': position
-                })
-
-        except (IndexError, KeyError):
-            print(f"⚠️ Could not fetch data for round {rnd}.")
-            continue
-
-    return pd.DataFrame(all_data)
+def fetch_2025_race_data(upto_round=7, source=None):
+    # All rounds fetched in parallel through the shared ingestion cache
+    return ingest_results([2025], range(1, upto_round + 1), source=source)
 
 if __name__ == "__main__":
     df_2025 = fetch_2025_race_data(upto_round=7)
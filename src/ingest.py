@@ -0,0 +1,311 @@
+# 📦 ingest.py
+# Historical results ingestion: pluggable sources, pooled parallel fetches, content-addressed cache
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from cache_manager import CACHE_ROOT, file_lock, lock_path
+from ranges import parse_range
+
+# === Config ===
+# ergast.com is gone; jolpica serves the same Ergast-shaped JSON
+DEFAULT_BASE_URL = 'https://api.jolpi.ca/ergast/f1'
+RESPONSE_CACHE_DIR = os.path.join(CACHE_ROOT, 'ingest')
+FIXTURE_DIR = '../data/fixtures/ergast'
+KINDS = ('results', 'qualifying')
+MAX_WORKERS = 8
+
+
+# ---------------------- sources ----------------------
+# Every source returns the raw Ergast-shaped JSON bytes for one (season, round, kind)
+
+class HttpSource:
+    """Ergast-compatible HTTP API (the public mirror or a local stand-in server)."""
+
+    name = 'http'
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, timeout=10, retries=3, pool_size=MAX_WORKERS):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch(self, season, round_no, kind):
+        url = f"{self.base_url}/{season}/{round_no}/{kind}.json?limit=100"
+        resp = self.session.get(url, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.content
+
+
+class ReplaySource:
+    """Directory of recorded responses laid out as <season>/<round>/<kind>.json."""
+
+    name = 'replay'
+
+    def __init__(self, directory=FIXTURE_DIR):
+        self.directory = directory
+
+    def fetch(self, season, round_no, kind):
+        with open(os.path.join(self.directory, str(season), str(round_no), f"{kind}.json"), 'rb') as f:
+            return f.read()
+
+
+class FastF1Source:
+    """Builds Ergast-shaped payloads from FastF1 session results."""
+
+    name = 'fastf1'
+
+    def fetch(self, season, round_no, kind):
+        import fastf1
+
+        from cache_manager import load_session
+
+        session = fastf1.get_session(season, round_no, 'R' if kind == 'results' else 'Q')
+        load_session(session, laps=False, telemetry=False, weather=False, messages=False)
+        race = {
+            'season': str(season),
+            'round': str(round_no),
+            'raceName': session.event['EventName'],
+            'Circuit': {'circuitName': session.event['Location']},
+            'date': str(session.date.date()),
+        }
+        entries = []
+        for _, r in session.results.iterrows():
+            entry = {
+                'position': None if pd.isna(r['Position']) else str(int(r['Position'])),
+                'Driver': {'driverId': r['DriverId'], 'givenName': r['FirstName'], 'familyName': r['LastName']},
+                'Constructor': {'name': r['TeamName']},
+            }
+            if kind == 'results':
+                entry.update(grid=str(int(r['GridPosition'])), status=r['Status'], points=str(r['Points']))
+            else:
+                entry.update({q: _format_lap(r[q]) for q in ('Q1', 'Q2', 'Q3') if pd.notna(r[q])})
+            entries.append(entry)
+        race['Results' if kind == 'results' else 'QualifyingResults'] = entries
+        payload = {'MRData': {'RaceTable': {'season': str(season), 'round': str(round_no), 'Races': [race]}}}
+        return json.dumps(payload).encode()
+
+
+def _format_lap(lap_time):
+    mins, secs = divmod(lap_time.total_seconds(), 60)
+    return f"{int(mins)}:{secs:06.3f}"
+
+
+SOURCES = {'http': HttpSource, 'replay': ReplaySource, 'fastf1': FastF1Source}
+
+
+def make_source(name='http', **kwargs):
+    return SOURCES[name](**kwargs)
+
+
+# ---------------------- response cache ----------------------
+
+class ResponseCache:
+    """Content-addressed store: objects/<sha256> plus an index of request key -> digest.
+
+    Identical payloads are stored once, and a re-fetch that returns the same bytes
+    leaves the store untouched. Several ingests may share one cache: each merges the
+    keys it wrote into the index on disk under a file lock.
+    """
+
+    def __init__(self, root=RESPONSE_CACHE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        self._lock = threading.Lock()
+        self._index = {}
+        self._written = set()
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self._index = json.load(f)
+
+    @staticmethod
+    def key(source_name, season, round_no, kind):
+        return f"{source_name}/{season}/{round_no}/{kind}"
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest)
+
+    def get(self, key):
+        digest = self._index.get(key)
+        if digest is None or not os.path.exists(self._object_path(digest)):
+            return None
+        with open(self._object_path(digest), 'rb') as f:
+            return f.read()
+
+    def put(self, key, content):
+        """Store `content` under `key`; returns True when the payload changed."""
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        with self._lock:
+            changed = self._index.get(key) != digest
+            self._index[key] = digest
+            self._written.add(key)
+        return changed
+
+    def save_index(self):
+        # Read-modify-write of the shared index: only the keys written here replace entries on disk
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, file_lock(lock_path('ingest_index', self.root)):
+            index = {}
+            if os.path.exists(self.index_path):
+                with open(self.index_path) as f:
+                    index = json.load(f)
+            index.update({key: self._index[key] for key in self._written})
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(index, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.index_path)
+            self._index.update(index)
+            self._written.clear()
+
+
+# ---------------------- fetcher ----------------------
+
+def _races(payload):
+    return payload['MRData']['RaceTable']['Races']
+
+
+def _parse(content):
+    # JSON with a race in it, else None (error page, truncated body, round not run yet)
+    try:
+        payload = json.loads(content)
+        return payload if _races(payload) else None
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def fetch_payloads(targets, source=None, cache=None, max_workers=MAX_WORKERS, refresh=False):
+    """Fetch many (season, round, kind) payloads through a bounded thread pool.
+
+    Only payloads that parse and have a race in them are cached; they are final and
+    are not requested again unless `refresh` is set. Returns {(season, round, kind):
+    parsed JSON, or None when the fetch failed or the round has no data yet}.
+    """
+    source = source or make_source()
+    cache = cache or ResponseCache()
+
+    def fetch_one(target):
+        key = cache.key(source.name, *target)
+        content = None if refresh else cache.get(key)
+        payload = None if content is None else _parse(content)
+        if payload is not None:
+            return payload
+        try:
+            content = source.fetch(*target)
+        except (requests.RequestException, OSError, ValueError) as exc:
+            print(f"⚠️ Could not fetch {key}: {exc}")
+            return None
+        payload = _parse(content)
+        if payload is not None:
+            cache.put(key, content)
+        return payload
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        payloads = dict(zip(targets, pool.map(fetch_one, targets)))
+    cache.save_index()
+    return payloads
+
+
+def fetch_round(season, round_no, kinds=KINDS, **kwargs):
+    payloads = fetch_payloads([(season, round_no, kind) for kind in kinds], **kwargs)
+    return [payloads[(season, round_no, kind)] for kind in kinds]
+
+
+# ---------------------- parsing ----------------------
+
+def parse_results(payload):
+    rows = []
+    try:
+        race = _races(payload)[0]
+    except (IndexError, KeyError, TypeError):
+        return rows
+
+    for result in race['Results']:
+        rows.append({
+            'date': race['date'],
+            'season': int(race['season']),
+            'round': int(race['round']),
+            'circuit': race['Circuit']['circuitName'],
+            'driver': f"{result['Driver']['givenName']} {result['Driver']['familyName']}",
+            'constructor': result['Constructor']['name'],
+            'position': float('nan') if result.get('position') is None else int(result['position'])
+        })
+    return rows
+
+
+def ingest_results(seasons, rounds, **kwargs):
+    """Race results for every (season, round) as one DataFrame."""
+    targets = [(season, rnd, 'results') for season in seasons for rnd in rounds]
+    payloads = fetch_payloads(targets, **kwargs)
+
+    all_data = []
+    for (season, rnd, _), payload in payloads.items():
+        rows = parse_results(payload)
+        if not rows:
+            print(f"⚠️ Could not fetch data for {season} round {rnd}.")
+        all_data.extend(rows)
+    return pd.DataFrame(all_data)
+
+
+# ---------------------- local stand-in server ----------------------
+
+def serve_replay(directory=FIXTURE_DIR, host='127.0.0.1', port=8000):
+    """Serve a replay directory with Ergast-style URLs (/<season>/<round>/<kind>.json)."""
+
+    class ReplayHandler(SimpleHTTPRequestHandler):
+        def translate_path(self, path):
+            return super().translate_path(path.split('?', 1)[0])
+
+    server = ThreadingHTTPServer((host, port), partial(ReplayHandler, directory=directory))
+    print(f"🛰️ Serving {directory} on http://{host}:{port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest historical race results")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    fetch = sub.add_parser('fetch', help="fetch results into a CSV")
+    fetch.add_argument('--seasons', default='2022-2025')
+    fetch.add_argument('--rounds', default='1-24')
+    fetch.add_argument('--source', choices=sorted(SOURCES), default='http')
+    fetch.add_argument('--base-url', default=DEFAULT_BASE_URL)
+    fetch.add_argument('--replay-dir', default=FIXTURE_DIR)
+    fetch.add_argument('--workers', type=int, default=MAX_WORKERS)
+    fetch.add_argument('--refresh', action='store_true')
+    fetch.add_argument('--output', default='../data/f1_results_ingested.csv')
+
+    serve = sub.add_parser('serve', help="serve a replay directory as a local Ergast stand-in")
+    serve.add_argument('--replay-dir', default=FIXTURE_DIR)
+    serve.add_argument('--port', type=int, default=8000)
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        serve_replay(args.replay_dir, port=args.port)
+    else:
+        source_args = {'http': {'base_url': args.base_url}, 'replay': {'directory': args.replay_dir}}
+        source = make_source(args.source, **source_args.get(args.source, {}))
+        df = ingest_results(parse_range(args.seasons), parse_range(args.rounds),
+                            source=source, max_workers=args.workers, refresh=args.refresh)
+        df.to_csv(args.output, index=False)
+        print(f"✅ Saved {len(df)} rows to {args.output}")
@@ -0,0 +1,178 @@
+# 📦 instrumentation.py
+# Named spans and counters for the hot paths, collected per request and logged as JSON lines
+#
+#   with trace('simulate', season=2025, round=8) as t:
+#       service.simulate(2025, 8)
+#   t.to_frame()   # one row per span, plus counters in t.counters
+#
+# Outside a `trace()` block `span()` and `count()` are no-ops, so library code can be
+# instrumented unconditionally.
+
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# === Config ===
+TIMINGS_LOG = os.environ.get('F1_TIMINGS_LOG', '../logs/timings.jsonl')
+PROFILE_ENV = 'F1_PROFILE'
+PROFILE_TOP = 25
+
+_current = contextvars.ContextVar('trace', default=None)
+# Per context, so spans opened by worker threads (run in a copy of the caller's
+# context) nest under the caller's span without moving each other's depth
+_depth = contextvars.ContextVar('span_depth', default=0)
+_log_lock = threading.Lock()
+# Only one cProfile can be active per process; concurrent traces skip profiling
+_profile_lock = threading.Lock()
+
+
+class Trace:
+    """Spans, counters and optional profiler output for one traced operation."""
+
+    def __init__(self, name, **tags):
+        self.name = name
+        self.tags = tags
+        self.spans = []
+        self.counters = {}
+        self.profile = None
+        self.peak_mb = None
+        self.seconds = None
+
+    def add_span(self, name, seconds, depth):
+        self.spans.append({'span': name, 'seconds': seconds, 'depth': depth})
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self):
+        return {
+            'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'trace': self.name,
+            'tags': self.tags,
+            'seconds': self.seconds,
+            'spans': self.spans,
+            'counters': self.counters,
+            'peak_mb': self.peak_mb,
+            'profile': self.profile,
+        }
+
+    def to_frame(self):
+        # Indented span names show nesting in a flat table
+        rows = [{'stage': '  ' * s['depth'] + s['span'], 'ms': s['seconds'] * 1000} for s in self.spans]
+        rows.append({'stage': 'total', 'ms': (self.seconds or 0.0) * 1000})
+        return pd.DataFrame(rows)
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block as a stage of the current trace."""
+    trace_ = _current.get()
+    if trace_ is None:
+        yield
+        return
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _depth.reset(token)
+        trace_.add_span(name, time.perf_counter() - start, depth)
+
+
+def count(name, n=1):
+    """Add `n` to a counter of the current trace (cache hits, rows scanned, ...)."""
+    trace_ = _current.get()
+    if trace_ is not None:
+        trace_.count(name, n)
+
+
+@contextmanager
+def trace(name, profile=None, memory=None, log_path=TIMINGS_LOG, **tags):
+    """Collect spans and counters for the enclosed block and append them to `log_path`.
+
+    `profile` adds the top cProfile entries and `memory` the tracemalloc peak; both
+    default to on when the F1_PROFILE environment variable is set. Profiling is
+    skipped (and noted in `profile`) while another trace or tool is profiling. Spans
+    are listed in completion order (inner stages before the stage that contains them).
+    """
+    enabled = bool(os.environ.get(PROFILE_ENV))
+    profile = enabled if profile is None else profile
+    memory = enabled if memory is None else memory
+
+    trace_ = Trace(name, **tags)
+    token = _current.set(trace_)
+    depth_token = _depth.set(0)
+    started_memory = memory and not tracemalloc.is_tracing()
+    if started_memory:
+        tracemalloc.start()
+    profiler = _start_profiler() if profile else None
+    if profile and profiler is None:
+        trace_.profile = "skipped: another profiler is active"
+    start = time.perf_counter()
+    try:
+        yield trace_
+    finally:
+        trace_.seconds = time.perf_counter() - start
+        if profiler:
+            profiler.disable()
+            _profile_lock.release()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            trace_.profile = out.getvalue()
+        if memory:
+            trace_.peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            if started_memory:
+                tracemalloc.stop()
+        _depth.reset(depth_token)
+        _current.reset(token)
+        if log_path:
+            write_log(trace_, log_path)
+
+
+def _start_profiler():
+    # None if another trace (or e.g. `python -m cProfile` around the whole run) is profiling
+    if sys.getprofile() is not None or not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # "Another profiling tool is already active"
+        _profile_lock.release()
+        return None
+    return profiler
+
+
+def write_log(trace_, path=TIMINGS_LOG):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    line = json.dumps(trace_.to_dict(), default=str)
+    with _log_lock, open(path, 'a') as f:
+        f.write(line + '\n')
+
+
+def read_log(path=TIMINGS_LOG):
+    """Flattened span log: one row per (trace, span), for looking at production timings."""
+    rows = []
+    if not os.path.exists(path):
+        return pd.DataFrame(rows)
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            for s in entry['spans']:
+                rows.append({'time': entry['time'], 'trace': entry['trace'], **entry['tags'], **s})
+    return pd.DataFrame(rows)
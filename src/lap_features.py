@@ -0,0 +1,258 @@
+# 📦 lap_features.py
+# Lap-level features (practice long runs, quali sectors, race pace and tyre degradation) per driver per round
+#
+# Rounds are processed one at a time: each session's laps table is cut down to the
+# columns used here, aggregated with groupby, written to the lap store and released
+# before the next round loads, so peak memory is one session whatever the backfill size.
+# The lap store sits inside the feature store (data/store/_laps), in the same
+# season-file layout; the '_' keeps it out of the store's dataset and signature.
+
+import argparse
+import gc
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+from cache_manager import file_lock, lock_path
+from feature_store import STORE_DIR, load_features, normalize_names, write_rounds
+from instrumentation import count, span
+from ranges import parse_range
+
+# === Config ===
+LAP_STORE_DIR = os.path.join(STORE_DIR, '_laps')
+PRACTICE_SESSIONS = ('FP1', 'FP2', 'FP3')
+SESSIONS = PRACTICE_SESSIONS + ('Q', 'R')
+LAP_LOAD = dict(laps=True, telemetry=False, weather=False, messages=False)
+
+LAP_COLUMNS = [
+    'Driver', 'LapTime', 'LapNumber', 'Stint', 'TyreLife', 'Compound',
+    'Sector1Time', 'Sector2Time', 'Sector3Time', 'PitInTime', 'PitOutTime', 'TrackStatus', 'Deleted'
+]
+TIME_COLUMNS = ['LapTime', 'Sector1Time', 'Sector2Time', 'Sector3Time']
+
+# A stint counts as a long run from this many clean laps; slower than 107% of the
+# driver's own median lap is treated as traffic / cool-down and dropped
+LONG_RUN_LAPS = 5
+OUTLIER_RATIO = 1.07
+
+FEATURES = [
+    'fp_best_lap', 'fp_long_run_pace', 'fp_long_run_std', 'fp_long_run_laps',
+    'q_best_lap', 'q_gap_to_pole', 'q_ideal_lap', 'q_s1_gap', 'q_s2_gap', 'q_s3_gap',
+    'race_pace', 'race_pace_gap', 'race_consistency', 'race_deg', 'race_laps',
+]
+LAP_SCHEMA = pa.schema(
+    [('date', pa.timestamp('ns')),
+     ('driver', pa.dictionary(pa.int16(), pa.string())),
+     ('constructor', pa.dictionary(pa.int16(), pa.string()))]
+    + [(name, pa.float32()) for name in FEATURES]
+)
+
+
+# ---------------------- laps ----------------------
+
+def compact_laps(laps):
+    """Only the columns used below, with lap and sector times as float32 seconds."""
+    out = pd.DataFrame({col: laps[col].values for col in LAP_COLUMNS if col in laps.columns})
+    for col in TIME_COLUMNS:
+        if col in out.columns:
+            out[col] = (out[col].dt.total_seconds()).astype('float32')
+    return out
+
+
+def clean_laps(laps):
+    """Green-flag, timed laps that are not in/out laps, deleted or far off the driver's pace."""
+    keep = laps['LapTime'].notna()
+    for col in ('PitInTime', 'PitOutTime'):
+        if col in laps.columns:
+            keep &= laps[col].isna()
+    if 'TrackStatus' in laps.columns:
+        keep &= laps['TrackStatus'].astype(str) == '1'
+    if 'Deleted' in laps.columns:
+        keep &= ~laps['Deleted'].fillna(False).astype(bool)
+    laps = laps[keep]
+    median = laps.groupby('Driver')['LapTime'].transform('median')
+    return laps[laps['LapTime'] <= median * OUTLIER_RATIO]
+
+
+def _long_runs(clean):
+    # Practice laps of several sessions are tagged with `Session`, as stint numbers restart
+    keys = [k for k in ('Driver', 'Session', 'Stint') if k in clean.columns]
+    size = clean.groupby(keys)['LapTime'].transform('size')
+    return clean[size >= LONG_RUN_LAPS]
+
+
+def _degradation(runs):
+    # Least-squares slope of lap time on tyre age per stint, from groupby sums,
+    # then averaged over a driver's stints weighted by their lap counts
+    x = runs['TyreLife'].astype('float64')
+    y = runs['LapTime'].astype('float64')
+    sums = pd.DataFrame({'Driver': runs['Driver'], 'Stint': runs['Stint'], 'n': 1.0,
+                         'x': x, 'y': y, 'xy': x * y, 'xx': x * x}).groupby(['Driver', 'Stint']).sum()
+    denom = sums['n'] * sums['xx'] - sums['x'] ** 2
+    slope = (sums['n'] * sums['xy'] - sums['x'] * sums['y']) / denom.where(denom > 0)
+    weighted = (slope * sums['n']).groupby(level='Driver').sum(min_count=1)
+    return weighted / sums['n'].where(slope.notna()).groupby(level='Driver').sum()
+
+
+# ---------------------- per-session features ----------------------
+
+def practice_features(laps):
+    timed = laps[laps['LapTime'].notna()]
+    runs = _long_runs(clean_laps(laps))
+    grouped = runs.groupby('Driver')['LapTime']
+    return pd.DataFrame({
+        'fp_best_lap': timed.groupby('Driver')['LapTime'].min(),
+        'fp_long_run_pace': grouped.median(),
+        'fp_long_run_std': grouped.std(),
+        'fp_long_run_laps': grouped.size(),
+    })
+
+
+def qualifying_features(laps):
+    timed = laps[laps['LapTime'].notna()]
+    best = timed.groupby('Driver')[TIME_COLUMNS].min()
+    out = pd.DataFrame({
+        'q_best_lap': best['LapTime'],
+        'q_gap_to_pole': best['LapTime'] - best['LapTime'].min(),
+        'q_ideal_lap': best[['Sector1Time', 'Sector2Time', 'Sector3Time']].sum(axis=1, min_count=3),
+    })
+    for i in (1, 2, 3):
+        sector = best[f'Sector{i}Time']
+        out[f'q_s{i}_gap'] = sector - sector.min()
+    return out
+
+
+def race_features(laps):
+    clean = clean_laps(laps)
+    grouped = clean.groupby('Driver')['LapTime']
+    pace = grouped.median()
+    return pd.DataFrame({
+        'race_pace': pace,
+        'race_pace_gap': pace - pace.min(),
+        'race_consistency': grouped.std(),
+        'race_deg': _degradation(_long_runs(clean)),
+        'race_laps': grouped.size(),
+    })
+
+
+# ---------------------- rounds ----------------------
+
+def load_session_laps(season, round_no, identifier):
+    """Compact laps plus (abbreviation -> name, team) for one session, or None if it does not exist."""
+    import fastf1
+
+    from cache_manager import load_session
+
+    try:
+        session = load_session(fastf1.get_session(season, round_no, identifier), **LAP_LOAD)
+        laps = compact_laps(session.laps)
+    except Exception as exc:  # sprint weekends have no FP2/FP3, future sessions no data
+        print(f"⚠️ {season} round {round_no} {identifier}: {exc}")
+        return None, None, None
+    results = session.results
+    entrants = pd.DataFrame({
+        'driver': results['FullName'].values,
+        'constructor': results['TeamName'].values,
+    }, index=pd.Index(results['Abbreviation'].values, name='Driver'))
+    date = session.date
+    del session
+    return laps, entrants, date
+
+
+def round_features(season, round_no, loader=load_session_laps):
+    """One row per driver with every lap feature of the round (NaN where a session is missing)."""
+    parts, entrants, race_date = [], [], None
+    practice = []
+    for identifier in SESSIONS:
+        with span(f'laps_{identifier}'):
+            laps, who, date = loader(season, round_no, identifier)
+        if laps is None or laps.empty:
+            continue
+        count('laps_scanned', len(laps))
+        entrants.append(who)
+        if identifier in PRACTICE_SESSIONS:
+            practice.append(laps.assign(Session=identifier))
+        elif identifier == 'Q':
+            parts.append(qualifying_features(laps))
+        else:
+            parts.append(race_features(laps))
+            race_date = date
+        del laps
+    if practice:
+        parts.append(practice_features(pd.concat(practice, ignore_index=True)))
+    if not parts:
+        return pd.DataFrame(columns=['season', 'round'] + LAP_SCHEMA.names)
+
+    features = pd.concat(parts, axis=1).reindex(columns=FEATURES)
+    who = pd.concat(entrants)
+    who = who[~who.index.duplicated(keep='last')]
+    out = who.join(features, how='inner').reset_index(drop=True)
+    out = normalize_names(out)
+    out.insert(0, 'date', pd.Timestamp(race_date).normalize() if race_date is not None else pd.NaT)
+    out.insert(0, 'round', round_no)
+    out.insert(0, 'season', season)
+    out[FEATURES] = out[FEATURES].astype('float32')
+    return out
+
+
+def stored_rounds(store_dir=LAP_STORE_DIR):
+    if not os.path.isdir(store_dir):
+        return set()
+    df = load_features(columns=['season', 'round'], store_dir=store_dir)
+    return set(zip(df['season'].astype(int), df['round'].astype(int)))
+
+
+def season_rounds(season, dates=False):
+    """Rounds of `season` that already took place, or {round: race date} with `dates`."""
+    import fastf1
+
+    schedule = fastf1.get_event_schedule(season, include_testing=False)
+    past = schedule[schedule['EventDate'] < pd.Timestamp.now()]
+    if dates:
+        return {int(r): pd.Timestamp(d).normalize() for r, d in zip(past['RoundNumber'], past['EventDate'])}
+    return [int(r) for r in past['RoundNumber']]
+
+
+def write_lap_rounds(rows, store_dir=LAP_STORE_DIR):
+    # The backfill and live polling may rewrite the same season file
+    with file_lock(lock_path('laps', store_dir)):
+        write_rounds(rows, store_dir, schema=LAP_SCHEMA)
+
+
+def build_lap_store(seasons, rounds=None, refresh=False, store_dir=LAP_STORE_DIR, loader=load_session_laps):
+    """Extract and store lap features round by round; rounds already stored are skipped."""
+    done = set() if refresh else stored_rounds(store_dir)
+    written = 0
+    for season in seasons:
+        for round_no in rounds or season_rounds(season):
+            if (season, round_no) in done:
+                continue
+            rows = round_features(season, round_no, loader)
+            if rows.empty:
+                continue
+            write_lap_rounds(rows, store_dir)
+            written += 1
+            print(f"💾 {season} round {round_no}: {len(rows)} drivers")
+            # Drop this round's frames before the next one loads
+            del rows
+            gc.collect()
+    return written
+
+
+def load_lap_features(columns=None, seasons=None, rounds=None, store_dir=LAP_STORE_DIR):
+    return load_features(columns=columns, seasons=seasons, rounds=rounds, store_dir=store_dir)
+
+
+if __name__ == "__main__":
+    from cache_manager import enable_cache
+
+    parser = argparse.ArgumentParser(description="Extract lap-level features into the lap store")
+    parser.add_argument('--seasons', default='2018-2025')
+    parser.add_argument('--rounds', default=None, help="e.g. 1-8 (default: every completed round)")
+    parser.add_argument('--refresh', action='store_true', help="re-extract rounds already in the store")
+    args = parser.parse_args()
+
+    enable_cache()
+    n = build_lap_store(parse_range(args.seasons), parse_range(args.rounds) if args.rounds else None, args.refresh)
+    print(f"✅ Wrote {n} round(s) to {LAP_STORE_DIR}")
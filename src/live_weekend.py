@@ -0,0 +1,328 @@
+# 📦 live_weekend.py
+# Live race-weekend mode: poll each session, update features as they land, re-predict and publish
+#
+#   python cli.py live --season 2025 --round 9                        # FastF1
+#   python cli.py live --season 2025 --round 7 --source replay        # recorded weekend
+#
+# Every session has its own poller: it polls every `poll_interval` once the session
+# is due and backs off exponentially only while fetching fails. A session is only
+# processed when its content changed, and once it is final it is never fetched again
+# (practice has no classification, so it is final once the session has ended).
+# The prediction is re-run only when a session feeds the model or the published table
+# (qualifying, the race grid, the sprint result, or lap features the model was trained
+# on); the rest just updates the state.
+
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from feature_store import normalize_names
+from instrumentation import span
+from lap_features import FEATURES as LAP_FEATURES
+from lap_features import LAP_STORE_DIR, compact_laps, round_features, write_lap_rounds
+
+# === Config ===
+SESSIONS = ('FP1', 'FP2', 'FP3', 'SQ', 'S', 'Q', 'R')
+LIVE_DIR = '../data/live'
+REPLAY_DIR = '../data/fixtures/live'
+POLL_INTERVAL = 30.0
+MAX_BACKOFF = 600.0
+ENDED_STATUSES = ('Finalised', 'Ends')
+SESSION_ENDED_AFTER = pd.Timedelta(hours=3)  # from the scheduled start, if the status feed has no end
+LIVE_LOAD = dict(laps=True, telemetry=False, weather=True, messages=False)
+RESULT_COLUMNS = ['abbreviation', 'driver', 'constructor', 'position', 'grid', 'status', 'qualifying_time']
+
+
+class SessionData:
+    """One fetched session: classification, compact laps (seconds), weather and start time."""
+
+    def __init__(self, name, results, laps, weather, date, final, fingerprint):
+        self.name = name
+        self.results = normalize_names(results.reindex(columns=RESULT_COLUMNS))
+        self.laps = laps
+        self.weather = weather
+        self.date = pd.Timestamp(date) if date is not None else None
+        self.final = final
+        self.fingerprint = fingerprint
+
+
+class SessionNotScheduled(Exception):
+    """Raised by a source when the weekend has no such session (e.g. FP2 on a sprint weekend)."""
+
+
+class SessionNotStarted(Exception):
+    """Raised by a source before the session's scheduled start (`starts`)."""
+
+    def __init__(self, name, starts):
+        super().__init__(f"{name} starts at {starts}")
+        self.starts = starts
+
+
+# ---------------------- sources ----------------------
+
+class FastF1LiveSource:
+    """Sessions from FastF1; data appears once the session has finished and been published."""
+
+    name = 'fastf1'
+
+    async def fetch(self, season, round_no, session_name):
+        return await asyncio.to_thread(self._fetch, season, round_no, session_name)
+
+    def _fetch(self, season, round_no, session_name):
+        import fastf1
+
+        from cache_manager import load_session
+
+        try:
+            session = fastf1.get_session(season, round_no, session_name)
+        except ValueError as exc:
+            raise SessionNotScheduled(session_name) from exc
+        if session.date is not None and pd.Timestamp(session.date) > pd.Timestamp.now():
+            raise SessionNotStarted(session_name, pd.Timestamp(session.date))
+        try:
+            load_session(session, **LIVE_LOAD)
+            laps = compact_laps(session.laps)
+        except Exception:  # not published yet
+            return None
+
+        results = session.results
+        frame = pd.DataFrame({
+            'abbreviation': results['Abbreviation'].values,
+            'driver': results['FullName'].values,
+            'constructor': results['TeamName'].values,
+            'position': results['Position'].values,
+            'grid': results['GridPosition'].values,
+            'status': results['Status'].values,
+        })
+        weather = session.weather_data
+        weather = {} if weather is None or weather.empty else {
+            'air_temp': float(weather['AirTemp'].iloc[0]),
+            'track_temp': float(weather['TrackTemp'].iloc[0]),
+            'humidity': float(weather['Humidity'].iloc[0]),
+        }
+        final = bool(frame['position'].notna().any()) or _session_ended(session)
+        digest = hashlib.sha256(pd.util.hash_pandas_object(frame.astype(str), index=False).values.tobytes())
+        digest.update(str(len(laps)).encode())
+        return SessionData(session_name, frame, laps, weather, session.date, final, digest.hexdigest())
+
+
+def _session_ended(session):
+    # The status feed marks the end of every session; fall back to the schedule without it
+    try:
+        status = session.session_status
+    except Exception:
+        status = None
+    if status is not None and not status.empty:
+        return bool(status['Status'].isin(ENDED_STATUSES).any())
+    return session.date is not None and pd.Timestamp(session.date) + SESSION_ENDED_AFTER < pd.Timestamp.now()
+
+
+class ReplayLiveSource:
+    """Recorded sessions as <season>/<round>/<session>.json; a missing file means "not yet"."""
+
+    name = 'replay'
+
+    def __init__(self, directory=REPLAY_DIR):
+        self.directory = directory
+
+    async def fetch(self, season, round_no, session_name):
+        return await asyncio.to_thread(self._fetch, season, round_no, session_name)
+
+    def _fetch(self, season, round_no, session_name):
+        path = os.path.join(self.directory, str(season), str(round_no), f"{session_name}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            content = f.read()
+        payload = json.loads(content)
+        laps = pd.DataFrame(payload.get('laps', []))
+        return SessionData(
+            session_name, pd.DataFrame(payload['results']), laps, payload.get('weather', {}),
+            payload.get('date'), payload.get('final', True), hashlib.sha256(content).hexdigest(),
+        )
+
+
+LIVE_SOURCES = {'fastf1': FastF1LiveSource, 'replay': ReplayLiveSource}
+
+
+# ---------------------- weekend state ----------------------
+
+def race_input_from(data, grid_from_position=True):
+    """Race input from a session: grid (quali order, or the official one), best lap, weather."""
+    results = data.results.copy()
+    if grid_from_position:
+        # Drivers without a quali position start from the back, in listed order
+        results = results.sort_values('position', kind='mergesort', na_position='last').reset_index(drop=True)
+        results['grid'] = range(1, len(results) + 1)
+    if not data.laps.empty:
+        best = data.laps.groupby('Driver')['LapTime'].min()
+        results['qualifying_time'] = results['abbreviation'].map(best).fillna(results['qualifying_time'])
+    for col in ('air_temp', 'track_temp', 'humidity'):
+        results[col] = data.weather.get(col, float('nan'))
+    return results
+
+
+class LiveWeekend:
+    """Accumulates a weekend's sessions and keeps the published prediction current."""
+
+    def __init__(self, season, round_no, source, service, output_dir=LIVE_DIR, lap_store_dir=LAP_STORE_DIR,
+                 poll_interval=POLL_INTERVAL, max_backoff=MAX_BACKOFF, sessions=SESSIONS, on_update=None):
+        self.season = season
+        self.round_no = round_no
+        self.source = source
+        self.service = service
+        self.output_path = os.path.join(output_dir, f"{season}_{round_no:02d}.json")
+        self.lap_store_dir = lap_store_dir
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.session_names = sessions
+        self.on_update = on_update or []
+
+        self.sessions = {}
+        self.status = {name: 'waiting' for name in sessions}
+        self.race_input = None
+        self.prediction = None
+        self._lock = asyncio.Lock()
+        self._finished = None
+
+    def _model_uses_laps(self):
+        return bool(set(self.service.model.features) & set(LAP_FEATURES))
+
+    async def run(self):
+        """Poll every session until the race is final; returns the last published state."""
+        self._finished = asyncio.Event()
+        await asyncio.gather(*(self._poll(name) for name in self.session_names))
+        return self.state()
+
+    async def _poll(self, name):
+        delay = self.poll_interval
+        while not self._finished.is_set():
+            try:
+                data = await self.source.fetch(self.season, self.round_no, name)
+            except SessionNotScheduled:
+                self.status[name] = 'not scheduled'
+                return
+            except SessionNotStarted as exc:  # sleep until the start (re-checked at least every max_backoff)
+                delay = min(max((exc.starts - pd.Timestamp.now()).total_seconds(), self.poll_interval), self.max_backoff)
+            except Exception as exc:  # network hiccup: keep polling with backoff
+                print(f"⚠️ {name}: {exc}")
+                delay = min(delay * 2, self.max_backoff)
+            else:
+                # Not published yet or unchanged: the session is due, so keep the normal pace
+                delay = self.poll_interval
+                previous = self.sessions.get(name)
+                if data is not None and (previous is None or data.fingerprint != previous.fingerprint):
+                    await self.apply(data)
+                    if data.final:
+                        return
+            try:
+                await asyncio.wait_for(self._finished.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def apply(self, data):
+        """Fold one new / changed session into the weekend and republish."""
+        async with self._lock:
+            self.sessions[data.name] = data
+            self.status[data.name] = 'final' if data.final else 'running'
+            affected = False
+
+            if not data.laps.empty and data.name in ('FP1', 'FP2', 'FP3', 'Q', 'R'):
+                await asyncio.to_thread(self._update_lap_features)
+                affected |= self._model_uses_laps()
+            if data.name == 'Q':
+                self.race_input = race_input_from(data)
+                affected = True
+            elif data.name == 'R' and data.final:
+                # The official grid (penalties applied) replaces the qualifying order
+                official = data.results[data.results['grid'] > 0].set_index('driver')['grid']
+                if self.race_input is None:
+                    self.race_input = race_input_from(data, grid_from_position=False)
+                else:
+                    self.race_input['grid'] = self.race_input['driver'].map(official).fillna(self.race_input['grid'])
+                affected = True
+            elif data.name == 'S' and data.final and self.race_input is not None:
+                # The prediction carries the sprint result next to it
+                affected = True
+
+            if affected:
+                self.prediction = await asyncio.to_thread(self._predict)
+            self.publish()
+            if data.name == 'R' and data.final:
+                self._finished.set()
+
+    def _update_lap_features(self):
+        def loader(season, round_no, identifier):
+            data = self.sessions.get(identifier)
+            if data is None or data.laps.empty:
+                return None, None, None
+            entrants = data.results.set_index('abbreviation')[['driver', 'constructor']]
+            entrants.index.name = 'Driver'
+            return data.laps, entrants, data.date
+
+        with span('live_lap_features'):
+            rows = round_features(self.season, self.round_no, loader)
+            if not rows.empty:
+                rows['date'] = rows['date'].fillna(pd.Timestamp(self._weekend_date()).normalize())
+                write_lap_rounds(rows, self.lap_store_dir)
+
+    def _weekend_date(self):
+        dates = [s.date for s in self.sessions.values() if s.date is not None]
+        return max(dates) if dates else pd.Timestamp.today()
+
+    def _predict(self):
+        race = self.sessions.get('R') or self.sessions.get('Q')
+        race_date = race.date.normalize() if race is not None and race.date is not None else None
+        prediction = self.service.predict_grid(self.season, self.round_no, self.race_input, race_date)
+        if 'R' in self.sessions and self.sessions['R'].final:
+            from prediction_service import merge_actuals
+            prediction = merge_actuals(prediction, self.sessions['R'].results)
+        if 'S' in self.sessions:
+            sprint = self.sessions['S'].results.set_index('driver')['position']
+            prediction['sprint_position'] = prediction['driver'].map(sprint)
+        return prediction
+
+    # ---------------------- publish ----------------------
+
+    def state(self):
+        return {
+            'season': self.season,
+            'round': self.round_no,
+            'updated': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'sessions': self.status,
+            'prediction': None if self.prediction is None else json.loads(self.prediction.to_json(orient='records')),
+        }
+
+    def publish(self):
+        state = self.state()
+        os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+        tmp_path = self.output_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp_path, self.output_path)
+        for callback in self.on_update:
+            callback(state)
+        done = ', '.join(f"{k}:{v}" for k, v in self.status.items() if v != 'waiting')
+        print(f"📡 {self.season} round {self.round_no} updated ({done or 'no sessions yet'})")
+
+
+def read_live(season, round_no, output_dir=LIVE_DIR):
+    """Latest published state of a live weekend, or None if nothing was published yet."""
+    path = os.path.join(output_dir, f"{season}_{round_no:02d}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def run_live(season, round_no, source='fastf1', model_name='position', replay_dir=REPLAY_DIR, **kwargs):
+    from prediction_service import PredictionService
+
+    live_source = ReplayLiveSource(replay_dir) if source == 'replay' else FastF1LiveSource()
+    service = PredictionService(model_name=model_name, history_seasons=[season - 1, season])
+    weekend = LiveWeekend(season, round_no, live_source, service, **kwargs)
+    return asyncio.run(weekend.run())
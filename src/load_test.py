@@ -0,0 +1,115 @@
+# 📦 load_test.py
+# Local load test for the prediction API: p50 / p99 latency and throughput
+#
+#   python cli.py serve --port 8000 &
+#   python load_test.py --concurrency 32 --requests 5000
+#
+# Payloads are real grids from the feature store. Unless --hit-ratio says otherwise,
+# qualifying times are jittered per request so every request misses the response
+# cache and goes through the batcher and the model.
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from feature_store import load_features
+
+# === Config ===
+URL = 'http://127.0.0.1:8000'
+SEASONS = [2025]
+GRID_FIELDS = ['driver', 'constructor', 'grid', 'qualifying_time', 'air_temp', 'track_temp', 'humidity']
+
+
+def base_payloads(seasons=SEASONS):
+    """One /predict body per stored race."""
+    df = load_features(columns=['season', 'round'] + GRID_FIELDS, seasons=seasons)
+    df = df.dropna(subset=['grid', 'qualifying_time'])
+    payloads = []
+    for (season, round_no), race in df.groupby(['season', 'round']):
+        grid = json.loads(race[GRID_FIELDS].to_json(orient='records'))
+        payloads.append({'season': int(season), 'round': int(round_no), 'grid': grid})
+    return payloads
+
+
+def make_payload(rng, payloads, hit_ratio):
+    payload = payloads[rng.integers(len(payloads))]
+    if rng.random() < hit_ratio:
+        return payload
+    jitter = rng.normal(0.0, 0.2, len(payload['grid']))
+    grid = [{**entry, 'qualifying_time': entry['qualifying_time'] + d} for entry, d in zip(payload['grid'], jitter)]
+    return {**payload, 'grid': grid}
+
+
+def run_load(url=URL, concurrency=16, n_requests=2000, duration=None, batch=1, hit_ratio=0.0, seed=0):
+    payloads = base_payloads()
+    endpoint = f"{url}/predict/batch" if batch > 1 else f"{url}/predict"
+    local = threading.local()
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = None if duration is None else time.perf_counter() + duration
+
+    def worker(worker_id):
+        rng = np.random.default_rng(seed + worker_id)
+        local.session = getattr(local, 'session', None) or requests.Session()
+        done = 0
+        while True:
+            with lock:
+                if (deadline is not None and time.perf_counter() >= deadline) or \
+                        (deadline is None and len(latencies) + len(errors) >= n_requests):
+                    return done
+            if batch > 1:
+                body = {'races': [make_payload(rng, payloads, hit_ratio) for _ in range(batch)]}
+            else:
+                body = make_payload(rng, payloads, hit_ratio)
+            start = time.perf_counter()
+            try:
+                response = local.session.post(endpoint, json=body, timeout=30)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                (latencies if ok else errors).append(elapsed)
+            done += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'races_per_request': batch,
+        'seconds': round(wall, 2),
+        'req_per_s': round(len(latencies) / wall, 1),
+        'races_per_s': round(len(latencies) * batch / wall, 1),
+        'p50_ms': round(float(np.percentile(ms, 50)), 2) if len(ms) else None,
+        'p90_ms': round(float(np.percentile(ms, 90)), 2) if len(ms) else None,
+        'p99_ms': round(float(np.percentile(ms, 99)), 2) if len(ms) else None,
+        'server': requests.get(f"{url}/health", timeout=5).json(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the prediction API")
+    parser.add_argument('--url', default=URL)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--duration', type=float, default=None, help="run for N seconds instead of --requests")
+    parser.add_argument('--batch', type=int, default=1, help="races per request (uses /predict/batch when > 1)")
+    parser.add_argument('--hit-ratio', type=float, default=0.0, help="share of requests repeating a cached input")
+    args = parser.parse_args()
+
+    report = run_load(args.url, args.concurrency, args.requests, args.duration, args.batch, args.hit_ratio)
+    server = report.pop('server')
+    print(f"\n🚦 {report['requests']} requests ({report['errors']} errors) in {report['seconds']}s")
+    print(f"Throughput: {report['req_per_s']} req/s, {report['races_per_s']} races/s")
+    print(f"Latency: p50 {report['p50_ms']} ms, p90 {report['p90_ms']} ms, p99 {report['p99_ms']} ms")
+    print(f"Server: {server}")
@@ -0,0 +1,182 @@
+# 📦 model_registry.py
+# Versioned model bundles: native XGBoost model + feature schema + circuit vocabulary + metadata
+
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import pandas as pd
+
+# === Config ===
+REGISTRY_DIR = '../models/registry'
+CIRCUIT_VOCAB_JSON = '../data/circuit_vocab.json'
+
+
+class SchemaMismatch(ValueError):
+    """Raised when an input frame or a model does not match the bundle's feature schema."""
+
+
+class ModelBundle:
+    """One registry version. The model itself is only read from disk on first use."""
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.name = manifest['name']
+        self.version = manifest['version']
+        self.task = manifest['task']
+        self.format = manifest['format']
+        self.features = manifest['features']
+        self.dtypes = manifest['dtypes']
+        self.circuits = manifest['circuits']
+        self.metadata = manifest['metadata']
+        self._circuit_codes = {name: i for i, name in enumerate(self.circuits)}
+        self._model = None
+
+    def __repr__(self):
+        return f"ModelBundle({self.name}@{self.version}, {len(self.features)} features)"
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = _read_model(os.path.join(self.path, MODEL_FILES[self.format]), self.format, self.task)
+        return self._model
+
+    def encode_circuit(self, circuit_name):
+        return self._circuit_codes.get(circuit_name, -1)
+
+    def validate(self, X):
+        """Return `X` restricted to the schema columns in training order, or fail fast."""
+        missing = [f for f in self.features if f not in X.columns]
+        if missing:
+            raise SchemaMismatch(f"{self.name}@{self.version}: missing features {missing}")
+        X = X[self.features]
+        bad = [f for f in self.features if not pd.api.types.is_numeric_dtype(X[f])]
+        if bad:
+            raise SchemaMismatch(f"{self.name}@{self.version}: non-numeric features {bad}")
+        return X.astype(self.dtypes)
+
+    def predict(self, X):
+        return self.model.predict(self.validate(X))
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(self.validate(X))
+
+
+MODEL_FILES = {'xgboost': 'model.ubj', 'joblib': 'model.joblib'}
+
+
+def _read_model(path, fmt, task):
+    if fmt == 'joblib':
+        import joblib
+        return joblib.load(path)
+
+    import xgboost as xgb
+    model = xgb.XGBClassifier() if task == 'classifier' else xgb.XGBRegressor()
+    model.load_model(path)
+    return model
+
+
+def _is_xgboost(model):
+    return type(model).__module__.startswith('xgboost')
+
+
+def model_feature_names(model):
+    names = getattr(model, 'feature_names_in_', None)
+    return None if names is None else [str(n) for n in names]
+
+
+# ---------------------- registry ----------------------
+
+def list_versions(name, registry_dir=REGISTRY_DIR):
+    root = os.path.join(registry_dir, name)
+    if not os.path.isdir(root):
+        return []
+    return sorted((v for v in os.listdir(root) if v.startswith('v') and v[1:].isdigit()), key=lambda v: int(v[1:]))
+
+
+def save_bundle(model, name, features, dtypes=None, circuits=None, metadata=None, registry_dir=REGISTRY_DIR):
+    """Write `model` as the next version of `name` and return the new bundle."""
+    trained_on = model_feature_names(model)
+    if trained_on is not None and trained_on != list(features):
+        raise SchemaMismatch(f"{name}: model was trained on {trained_on}, not {list(features)}")
+
+    versions = list_versions(name, registry_dir)
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1}"
+    path = os.path.join(registry_dir, name, version)
+    os.makedirs(path)
+
+    fmt = 'xgboost' if _is_xgboost(model) else 'joblib'
+    if fmt == 'xgboost':
+        model.save_model(os.path.join(path, MODEL_FILES[fmt]))
+    else:
+        import joblib
+        joblib.dump(model, os.path.join(path, MODEL_FILES[fmt]))
+
+    if circuits is None and os.path.exists(CIRCUIT_VOCAB_JSON):
+        with open(CIRCUIT_VOCAB_JSON) as f:
+            circuits = json.load(f)
+
+    manifest = {
+        'name': name,
+        'version': version,
+        'task': 'classifier' if hasattr(model, 'predict_proba') and hasattr(model, 'classes_') else 'regressor',
+        'format': fmt,
+        'features': list(features),
+        'dtypes': {f: (dtypes or {}).get(f, 'float64') for f in features},
+        'circuits': list(circuits or []),
+        'metadata': {'created': datetime.now(timezone.utc).isoformat(timespec='seconds'), **(metadata or {})},
+    }
+    with open(os.path.join(path, 'bundle.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    _read_bundle.cache_clear()
+    return ModelBundle(path, manifest)
+
+
+@lru_cache(maxsize=None)
+def _read_bundle(path):
+    with open(os.path.join(path, 'bundle.json')) as f:
+        return ModelBundle(path, json.load(f))
+
+
+def load_bundle(name, version='latest', registry_dir=REGISTRY_DIR):
+    """Bundle lookup; `version` is 'latest' or an explicit 'vN'.
+
+    'latest' is resolved against the registry on every call, so a newly saved version
+    is picked up; bundles are memoized per resolved version.
+    """
+    if version == 'latest':
+        versions = list_versions(name, registry_dir)
+        if not versions:
+            raise FileNotFoundError(f"No versions of model '{name}' in {registry_dir}")
+        version = versions[-1]
+    return _read_bundle(os.path.abspath(os.path.join(registry_dir, name, version)))
+
+
+def import_joblib(path, name, features, registry_dir=REGISTRY_DIR):
+    """Register a joblib pickle (e.g. trained in the notebooks) with its declared feature schema."""
+    import joblib
+
+    model = joblib.load(path)
+    return save_bundle(model, name, features, registry_dir=registry_dir, metadata={'source': path})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage versioned model bundles")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="list registered models and versions")
+    imported = sub.add_parser('import', help="register a joblib pickle as a new version")
+    imported.add_argument('path')
+    imported.add_argument('--name', required=True, help="registry model name")
+    imported.add_argument('--features', required=True, help="comma-separated, in training order")
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for name in sorted(os.listdir(REGISTRY_DIR)) if os.path.isdir(REGISTRY_DIR) else []:
+            for version in list_versions(name):
+                bundle = load_bundle(name, version)
+                print(f"{name:16s} {version:5s} {bundle.task:10s} {', '.join(bundle.features)}")
+    else:
+        bundle = import_joblib(args.path, args.name, args.features.split(','))
+        print(f"✅ Imported {args.path} as {bundle}")
@@ -0,0 +1,149 @@
+# 📦 monte_carlo.py
+# Monte Carlo race simulation: vectorized sampling of correlated finishing orders
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# === Config ===
+NOISE_MODEL_JSON = '../models/noise_model.json'
+N_DRAWS = 100_000
+CHUNK_SIZE = 10_000
+POINTS = np.array([25, 18, 15, 12, 10, 8, 6, 4, 2, 1], dtype=np.float64)
+
+# Pseudo-counts pulling small per-driver / per-circuit samples toward the global value
+SHRINKAGE = 10
+FINISHED_STATUS = r'^(?:Finished|\+\d+ Laps?)$'
+
+
+# ---------------------- noise model ----------------------
+
+def _shrunk(values, groups, global_value, k=SHRINKAGE):
+    stats = pd.DataFrame({'v': values, 'g': groups}).groupby('g', observed=True)['v'].agg(['mean', 'size'])
+    return ((stats['mean'] * stats['size'] + global_value * k) / (stats['size'] + k)).to_dict()
+
+
+def fit_noise_model(frame):
+    """Learn residual spread, teammate correlation and DNF rates from backtest predictions.
+
+    `frame` is `backtest.predict_all` output: one row per driver per race with
+    `predicted_position`, `position` (NaN when unclassified) and, where known, `status`.
+    """
+    frame = frame.copy()
+    status = frame['status'].astype(object) if 'status' in frame.columns else pd.Series(np.nan, index=frame.index)
+    known = status.notna() | frame['position'].isna()
+    frame['dnf'] = frame['position'].isna() | (status.notna() & ~status.astype(str).str.match(FINISHED_STATUS))
+
+    finished = frame[~frame['dnf']].copy()
+    finished['residual'] = finished['position'] - finished['predicted_position']
+    finished['sq'] = finished['residual'] ** 2
+    global_var = float(finished['sq'].mean())
+
+    # Share of the residual variance common to both cars of a team in a race
+    team_mean = finished.groupby(['season', 'round', 'constructor'], observed=True)['residual'].transform('mean')
+    team_size = finished.groupby(['season', 'round', 'constructor'], observed=True)['residual'].transform('size')
+    pairs = finished[team_size == 2]
+    team_share = float(np.clip((team_mean[pairs.index] ** 2).mean() * 2 / global_var - 1, 0.0, 0.9)) if len(pairs) else 0.0
+
+    dnf_rows = frame[known]
+    global_dnf = float(dnf_rows['dnf'].mean()) if len(dnf_rows) else 0.0
+
+    return {
+        'global_std': global_var ** 0.5,
+        'team_share': team_share,
+        'driver_var': _shrunk(finished['sq'], finished['driver'].astype(object), global_var),
+        'circuit_var': _shrunk(finished['sq'], finished['circuit'].astype(object), global_var),
+        'global_dnf': global_dnf,
+        'driver_dnf': _shrunk(dnf_rows['dnf'].astype(float), dnf_rows['driver'].astype(object), global_dnf),
+    }
+
+
+def save_noise_model(noise, path=NOISE_MODEL_JSON):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(noise, f, indent=1)
+
+
+def load_noise_model(path=NOISE_MODEL_JSON):
+    with open(path) as f:
+        return json.load(f)
+
+
+# ---------------------- sampling ----------------------
+
+def simulate_outcomes(race, noise, n_draws=N_DRAWS, chunk_size=CHUNK_SIZE, seed=None):
+    """Win / podium / points probabilities for one race from `n_draws` sampled orders.
+
+    `race` needs `driver`, `constructor` and `predicted_position` (plus `circuit` for
+    a circuit-specific spread). Draws are generated `chunk_size` at a time, so memory
+    stays at O(chunk_size x drivers) whatever `n_draws` is.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(race)
+    drivers = race['driver'].astype(object).values
+    teams, team_idx = np.unique(race['constructor'].astype(object).fillna('').values, return_inverse=True)
+
+    global_var = noise['global_std'] ** 2
+    circuit = race['circuit'].iloc[0] if 'circuit' in race.columns else None
+    circuit_scale = noise['circuit_var'].get(circuit, global_var) / global_var
+    sigma = np.sqrt(np.array([noise['driver_var'].get(d, global_var) for d in drivers]) * circuit_scale)
+    p_dnf = np.array([noise['driver_dnf'].get(d, noise['global_dnf']) for d in drivers])
+    mean = race['predicted_position'].values.astype(np.float64)
+    share = noise['team_share']
+
+    wins, podiums, in_points, dnfs = (np.zeros(n) for _ in range(4))
+    points, finish = np.zeros(n), np.zeros(n)
+    rows = np.arange(chunk_size)[:, None]
+
+    for start in range(0, n_draws, chunk_size):
+        size = min(chunk_size, n_draws - start)
+
+        # Team shock shared by teammates + individual shock, scaled per driver
+        team_z = rng.standard_normal((size, len(teams)))[:, team_idx]
+        solo_z = rng.standard_normal((size, n))
+        score = mean + sigma * (np.sqrt(share) * team_z + np.sqrt(1 - share) * solo_z)
+
+        # Retirements drop to the back of the order
+        dnf = rng.random((size, n)) < p_dnf
+        score = np.where(dnf, score + 1e6, score)
+
+        order = np.argsort(score, axis=1)
+        place = np.empty_like(order)
+        place[rows[:size], order] = np.arange(n)
+
+        wins += (place == 0).sum(axis=0)
+        podiums += (place < 3).sum(axis=0)
+        scoring = (place < len(POINTS)) & ~dnf
+        in_points += scoring.sum(axis=0)
+        points += np.where(scoring, POINTS[np.minimum(place, len(POINTS) - 1)], 0.0).sum(axis=0)
+        finish += (place + 1).sum(axis=0)
+        dnfs += dnf.sum(axis=0)
+
+    return pd.DataFrame({
+        'driver': drivers,
+        'predicted_position': mean,
+        'win_prob': wins / n_draws,
+        'podium_prob': podiums / n_draws,
+        'points_prob': in_points / n_draws,
+        'expected_points': points / n_draws,
+        'expected_finish': finish / n_draws,
+        'dnf_prob': dnfs / n_draws,
+    }).sort_values('expected_finish').reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    from backtest import MODEL_NAME, build_backtest_frame, predict_all
+    from model_registry import load_bundle
+
+    parser = argparse.ArgumentParser(description="Fit the Monte Carlo noise / DNF model from backtest residuals")
+    parser.add_argument('--model', default=MODEL_NAME, help="registry model name")
+    parser.add_argument('--output', default=NOISE_MODEL_JSON)
+    args = parser.parse_args()
+
+    frame = predict_all(load_bundle(args.model), build_backtest_frame())
+    noise = fit_noise_model(frame)
+    save_noise_model(noise, args.output)
+    print(f"✅ Saved noise model (σ={noise['global_std']:.2f}, team share={noise['team_share']:.2f}) to {args.output}")
@@ -1,8 +1,9 @@
-import joblib
 import pandas as pd
 
+from model_registry import load_bundle
+
 # Load the trained model
-model = joblib.load('../models/f1_best_model.pkl')
+model = load_bundle('position')
 
 # Example: Realistic test input for Max Verstappen — Saudi GP 2024
 live_input = {
@@ -11,16 +12,18 @@ live_input = {
     'constructor_form': 3.0,    # Red Bull finishing ~P1.5 recently
     'circuit_encoded': 11,       # Based on your encoding for Jeddah
     'grid_advantage': -1.0,        # He's expected to win from pole
-    'qualifying_time': 71.576   # 1:18.576 → in seconds
+    'qualifying_time': 71.576,   # 1:18.576 → in seconds
+    'air_temp': 24.0,
+    'track_temp': 28.0,
+    'humidity': 60.0,
 }
 
 # Convert to DataFrame
 X_live = pd.DataFrame([live_input])
 
-# Predict class (podium = 1 or 0)
-prediction = model.predict(X_live)[0]
-proba = model.predict_proba(X_live)[0][1]
+# Predict finishing position (podium = top 3)
+predicted = model.predict(X_live)[0]
 
 # Output
-print(f"🎯 Predicted Podium Outcome: {'YES 🏆' if prediction == 1 else 'NO'}")
-print(f"📊 Model Confidence: {proba:.2%}")
+print(f"🎯 Predicted Finishing Position: P{predicted:.1f}")
+print(f"🏆 Podium: {'YES' if predicted <= 3 else 'NO'}")
@@ -0,0 +1,253 @@
+# 📦 prediction_service.py
+# Long-lived prediction service: model, parsed history and per-round results stay in memory
+
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from actuals_store import (actuals_from_rounds, attach_driver_ids, cached_metrics, record_actuals, round_actuals,
+                           save_metrics, score_round)
+from cache_manager import enable_cache
+from compact_history import load_compact_history
+from feature_store import store_signature
+from form_engine import FormEngine
+from instrumentation import count, span
+from model_registry import load_bundle
+from monte_carlo import N_DRAWS, NOISE_MODEL_JSON, load_noise_model, simulate_outcomes
+from session_loader import RaceDataUnavailable, load_round
+
+# === Config ===
+MODEL_NAME = 'position'
+HISTORY_SEASONS = [2024, 2025]
+
+
+def load_history(seasons=HISTORY_SEASONS):
+    # Memory-mapped, so every worker process shares the same pages
+    return load_compact_history(seasons)
+
+
+class PredictionService:
+    """Keeps the model, history and simulated rounds resident between requests.
+
+    One instance is meant to be shared by every dashboard session (e.g. through
+    `st.cache_resource`). Results are cached per (season, round) and dropped when the
+    feature store changes on disk, a newer model version is registered, or
+    `invalidate()` is called.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, history_seasons=HISTORY_SEASONS):
+        self.model_name = model_name
+        self.history_seasons = history_seasons
+        enable_cache()
+
+        self._lock = threading.Lock()
+        self._round_locks = {}
+        self._results = {}
+        self._probabilities = {}
+        self._model_key = None
+        self._noise_model = None
+        self._load_history()
+
+    # ---------------------- state ----------------------
+
+    @property
+    def model(self):
+        # Latest version, resolved on every access (bundles are memoized per version,
+        # the native model loads on first predict)
+        return load_bundle(self.model_name)
+
+    @property
+    def noise_model(self):
+        # Fitted offline by `python monte_carlo.py`: a full backtest has no place in a request
+        if self._noise_model is None:
+            if not os.path.exists(NOISE_MODEL_JSON):
+                raise FileNotFoundError(f"No noise model at {NOISE_MODEL_JSON}; run `python monte_carlo.py` (from src/) first")
+            self._noise_model = load_noise_model()
+        return self._noise_model
+
+    def _load_history(self):
+        self._signature = store_signature()
+        with span('load_history'):
+            self.history = load_history(self.history_seasons)
+        with span('form_index'):
+            self.forms = FormEngine(self.history)
+
+    def refresh_if_stale(self):
+        # A new round landing in the feature store changes every later form
+        if store_signature() != self._signature:
+            self.invalidate(reload_history=True)
+            return True
+        # A retrained model makes every cached prediction (and its model_key) stale
+        model_key = self.model_key
+        if model_key != self._model_key:
+            stale = self._model_key is not None
+            self._model_key = model_key
+            if stale:
+                self.invalidate()
+            return stale
+        return False
+
+    def invalidate(self, season=None, round_no=None, reload_history=False):
+        with self._lock:
+            if reload_history:
+                self._load_history()
+            for cache in (self._results, self._probabilities):
+                if season is None:
+                    cache.clear()
+                else:
+                    for key in [k for k in cache if k[0] == season and round_no in (None, k[1])]:
+                        del cache[key]
+
+    # ---------------------- simulate ----------------------
+
+    def simulate(self, season, round_no):
+        """Predicted vs actual table for one round; computed once, then served from memory."""
+        key = (season, round_no)
+        count('result_cache.hit' if key in self._results else 'result_cache.miss')
+        if key not in self._results:
+            with self._lock:
+                round_lock = self._round_locks.setdefault(key, threading.Lock())
+            # Concurrent requests for the same round wait for one computation
+            with round_lock:
+                if key not in self._results:
+                    self._results[key] = self._simulate(season, round_no)
+        race_name, race_sorted = self._results[key]
+        return race_name, race_sorted.copy()
+
+    def simulate_probabilities(self, season, round_no, n_draws=N_DRAWS):
+        """Monte Carlo win / podium / points probabilities for one round."""
+        key = (season, round_no, n_draws)
+        count('probability_cache.hit' if key in self._probabilities else 'probability_cache.miss')
+        if key not in self._probabilities:
+            race_name, race_sorted = self.simulate(season, round_no)
+            race = race_sorted.assign(circuit=race_name)
+            with span('monte_carlo'):
+                self._probabilities[key] = simulate_outcomes(race, self.noise_model, n_draws, seed=0)
+        return self._probabilities[key].copy()
+
+    def build_features(self, season, round_no, race_input, race_date=None):
+        """Model inputs for one grid (driver, constructor, grid, quali time, weather).
+
+        `race_date` defaults to the stored date of the round, or today for a round
+        that is not in the history yet.
+        """
+        race_input = race_input[['driver', 'constructor', 'grid', 'qualifying_time', 'air_temp', 'track_temp', 'humidity']].copy()
+        race_input['grid'] = race_input['grid'].astype(int)
+
+        # Form features
+        with span('form'):
+            race_date = self._race_date(season, round_no, race_date)
+            forms = self.forms.compute(race_input[['driver']], race_date)
+            race_input['driver_form'] = forms['driver_form'].values
+            race_input['constructor_form'] = forms['constructor_form'].values
+            race_input['grid_advantage'] = race_input['grid'] - race_input['driver_form']
+            race_input['circuit_encoded'] = round_no
+        return race_input
+
+    def build_features_many(self, race_input, races):
+        """`build_features` for several stacked grids, with one as-of form query for all of them.
+
+        `race_input` has a `race` column indexing `races`, a list of (season, round_no, race_date).
+        """
+        race = race_input['race'].values
+        race_input = race_input[['race', 'driver', 'constructor', 'grid', 'qualifying_time', 'air_temp', 'track_temp', 'humidity']].copy()
+        race_input['grid'] = race_input['grid'].astype(int)
+
+        with span('form'):
+            dates = pd.to_datetime([self._race_date(season, round_no, race_date) for season, round_no, race_date in races])
+            targets = pd.DataFrame({'driver': race_input['driver'].values, 'date': dates.values[race]})
+            forms = self.forms.compute_batch(targets)
+            race_input['driver_form'] = forms['driver_form'].values
+            race_input['constructor_form'] = forms['constructor_form'].values
+            race_input['grid_advantage'] = race_input['grid'] - race_input['driver_form']
+            race_input['circuit_encoded'] = np.array([round_no for _, round_no, _ in races])[race]
+        return race_input
+
+    def _race_date(self, season, round_no, race_date=None):
+        # Stored date of the round, or today for a round that is not in the history yet
+        if race_date is None:
+            race_date = self.forms.race_date(season, round_no)
+        return race_date if race_date is not None else datetime.today()
+
+    def predict_grid(self, season, round_no, race_input, race_date=None):
+        """Predicted finishing order for one grid; used for completed rounds and live weekends."""
+        race_input = self.build_features(season, round_no, race_input, race_date)
+        with span('predict'):
+            predicted = self.model.predict(race_input)
+        return rank_predictions(race_input, predicted)
+
+    def _simulate(self, season, round_no):
+        with span('load_round'):
+            round_df = load_round(season, round_no)
+
+        race_sorted = attach_driver_ids(self.predict_grid(season, round_no, round_df), round_df)
+        return round_df['event_name'].iloc[0], merge_actuals(race_sorted, self.actuals(season, round_no, round_df))
+
+    # ---------------------- actuals ----------------------
+
+    @property
+    def model_key(self):
+        return f"{self.model.name}@{self.model.version}"
+
+    def actuals(self, season, round_no, round_df=None):
+        """Recorded results of a round; recorded from `round_df` first if the race is classified."""
+        with span('actuals'):
+            actuals = round_actuals(season, round_no)
+            if actuals is None and round_df is not None:
+                actuals = actuals_from_rounds(round_df)
+                record_actuals(actuals)
+        return actuals if actuals is not None else pd.DataFrame(columns=['driver', 'position'])
+
+    def round_metrics(self, season, round_no):
+        """Error metrics of this model on a completed round, scored once and then read from the cache."""
+        metrics = cached_metrics(self.model_key, season, round_no)
+        count('metrics_cache.hit' if metrics is not None else 'metrics_cache.miss')
+        if metrics is None:
+            race_name, race_sorted = self.simulate(season, round_no)
+            if race_sorted['actual_position'].isna().all():
+                return None
+            metrics = score_round(race_sorted, season, round_no, race_name)
+            save_metrics(self.model_key, [metrics])
+        return metrics
+
+
+def rank_predictions(race_input, predicted, by=None):
+    # Sort and assign simulated finish (within each `by` group when several grids are stacked)
+    race_input = race_input.assign(predicted_position=predicted)
+    if by is None:
+        race_sorted = race_input.sort_values('predicted_position').reset_index(drop=True)
+        race_sorted['simulated_finish'] = range(1, len(race_sorted) + 1)
+    else:
+        race_sorted = race_input.sort_values([by, 'predicted_position']).reset_index(drop=True)
+        race_sorted['simulated_finish'] = race_sorted.groupby(by).cumcount() + 1
+    return race_sorted
+
+
+def merge_actuals(race_sorted, results):
+    """Attach actual finishing positions, DNF status and the simulated-vs-actual error.
+
+    Drivers are matched on `driver_id` where both sides have one, otherwise on the
+    (normalized) name. Unclassified drivers get a NaN actual position and no error.
+    """
+    with span('merge_actuals'):
+        results = results.reset_index(drop=True)
+        row = pd.Series(np.nan, index=race_sorted.index)
+        if 'driver_id' in race_sorted.columns and 'driver_id' in results.columns:
+            ids = pd.Series(results.index, index=results['driver_id'].astype(object))
+            row = race_sorted['driver_id'].astype(object).map(ids[~ids.index.duplicated()])
+        names = pd.Series(results.index, index=results['driver'].astype(object))
+        row = row.fillna(race_sorted['driver'].astype(object).map(names[~names.index.duplicated()]))
+
+        matched = row.notna().values
+        take = row.fillna(0).astype(int).values
+        race_sorted = race_sorted.copy()
+        actual = results['position'].astype('float64').values[take] if len(results) else np.full(len(take), np.nan)
+        race_sorted['actual_position'] = np.where(matched, actual, np.nan)
+        for col in ('status', 'dnf'):
+            if col in results.columns:
+                race_sorted[col] = pd.Series(results[col].values[take], index=race_sorted.index).where(matched)
+        race_sorted['error'] = race_sorted['simulated_finish'] - race_sorted['actual_position']
+    return race_sorted
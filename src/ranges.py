@@ -0,0 +1,11 @@
+# 📦 ranges.py
+# Season / round range parsing shared by the CLI and the library modules
+
+
+def parse_range(text):
+    # "2022-2025" or "1,3,5-7"
+    values = []
+    for part in str(text).split(','):
+        start, _, end = part.partition('-')
+        values.extend(range(int(start), int(end or start) + 1))
+    return values
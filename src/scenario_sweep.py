@@ -0,0 +1,320 @@
+# 📦 scenario_sweep.py
+# What-if sweeps: expand a race into many perturbed grids, score them in chunked batches, rank the outcome deltas
+#
+#   python cli.py sweep --season 2025 --round 7 --permute-top 5 --humidity 40:100:10
+#   python cli.py sweep --season 2025 --round 7 --penalty "Max Verstappen:0,3,5,10" --quali-delta 0:3:0.5
+#
+# A sweep is the Cartesian product of its axes (grid permutations, grid penalties,
+# weather values, per-driver feature shifts). Scenarios are never materialized as
+# frames: each chunk of scenario indices is turned into (scenarios x drivers) feature
+# arrays by broadcasting the base race and flattened into one matrix. A driver's row
+# only changes with the axes that touch it, so the matrix is deduplicated and its
+# distinct rows are scored with a single model.predict call. Chunks bound memory at
+# CHUNK_ROWS feature rows, so a sweep of any size costs O(chunk) memory plus one int16
+# place per (scenario, driver).
+
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count, span
+
+# === Config ===
+CHUNK_ROWS = 500_000  # driver rows per model.predict call
+MAX_SCENARIOS = 5_000_000
+PERMUTE_LIMIT = 8  # 8! = 40,320 orders
+
+
+# ---------------------- axes ----------------------
+# An axis has `size` settings and `labels` describing them; `apply(arrays, picks)`
+# edits the (scenarios x drivers) feature arrays in place for the setting index of
+# each scenario in `picks`. Axes that do not move the grid also give `row_codes`:
+# a per-row setting code (`size` for an untouched row) used to find repeated rows.
+
+class GridPermutations:
+    """Every order of the drivers holding the first `top` grid slots.
+
+    Label '2-1-3' means the P1 starter moves to 2nd, the P2 starter to 1st, P3 stays.
+    """
+
+    def __init__(self, top):
+        if not 1 < top <= PERMUTE_LIMIT:
+            raise ValueError(f"top must be in 2..{PERMUTE_LIMIT}, got {top}")
+        self.name = f"top{top}_order"
+        self.moves_grid = True
+        self.top = top
+        self.orders = np.array(list(itertools.permutations(range(1, top + 1))), dtype=np.int16)
+        self.size = len(self.orders)
+        self.labels = ['-'.join(map(str, order)) for order in self.orders]
+
+    def apply(self, arrays, picks):
+        # The k-th of the current top slots goes to slot orders[pick][k]
+        grid = arrays['grid']
+        top = grid <= self.top
+        slot = np.clip(grid, 1, self.top).astype(np.int64) - 1
+        grid[top] = self.orders[picks[:, None].repeat(grid.shape[1], axis=1), slot][top]
+
+
+class GridPenalty:
+    """`driver` drops `places` grid places; the drivers in between move up one."""
+
+    def __init__(self, driver, places, drivers):
+        if driver not in drivers:
+            raise ValueError(f"{driver!r} is not on this grid")
+        self.name = f"{driver} penalty"
+        self.moves_grid = True
+        self.column = list(drivers).index(driver)
+        self.places = np.asarray(places, dtype=np.int16)
+        self.size = len(self.places)
+        self.labels = [f"+{p}" for p in self.places]
+
+    def apply(self, arrays, picks):
+        grid = arrays['grid']
+        own = grid[:, self.column].copy()
+        target = np.minimum(own + self.places[picks], grid.shape[1])
+        passed = (grid > own[:, None]) & (grid <= target[:, None])
+        grid -= passed
+        grid[:, self.column] = target
+
+
+class ColumnValues:
+    """Set `column` (e.g. air_temp) to each of `values` for every driver."""
+
+    def __init__(self, column, values):
+        self.name = column
+        self.moves_grid = False
+        self.column = column
+        self.values = np.asarray(values, dtype=np.float64)
+        self.size = len(self.values)
+        self.labels = [f"{v:g}" for v in self.values]
+
+    def apply(self, arrays, picks):
+        arrays[self.column][:] = self.values[picks][:, None]
+
+    def row_codes(self, picks):
+        return picks[:, None]
+
+
+class ColumnDelta:
+    """Add each of `deltas` to `column` for `drivers` (all drivers when None)."""
+
+    def __init__(self, column, deltas, drivers=None, grid_drivers=None):
+        self.name = f"{column} delta" if drivers is None else f"{column} delta ({', '.join(drivers)})"
+        self.moves_grid = False
+        self.column = column
+        self.deltas = np.asarray(deltas, dtype=np.float64)
+        self.mask = None if drivers is None else np.isin(np.asarray(grid_drivers, dtype=object), list(drivers))
+        self.size = len(self.deltas)
+        self.labels = [f"{d:+g}" for d in self.deltas]
+
+    def apply(self, arrays, picks):
+        shift = self.deltas[picks][:, None]
+        if self.mask is None:
+            arrays[self.column] += shift
+        else:
+            arrays[self.column] += shift * self.mask
+
+    def row_codes(self, picks):
+        return picks[:, None] if self.mask is None else np.where(self.mask, picks[:, None], self.size)
+
+
+# ---------------------- sweep ----------------------
+
+class SweepResult:
+    """Finishing places of every scenario against the unperturbed race."""
+
+    def __init__(self, drivers, axes, baseline, places, seconds):
+        self.drivers = np.asarray(drivers, dtype=object)
+        self.axes = axes
+        self.baseline = baseline  # (drivers,) simulated finish of the base race
+        self.places = places  # (scenarios, drivers) simulated finish, int16
+        self.seconds = seconds
+
+    def __len__(self):
+        return len(self.places)
+
+    def settings(self, index):
+        """Axis labels of the scenarios at `index` as a frame."""
+        if not self.axes:
+            return pd.DataFrame(index=range(len(index)))
+        digits = np.unravel_index(index, [axis.size for axis in self.axes])
+        return pd.DataFrame({axis.name: np.asarray(axis.labels, dtype=object)[d] for axis, d in zip(self.axes, digits)})
+
+    def ranked(self, driver=None, top=20, best=True):
+        """Scenarios with the largest outcome change.
+
+        For a `driver`: their finish and its delta to the base race, best gains first
+        (`best=False` for the worst losses). Otherwise: total places changed across the grid.
+        """
+        delta = self.places.astype(np.int32) - self.baseline
+        if driver is not None:
+            column = list(self.drivers).index(driver)
+            key = delta[:, column] if best else -delta[:, column]
+        else:
+            key = -np.abs(delta).sum(axis=1)
+        index = np.argsort(key, kind='stable')[:top]
+        out = self.settings(index)
+        out.insert(0, 'scenario', index)
+        out['winner'] = self.drivers[np.argmin(self.places[index], axis=1)]
+        out['places_changed'] = (delta[index] != 0).sum(axis=1)
+        out['total_shift'] = np.abs(delta[index]).sum(axis=1)
+        if driver is not None:
+            out['finish'] = self.places[index, column]
+            out['delta'] = delta[index, column]
+        return out.reset_index(drop=True)
+
+    def driver_summary(self):
+        """Per driver: base finish and the spread of finishes over every scenario."""
+        places = self.places
+        return pd.DataFrame({
+            'driver': self.drivers,
+            'base_finish': self.baseline,
+            'mean_finish': places.mean(axis=0),
+            'best_finish': places.min(axis=0),
+            'worst_finish': places.max(axis=0),
+            'mean_delta': places.mean(axis=0) - self.baseline,
+            'win_share': (places == 1).mean(axis=0),
+            'podium_share': (places <= 3).mean(axis=0),
+        }).sort_values('mean_finish').reset_index(drop=True)
+
+
+def _unique_rows(grid, codes, extra):
+    """Index of the first occurrence of each distinct feature row, and each row's distinct-row number.
+
+    A row is fixed by its driver, its grid slot and the setting codes of the other
+    axes, so those are combined into one integer key instead of comparing features.
+    `extra` leading scenarios are the base race (code `size` on every axis).
+    """
+    m, n = grid.shape
+    key = np.arange(n, dtype=np.int64)[None, :] * (n + 1) + grid
+    for size, row_codes in codes:
+        base = np.full((extra, n), size, dtype=np.int64)
+        key = key * (size + 1) + np.concatenate([base, np.broadcast_to(row_codes, (m - extra, n))])
+    key, distinct = pd.factorize(key.reshape(-1))
+    first = np.empty(len(distinct), dtype=np.int64)
+    first[key[::-1]] = np.arange(len(key) - 1, -1, -1)
+    return first, key
+
+
+def _finish_places(predicted):
+    # Rank within each scenario row: 1 = lowest predicted position
+    order = np.argsort(predicted, axis=1, kind='stable')
+    places = np.empty(order.shape, dtype=np.int16)
+    np.put_along_axis(places, order, np.arange(1, order.shape[1] + 1, dtype=np.int16)[None, :], axis=1)
+    return places
+
+
+def run_sweep(model, race, axes, chunk_rows=CHUNK_ROWS):
+    """Score every combination of `axes` settings on `race` (one row per driver, model features included).
+
+    Returns a SweepResult; the base race is scored in the same batch as the first chunk.
+    """
+    start = time.perf_counter()
+    features = list(model.features)
+    race = race.reset_index(drop=True)
+    n = len(race)
+    sizes = [axis.size for axis in axes]
+    n_scenarios = int(np.prod(sizes)) if axes else 1
+    if n_scenarios > MAX_SCENARIOS:
+        raise ValueError(f"{n_scenarios:,} scenarios; the limit is {MAX_SCENARIOS:,}")
+
+    check_axes(axes, features)
+    base = {col: race[col].to_numpy(dtype=np.float64) for col in features}
+    base['grid'] = race['grid'].to_numpy(dtype=np.int16)
+    # grid_advantage follows the grid; the form it is taken against may not be a model input
+    base_form = None
+    if 'grid_advantage' in features:
+        form = race['driver_form'] if 'driver_form' in race.columns else race['grid'] - race['grid_advantage']
+        base_form = form.to_numpy(dtype=np.float64)
+    per_chunk = max(1, chunk_rows // n)
+    places = np.empty((n_scenarios, n), dtype=np.int16)
+    baseline = None
+
+    for lo in range(0, n_scenarios, per_chunk):
+        hi = min(lo + per_chunk, n_scenarios)
+        with span('sweep_expand'):
+            # Scenario 0 of the first chunk's matrix is the unperturbed race
+            extra = int(baseline is None)
+            m = hi - lo + extra
+            arrays = {col: np.repeat(values[None, :], m, axis=0) for col, values in base.items()}
+            form = arrays['driver_form'] if 'driver_form' in arrays else base_form
+            if axes:
+                digits = np.unravel_index(np.arange(lo, hi), sizes)
+                view = {col: values[extra:] for col, values in arrays.items()}
+                for axis, picks in zip(axes, digits):
+                    axis.apply(view, picks)
+            if 'grid_advantage' in arrays:
+                # Derived from the perturbed grid and form, as when the features are built
+                arrays['grid_advantage'] = arrays['grid'] - form
+            columns = [arrays[col].reshape(-1) for col in features]
+        with span('sweep_dedupe'):
+            # A driver's row only depends on the axes that touch it, so most rows repeat
+            first, inverse = _unique_rows(arrays['grid'], [
+                (axis.size, axis.row_codes(picks)) for axis, picks in zip(axes, digits) if not axis.moves_grid
+            ] if axes else [], extra)
+            X = pd.DataFrame({col: values[first].astype(np.float64) for col, values in zip(features, columns)})
+        with span('sweep_predict'):
+            predicted = np.asarray(model.predict(X), dtype=np.float64)[inverse].reshape(m, n)
+        count('sweep_rows', m * n)
+        count('sweep_rows_scored', len(X))
+        chunk_places = _finish_places(predicted)
+        if extra:
+            baseline = chunk_places[0].astype(np.int32)
+        places[lo:hi] = chunk_places[extra:]
+
+    return SweepResult(race['driver'].values, axes, baseline, places, time.perf_counter() - start)
+
+
+def parse_values(spec):
+    """'40:100:10' -> 40, 50, ..., 100 (stop included); '1,2.5,4' -> a list."""
+    if ':' in spec:
+        lo, hi, step = (float(x) for x in spec.split(':'))
+        return np.round(np.arange(lo, hi + step / 2, step), 6)
+    return [float(x) for x in spec.split(',')]
+
+
+def check_axes(axes, features):
+    """Fail fast on an axis that edits a column the model does not use (it would change nothing)."""
+    for axis in axes:
+        column = 'grid' if axis.moves_grid else axis.column
+        if column not in features:
+            raise ValueError(f"{axis.name}: the model has no '{column}' feature (features: {', '.join(features)})")
+
+
+def build_axes(drivers, permute_top=None, penalties=(), weather=None, quali_delta=None, form_shifts=(), features=None):
+    """Axes from CLI-style specs: penalties / form_shifts are 'Driver Name:v1,v2,...' strings.
+
+    With the model's `features`, an axis on a column the model does not use raises ValueError.
+    """
+    axes = []
+    if permute_top:
+        axes.append(GridPermutations(permute_top))
+    for spec in penalties:
+        driver, places = spec.rsplit(':', 1)
+        axes.append(GridPenalty(driver.strip(), [int(p) for p in places.split(',')], drivers))
+    for column, spec in (weather or {}).items():
+        if spec:
+            axes.append(ColumnValues(column, parse_values(spec)))
+    if quali_delta:
+        axes.append(ColumnDelta('qualifying_time', parse_values(quali_delta)))
+    for spec in form_shifts:
+        driver, values = spec.rsplit(':', 1)
+        axes.append(ColumnDelta('driver_form', parse_values(values), [driver.strip()], drivers))
+    if features is not None:
+        check_axes(axes, list(features))
+    return axes
+
+
+def sweep_round(season, round_no, axes_args, model_name='position', service=None, chunk_rows=CHUNK_ROWS):
+    """Sweep a stored / loaded round: its grid, quali times, weather and as-of forms are the base."""
+    from prediction_service import PredictionService
+    from session_loader import load_round
+
+    service = service or PredictionService(model_name=model_name, history_seasons=[season - 1, season])
+    round_df = load_round(season, round_no)
+    race = service.build_features(season, round_no, round_df)
+    model = service.model
+    axes = build_axes(race['driver'].values, features=model.features, **axes_args)
+    return round_df['event_name'].iloc[0], run_sweep(model, race, axes, chunk_rows)
@@ -0,0 +1,142 @@
+# 📦 session_loader.py
+# Lightweight FastF1 loading: only results, quick laps and weather, cached per round
+
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import fastf1
+import pandas as pd
+
+from cache_manager import CACHE_ROOT, load_session
+from feature_store import normalize_names
+from instrumentation import count, span
+
+# === Config ===
+ROUND_CACHE_DIR = os.path.join(CACHE_ROOT, 'rounds')
+
+# Only the slices the features read: Q needs laps + weather, R needs results and
+# race control messages (time penalties for the actuals store)
+QUALI_LOAD = dict(laps=True, telemetry=False, weather=True, messages=False)
+RACE_LOAD = dict(laps=False, telemetry=False, weather=False, messages=True)
+
+ROUND_COLUMNS = [
+    'season', 'round', 'event_name', 'driver_id', 'abbreviation', 'driver', 'constructor',
+    'grid', 'qualifying_time', 'air_temp', 'track_temp', 'humidity', 'position', 'status'
+]
+
+
+class RaceDataUnavailable(Exception):
+    """Raised when the qualifying or race session for a round cannot be loaded yet."""
+
+
+def _load_session(season, round_no, identifier, load_args):
+    return load_session(fastf1.get_session(season, round_no, identifier), **load_args)
+
+
+def load_sessions(season, round_no):
+    """Load the Q and R sessions of a round concurrently with minimal data slices."""
+    # Each load runs in a copy of the caller's context so its cache hits / misses
+    # are counted in the caller's trace
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        future_q = pool.submit(contextvars.copy_context().run, _load_session, season, round_no, 'Q', QUALI_LOAD)
+        future_r = pool.submit(contextvars.copy_context().run, _load_session, season, round_no, 'R', RACE_LOAD)
+        try:
+            return future_q.result(), future_r.result()
+        except Exception as exc:
+            raise RaceDataUnavailable(f"{season} round {round_no}: {exc}") from exc
+
+
+def extract_round(season, round_no, session_q, session_r):
+    """One feature row per race entrant: grid, best quick lap, weather and result."""
+    with span('build_grid'):
+        results = session_r.results
+        round_df = pd.DataFrame({
+            'driver_id': results['DriverId'].values,
+            'abbreviation': results['Abbreviation'].values,
+            'driver': results['FullName'].values,
+            'constructor': results['TeamName'].values,
+            'grid': results['GridPosition'].values,
+            'position': results['Position'].values,
+            'status': results['Status'].values,
+        })
+
+    # Best quick lap per driver in qualifying
+    with span('best_laps'):
+        laps_q = session_q.laps.pick_quicklaps()
+        count('laps_scanned', len(session_q.laps))
+        best_laps = laps_q.groupby('Driver')['LapTime'].min().dt.total_seconds()
+        round_df['qualifying_time'] = round_df['abbreviation'].map(best_laps)
+
+    # Weather at the start of qualifying
+    with span('weather'):
+        weather_row = session_q.weather_data.iloc[0]
+        round_df['air_temp'] = weather_row['AirTemp']
+        round_df['track_temp'] = weather_row['TrackTemp']
+        round_df['humidity'] = weather_row['Humidity']
+
+    round_df['season'] = season
+    round_df['round'] = round_no
+    round_df['event_name'] = session_r.event['EventName']
+    return normalize_names(round_df[ROUND_COLUMNS])
+
+
+def round_cache_path(season, round_no, cache_dir=ROUND_CACHE_DIR):
+    return os.path.join(cache_dir, f"{season}_{round_no:02d}.parquet")
+
+
+def fetch_round(season, round_no):
+    """Feature rows of a round straight from FastF1, plus its results once the race is classified (else None)."""
+    with span('load_sessions'):
+        session_q, session_r = load_sessions(season, round_no)
+    round_df = extract_round(season, round_no, session_q, session_r)
+    actuals = None
+    if round_df['position'].notna().any():
+        from actuals_store import actuals_from_sessions
+
+        actuals = actuals_from_sessions(season, round_no, session_r, session_q)
+    return round_df, actuals
+
+
+def save_round(round_df, cache_dir=ROUND_CACHE_DIR):
+    """Atomically write a classified round to the round cache (a reader never sees half a file)."""
+    season, round_no = int(round_df['season'].iloc[0]), int(round_df['round'].iloc[0])
+    path = round_cache_path(season, round_no, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    round_df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_cached_round(season, round_no, cache_dir=ROUND_CACHE_DIR):
+    """Cached feature rows of a round, or None if it is not cached (or cached before driver IDs were kept)."""
+    path = round_cache_path(season, round_no, cache_dir)
+    if not os.path.exists(path):
+        return None
+    with span('read_round_cache'):
+        round_df = pd.read_parquet(path)
+    return round_df if 'driver_id' in round_df.columns else None
+
+
+def load_round(season, round_no, refresh=False, cache_dir=ROUND_CACHE_DIR):
+    """Feature rows for a round, read from the local round cache when available.
+
+    Rounds are only cached once the race is classified, so a round fetched between
+    qualifying and the race is loaded again next time. The classified results are
+    recorded in the actuals store at the same time.
+    """
+    round_df = None if refresh else read_cached_round(season, round_no, cache_dir)
+    if round_df is not None:
+        count('round_cache.hit')
+        return round_df
+
+    count('round_cache.miss')
+    round_df, actuals = fetch_round(season, round_no)
+    if actuals is not None:
+        from actuals_store import record_actuals
+
+        with span('record_actuals'):
+            record_actuals(actuals)
+        save_round(round_df, cache_dir)
+    return round_df
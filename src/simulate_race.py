@@ -1,28 +1,25 @@
 # Updated universal simulate_race.py
+import argparse
+
 import pandas as pd
-import requests
-import joblib
 from tqdm import tqdm
 
+from entity_index import load_index
+from feature_store import load_features
+from form_engine import FormEngine, FALLBACK_FORM
+from ingest import fetch_round
+from model_registry import load_bundle
+
 # ---------------------- CONFIG ----------------------
 SEASON = 2025
 ROUND = 8  # Monaco GP
+MODEL_NAME = 'position'
 
 # ----------------------------------------------------
 
-# Load trained model
-model = joblib.load('../models/f1_position_model.pkl')
-
-# Load historical dataset
-df_hist = pd.read_csv('../data/f1_features_combined.csv')  # Update this to include 2025 if needed
-
-# Parse date
-df_hist['date'] = pd.to_datetime(df_hist['date'])
-
-# Encode circuit automatically based on name
-def encode_circuit(circuit_name, full_df):
-    circuits = full_df['circuit'].astype('category').cat.categories.tolist()
-    return circuits.index(circuit_name) if circuit_name in circuits else -1
+# Encode circuit automatically based on name (rank in the sorted circuit list of the store)
+def encode_circuit(circuit_name, index):
+    return index.circuit_rank.get(circuit_name, -1)
 
 # Convert quali time to seconds
 def time_to_seconds(timestr):
@@ -34,14 +31,10 @@ def time_to_seconds(timestr):
     except:
         return None
 
-# Get race input data from Ergast
-
-def get_race_input(season, round_no, circuit_code):
-    url_results = f"https://ergast.com/api/f1/{season}/{round_no}/results.json?limit=100"
-    url_quali = f"https://ergast.com/api/f1/{season}/{round_no}/qualifying.json?limit=100"
+# Get race input data from the Ergast-compatible ingestion sources
 
-    results = requests.get(url_results).json()
-    quali = requests.get(url_quali).json()
+def get_race_input(season, round_no, circuit_code, source=None):
+    results, quali = fetch_round(season, round_no, source=source)
 
     race = results['MRData']['RaceTable']['Races'][0]
     quali_results = quali['MRData']['RaceTable']['Races'][0]['QualifyingResults']
@@ -76,30 +69,17 @@ def get_race_input(season, round_no, circuit_code):
 # Compute form based only on same season
 
 def compute_form(df_input, race_date, df_hist_season):
-    forms = []
-
-    for _, row in df_input.iterrows():
-        driver = row['driver']
-        constructor = row['constructor']
-
-        driver_past = df_hist_season[(df_hist_season['driver'] == driver) & (df_hist_season['date'] < race_date)].sort_values('date')
-        constructor_past = df_hist_season[(df_hist_season['constructor'] == constructor) & (df_hist_season['date'] < race_date)].sort_values('date')
-
-        driver_form = driver_past['position'].rolling(3).mean().iloc[-1] if len(driver_past) >= 3 else None
-        constructor_form = constructor_past['position'].rolling(3).mean().iloc[-1] if len(constructor_past) >= 3 else None
-
-        forms.append((driver_form, constructor_form))
-
-    df_input['driver_form'] = [f[0] for f in forms]
-    df_input['constructor_form'] = [f[1] for f in forms]
+    forms = FormEngine(df_hist_season).compute(df_input[['driver', 'constructor']], race_date)
+    df_input['driver_form'] = forms['driver_form'].values
+    df_input['constructor_form'] = forms['constructor_form'].values
 
     # Fill missing values
-    df_input['driver_form'].fillna(10.0, inplace=True)
-    df_input['constructor_form'].fillna(10.0, inplace=True)
+    df_input['driver_form'] = df_input['driver_form'].fillna(FALLBACK_FORM)
+    df_input['constructor_form'] = df_input['constructor_form'].fillna(FALLBACK_FORM)
 
     fallback_time = df_input['qualifying_time'].max()
     fallback_time = fallback_time + 2 if pd.notnull(fallback_time) else 100.0
-    df_input['qualifying_time'].fillna(fallback_time, inplace=True)
+    df_input['qualifying_time'] = df_input['qualifying_time'].fillna(fallback_time)
 
     # Recalculate grid advantage
     df_input['grid_advantage'] = df_input['grid'] - df_input['driver_form']
@@ -108,13 +88,9 @@ def compute_form(df_input, race_date, df_hist_season):
 
 # Predict positions and assign unique finish order
 
-def predict_race(df_features):
-    X = df_features[[
-        'grid', 'driver_form', 'constructor_form',
-        'circuit_encoded', 'grid_advantage', 'qualifying_time'
-    ]]
-
-    df_features['predicted_position'] = model.predict(X)
+def predict_race(df_features, model):
+    # The bundle picks its own feature columns, in training order
+    df_features['predicted_position'] = model.predict(df_features)
     df_sorted = df_features.sort_values('predicted_position')
     df_sorted['simulated_finish'] = range(1, len(df_sorted) + 1)
 
@@ -123,11 +99,22 @@ def predict_race(df_features):
 # -------------- MAIN ----------------------
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate a race from Ergast-style results and qualifying")
+    parser.add_argument('--season', type=int, default=SEASON)
+    parser.add_argument('--round', type=int, default=ROUND)
+    parser.add_argument('--model', default=MODEL_NAME, help="registry model name")
+    args = parser.parse_args()
+    SEASON, ROUND = args.season, args.round
+
+    # Load trained model and historical dataset (typed, dates already parsed)
+    model = load_bundle(args.model)
+    df_hist = load_features()
+
     # Get race date and circuit
     race_row = df_hist[(df_hist['season'] == SEASON) & (df_hist['round'] == ROUND)]
     race_date = pd.to_datetime(race_row['date'].values[0])
     circuit_name = race_row['circuit'].values[0]
-    circuit_code = encode_circuit(circuit_name, df_hist)
+    circuit_code = encode_circuit(circuit_name, load_index())
 
     # Filter past races only for the same season
     df_hist_season = df_hist[(df_hist['season'] == SEASON) & (df_hist['date'] < race_date)]
@@ -135,6 +122,10 @@ if __name__ == "__main__":
     # Get driver input and compute form
     race_df = get_race_input(SEASON, ROUND, circuit_code)
     race_df = compute_form(race_df, race_date, df_hist_season)
-    result_df = predict_race(race_df)
+
+    # The Ergast-style sources carry no weather; take the stored race weather
+    for col in ['air_temp', 'track_temp', 'humidity']:
+        race_df[col] = race_row[col].mean()
+    result_df = predict_race(race_df, model)
 
     print(result_df[['simulated_finish', 'driver', 'grid', 'predicted_position']])
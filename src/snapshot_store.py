@@ -0,0 +1,190 @@
+# 📦 snapshot_store.py
+# Precomputed per-round prediction snapshots: what the dashboard shows for a completed round, read from disk
+#
+#   python cli.py snapshot --seasons 2025               # every round with recorded results
+#   python cli.py snapshot --seasons 2024-2025 --model position --refresh
+#
+# A snapshot is one parquet file per (model version, season, round) holding the
+# prediction table with the actual results, error classes and chart order already
+# worked out; the race name and the round's metrics ride along in the file metadata.
+# Predictions of a finished round never change for a given model version, so the
+# job only builds snapshots that are missing: a new model version or a newly
+# recorded round. Re-recorded results (e.g. a post-race penalty) drop the round's
+# snapshots so they are rebuilt on the next run.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from actuals_store import load_actuals, save_metrics, score_round
+
+# === Config ===
+SNAPSHOT_DIR = '../data/snapshots'
+ERROR_PALETTE = {
+    'Accurate (±1)': 'green',
+    'Close (±3)': 'orange',
+    'Off (>3)': 'red',
+    'DNF / unclassified': 'grey',
+}
+ERROR_COLUMNS = ['simulated_finish', 'driver', 'grid', 'actual_position', 'status', 'dnf', 'error', 'error_class']
+CHART_COLUMNS = ['driver', 'predicted_position', 'actual_position', 'error_class']
+
+
+def error_class(errors):
+    """Bucket simulated-vs-actual errors for the chart colours (NaN: no classified finish)."""
+    errors = pd.Series(errors, dtype='float64').abs()
+    classes = np.select([errors.isna(), errors <= 1, errors <= 3],
+                        ['DNF / unclassified', 'Accurate (±1)', 'Close (±3)'], 'Off (>3)')
+    return pd.Series(classes, index=errors.index)
+
+
+class Snapshot:
+    """One precomputed round: prediction table plus its error and chart views."""
+
+    def __init__(self, model_key, season, round_no, race_name, prediction, metrics):
+        self.model_key = model_key
+        self.season = season
+        self.round_no = round_no
+        self.race_name = race_name
+        self.prediction = prediction
+        self.metrics = metrics
+
+    @property
+    def errors(self):
+        return self.prediction[[c for c in ERROR_COLUMNS if c in self.prediction.columns]]
+
+    @property
+    def chart(self):
+        # Rows in plot order: by actual finish, unclassified drivers last
+        return self.prediction.sort_values('chart_order')[CHART_COLUMNS].reset_index(drop=True)
+
+
+def make_snapshot(model_key, season, round_no, race_name, race_sorted):
+    """Snapshot of a simulated round (`PredictionService.simulate` output with actuals merged)."""
+    prediction = race_sorted.reset_index(drop=True).copy()
+    prediction['error_class'] = error_class(prediction['error']).values
+    order = np.argsort(prediction['actual_position'].values, kind='stable')  # NaN sorts last
+    prediction['chart_order'] = np.empty(len(order), dtype='int16')
+    prediction.loc[order, 'chart_order'] = np.arange(len(order), dtype='int16')
+    metrics = None
+    if prediction['actual_position'].notna().any():
+        metrics = score_round(prediction, season, round_no, race_name)
+    return Snapshot(model_key, season, round_no, race_name, prediction, metrics)
+
+
+# ---------------------- store ----------------------
+
+def snapshot_path(model_key, season, round_no, snapshot_dir=SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, model_key, f"{season}_{round_no:02d}.parquet")
+
+
+def save_snapshot(snapshot, snapshot_dir=SNAPSHOT_DIR):
+    path = snapshot_path(snapshot.model_key, snapshot.season, snapshot.round_no, snapshot_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(snapshot.prediction, preserve_index=False)
+    metrics = None if snapshot.metrics is None else {
+        k: v.item() if isinstance(v, np.generic) else v for k, v in snapshot.metrics.items()
+    }
+    meta = json.dumps({'race_name': snapshot.race_name, 'metrics': metrics})
+    table = table.replace_schema_metadata({**table.schema.metadata, b'snapshot': meta.encode()})
+    # Per-process temp file: the app and the snapshot job may write the same round
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_snapshot(model_key, season, round_no, snapshot_dir=SNAPSHOT_DIR):
+    """The stored snapshot of a round, or None if it was not built yet."""
+    path = snapshot_path(model_key, season, round_no, snapshot_dir)
+    if not os.path.exists(path):
+        return None
+    table = pq.read_table(path)
+    meta = json.loads(table.schema.metadata[b'snapshot'])
+    return Snapshot(model_key, season, round_no, meta['race_name'], table.to_pandas(), meta['metrics'])
+
+
+def stored_snapshots(model_key, snapshot_dir=SNAPSHOT_DIR):
+    directory = os.path.join(snapshot_dir, model_key)
+    if not os.path.isdir(directory):
+        return set()
+    names = (name[:-len('.parquet')] for name in os.listdir(directory) if name.endswith('.parquet'))
+    return {tuple(int(part) for part in name.split('_')) for name in names}
+
+
+def drop_snapshots(season, round_no, snapshot_dir=SNAPSHOT_DIR):
+    # Results of a round changed: every model's snapshot of it is stale
+    if not os.path.isdir(snapshot_dir):
+        return
+    for model_key in os.listdir(snapshot_dir):
+        path = snapshot_path(model_key, season, round_no, snapshot_dir)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# ---------------------- build ----------------------
+
+def snapshot_round(service, season, round_no, snapshot_dir=SNAPSHOT_DIR):
+    """Simulate one round with `service`; stored (with its metrics) only once the race is classified."""
+    race_name, race_sorted = service.simulate(season, round_no)
+    snapshot = make_snapshot(service.model_key, season, round_no, race_name, race_sorted)
+    if snapshot.metrics is not None:
+        save_snapshot(snapshot, snapshot_dir)
+        save_metrics(service.model_key, [snapshot.metrics])
+    return snapshot
+
+
+def build_snapshots(seasons, rounds=None, model_name=None, refresh=False, snapshot_dir=SNAPSHOT_DIR, services=None):
+    """Build the missing snapshots of every round with recorded results; returns the (season, round) keys built.
+
+    `services` maps a season to the PredictionService to use (one per season is
+    created otherwise, with the same history window as the dashboard / live mode).
+    """
+    from model_registry import load_bundle
+    from prediction_service import HISTORY_SEASONS, MODEL_NAME, PredictionService, RaceDataUnavailable
+
+    model = load_bundle(model_name or MODEL_NAME)
+    model_key = f"{model.name}@{model.version}"
+    done = set() if refresh else stored_snapshots(model_key, snapshot_dir)
+    services = dict(services or {})
+    recorded = load_actuals(seasons)[['season', 'round']].drop_duplicates()
+    built = []
+    for season in seasons:
+        targets = rounds or sorted(recorded.loc[recorded['season'] == season, 'round'].astype(int))
+        for round_no in targets:
+            if (season, round_no) in done:
+                continue
+            # The service (history, form index) is only loaded once something has to be built
+            if season not in services:
+                history = HISTORY_SEASONS if season in HISTORY_SEASONS else [season - 1, season]
+                services[season] = PredictionService(model_name=model.name, history_seasons=history)
+            service = services[season]
+            try:
+                snapshot = snapshot_round(service, season, round_no, snapshot_dir)
+            except RaceDataUnavailable:
+                print(f"⚠️ {season} round {round_no}: not available, skipped")
+                continue
+            if snapshot.metrics is not None:
+                built.append((season, round_no))
+    return built
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from ranges import parse_range
+
+    parser = argparse.ArgumentParser(description="Precompute dashboard snapshots of completed rounds")
+    parser.add_argument('--seasons', default='2025')
+    parser.add_argument('--rounds', default=None, help="e.g. 1-8 (default: every round with recorded results)")
+    parser.add_argument('--model', default='position')
+    parser.add_argument('--refresh', action='store_true', help="rebuild snapshots that already exist")
+    args = parser.parse_args()
+
+    built = build_snapshots(parse_range(args.seasons), parse_range(args.rounds) if args.rounds else None,
+                            args.model, args.refresh)
+    print(f"✅ Built {len(built)} snapshot(s) in {SNAPSHOT_DIR}")
@@ -0,0 +1,182 @@
+# 📦 train.py
+# Train the finishing-position model on store features and register it as a new bundle
+#
+# Hyperparameters are picked by rolling-origin cross-validation: every fold trains on
+# the races before an origin and is scored on the races right after it, so no fold
+# ever sees its own future. Early stopping watches the last races of the training
+# window, never the races a fold is scored on. Candidates run in parallel threads on
+# shared, pre-binned fold matrices.
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from backtest import build_backtest_frame
+from model_registry import save_bundle
+from ranges import parse_range
+
+# === Config ===
+MODEL_NAME = 'position'
+SEASONS = [2024, 2025]
+FEATURES = [
+    'grid', 'driver_form', 'constructor_form',
+    'circuit_encoded', 'grid_advantage', 'qualifying_time',
+    'air_temp', 'track_temp', 'humidity'
+]
+REQUIRED_COLUMNS = ['position', 'grid', 'qualifying_time', 'driver_form', 'constructor_form', 'circuit_encoded']
+
+# Rolling-origin CV: N_FOLDS origins, each validated on the next HORIZON races and
+# early-stopped on the STOP_HORIZON races before the origin
+N_FOLDS = 4
+HORIZON = 2
+STOP_HORIZON = 2
+MAX_BIN = 256
+MAX_ROUNDS = 500
+EARLY_STOPPING = 25
+
+BASE_PARAMS = dict(objective='reg:squarederror', eval_metric='mae', tree_method='hist', max_bin=MAX_BIN, seed=42)
+PARAM_GRID = {
+    'learning_rate': [0.05, 0.1],
+    'max_depth': [3, 4, 6],
+    'min_child_weight': [1, 5],
+    'subsample': [0.8, 1.0],
+    'colsample_bytree': [0.8, 1.0],
+}
+N_CANDIDATES = 16
+
+
+def sample_weights(df):
+    # 2025 = 1.0, 2024 weighted by round (0.8 / 0.5 / 0.2, then dropped), other seasons 1.0
+    rnd = df['round'].values
+    weights_2024 = np.select([rnd <= 3, rnd <= 6, rnd <= 9], [0.8, 0.5, 0.2], default=0.0)
+    return np.where(df['season'].values == 2024, weights_2024, 1.0)
+
+
+def load_training_frame(seasons=SEASONS):
+    # Same as-of features the simulators build at prediction time
+    df = build_backtest_frame(seasons)
+    df = df.dropna(subset=REQUIRED_COLUMNS)
+    df['sample_weight'] = sample_weights(df)
+    df = df[df['sample_weight'] > 0.0]
+    return df.sort_values(['date', 'season', 'round'], kind='mergesort').reset_index(drop=True)
+
+
+# ---------------------- cross-validation ----------------------
+
+def rolling_origin_folds(df, n_folds=N_FOLDS, horizon=HORIZON, stop_horizon=STOP_HORIZON):
+    """(fit_rows, stop_rows, valid_rows) per origin, oldest first; races are ordered by date."""
+    races = df[['season', 'round']].drop_duplicates()
+    race_idx = pd.MultiIndex.from_frame(df[['season', 'round']]).map(
+        {key: i for i, key in enumerate(races.itertuples(index=False, name=None))}
+    ).values
+    n_races = len(races)
+    origins = [n_races - horizon * k for k in range(n_folds, 0, -1)]
+    return [
+        (np.flatnonzero(race_idx < origin - stop_horizon),
+         np.flatnonzero((race_idx >= origin - stop_horizon) & (race_idx < origin)),
+         np.flatnonzero((race_idx >= origin) & (race_idx < origin + horizon)))
+        for origin in origins if origin > stop_horizon
+    ]
+
+
+class FoldCache:
+    """Binned fit / stop / valid matrices per fold, built once and shared by every candidate.
+
+    The quantile sketch is computed a single time over all rows (features only, no
+    labels); each fold matrix reuses those cut points through `ref=`, so no fold or
+    candidate sketches the data again.
+    """
+
+    def __init__(self, df, folds, features=FEATURES):
+        X = df[features]
+        y = df['position'].values
+        w = df['sample_weight'].values
+        self.reference = xgb.QuantileDMatrix(X, max_bin=MAX_BIN)
+        self.folds = []
+        for fit, stop, valid in folds:
+            dtrain = xgb.QuantileDMatrix(X.iloc[fit], y[fit], weight=w[fit], ref=self.reference)
+            # XGBoost wants the eval matrices to reference the training one (same cuts)
+            dstop = xgb.QuantileDMatrix(X.iloc[stop], y[stop], ref=dtrain)
+            dvalid = xgb.QuantileDMatrix(X.iloc[valid], ref=dtrain)
+            self.folds.append((dtrain, dstop, dvalid, y[valid]))
+
+
+def candidate_params(n_candidates=N_CANDIDATES, seed=42):
+    grid = [dict(zip(PARAM_GRID, values)) for values in itertools.product(*PARAM_GRID.values())]
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(grid), size=min(n_candidates, len(grid)), replace=False)
+    return [grid[i] for i in sorted(picks)]
+
+
+def evaluate(params, cache, nthread=1):
+    """Mean validation MAE and early-stopped round count of one candidate over all folds.
+
+    Each fold stops on its stop slice and is scored on validation races it never saw.
+    """
+    scores, rounds = [], []
+    for dtrain, dstop, dvalid, y_valid in cache.folds:
+        booster = xgb.train(
+            {**BASE_PARAMS, **params, 'nthread': nthread}, dtrain, num_boost_round=MAX_ROUNDS,
+            evals=[(dstop, 'stop')], early_stopping_rounds=EARLY_STOPPING, verbose_eval=False,
+        )
+        predicted = booster.predict(dvalid, iteration_range=(0, booster.best_iteration + 1))
+        scores.append(float(np.mean(np.abs(predicted - y_valid))))
+        rounds.append(booster.best_iteration + 1)
+    return {'params': params, 'mae': float(np.mean(scores)), 'fold_mae': scores, 'rounds': int(np.mean(rounds))}
+
+
+def search(cache, candidates, workers=None):
+    """Evaluate every candidate in parallel; XGBoost releases the GIL while it trains."""
+    workers = min(workers or os.cpu_count() or 1, len(candidates))
+    nthread = max(1, (os.cpu_count() or 1) // workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda params: evaluate(params, cache, nthread), candidates))
+    return sorted(results, key=lambda r: r['mae'])
+
+
+# ---------------------- train ----------------------
+
+def train(seasons=SEASONS, model_name=MODEL_NAME, n_candidates=N_CANDIDATES, workers=None):
+    start = time.perf_counter()
+    print("📥 Loading training data...")
+    df = load_training_frame(seasons)
+    folds = rolling_origin_folds(df)
+    print(f"✅ {len(df)} rows, {df[['season', 'round']].drop_duplicates().shape[0]} races, {len(folds)} CV folds")
+
+    cache = FoldCache(df, folds)
+    results = search(cache, candidate_params(n_candidates), workers)
+    best = results[0]
+    print("\n📊 Rolling-origin CV (top 3):")
+    for r in results[:3]:
+        print(f"MAE {r['mae']:.2f}  rounds {r['rounds']:3d}  {r['params']}")
+
+    # Final model on every row with the best candidate and its early-stopped length
+    model = xgb.XGBRegressor(
+        n_estimators=best['rounds'], tree_method='hist', max_bin=MAX_BIN, n_jobs=-1, random_state=42, **best['params']
+    )
+    model.fit(df[FEATURES], df['position'], sample_weight=df['sample_weight'])
+
+    bundle = save_bundle(model, model_name, FEATURES, metadata={
+        'seasons': list(seasons), 'rows': len(df), 'params': {**best['params'], 'n_estimators': best['rounds']},
+        'cv': {'folds': len(folds), 'horizon': HORIZON, 'stop_horizon': STOP_HORIZON,
+               'mae': best['mae'], 'fold_mae': best['fold_mae']},
+        'xgboost': xgb.__version__,
+    })
+    print(f"💾 Registered {bundle} in {time.perf_counter() - start:.1f}s")
+    return bundle
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and register the finishing-position model")
+    parser.add_argument('--seasons', default='2024-2025')
+    parser.add_argument('--model', default=MODEL_NAME, help="registry model name")
+    parser.add_argument('--candidates', type=int, default=N_CANDIDATES)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    train(parse_range(args.seasons), args.model, args.candidates, args.workers)
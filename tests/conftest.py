@@ -0,0 +1,16 @@
+# Tests run against the modules in src/, from src/ (the scripts use ../data paths)
+import os
+import sys
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def in_src():
+    cwd = os.getcwd()
+    os.chdir(SRC_DIR)
+    yield
+    os.chdir(cwd)
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from actuals_store import _same, actuals_from_rounds, record_actuals
+
+
+def recorded():
+    return actuals_from_rounds(pd.DataFrame({
+        'season': 2025, 'round': 1, 'driver': ['A', 'B', 'C'], 'constructor': ['X', 'X', 'Y'],
+        'grid': [1.0, 2.0, 3.0], 'position': [2.0, 1.0, np.nan], 'status': ['Finished', 'Finished', 'Engine'],
+    }))
+
+
+def test_same_ignores_dtype_and_row_order():
+    new = recorded()
+    old = new.sample(frac=1, random_state=0).astype({'grid': 'Int64', 'status': 'category'})
+    old['time_penalty'] = None
+    assert _same(old, new)
+
+
+def test_same_sees_real_changes():
+    new = recorded()
+    assert not _same(new.assign(time_penalty=[0.0, 5.0, 0.0]), new)
+    assert not _same(new.assign(status=['Finished', 'Finished', 'Collision']), new)
+    assert not _same(new.iloc[:2], new)
+
+
+def test_record_skips_unchanged_rounds(tmp_path):
+    dirs = dict(store_dir=tmp_path / 'actuals', metrics_dir=tmp_path / 'metrics', snapshot_dir=tmp_path / 'snapshots')
+    assert record_actuals(recorded(), **dirs) == [(2025, 1)]
+    assert record_actuals(recorded(), **dirs) == []
+    assert record_actuals(recorded().assign(time_penalty=[0.0, 5.0, 0.0]), **dirs) == [(2025, 1)]
@@ -0,0 +1,56 @@
+import math
+
+import pytest
+
+from api import BadRequest, parse_race
+
+
+def body(**entry):
+    row = {'driver': 'Max Verstappen', 'grid': 1, 'qualifying_time': 84.9, **entry}
+    return {'season': 2025, 'round': 9, 'grid': [row]}
+
+
+def test_valid_body():
+    race = parse_race(dict(body(air_temp=24.0), race_date='2025-06-29'))
+    assert (race.season, race.round_no, str(race.race_date.date())) == (2025, 9, '2025-06-29')
+    driver, constructor, grid, quali, air, track, humidity = race.rows[0]
+    assert (driver, constructor, grid, quali, air) == ('Max Verstappen', None, 1.0, 84.9, 24.0)
+    assert math.isnan(track) and math.isnan(humidity)
+
+
+@pytest.mark.parametrize('entry', [
+    {'grid': float('nan')},
+    {'grid': float('inf')},
+    {'qualifying_time': float('-inf')},
+    {'grid': 1.5},
+    {'grid': '1'},
+    {'grid': True},
+    {'humidity': 'humid'},
+    {'driver': 33},
+    {'grid': None},
+    {'qualifying_time': None},
+])
+def test_bad_entries_are_rejected(entry):
+    with pytest.raises(BadRequest):
+        parse_race(body(**entry))
+
+
+@pytest.mark.parametrize('bad', [
+    [],
+    {'season': 2025},
+    {'season': 2025, 'round': 9, 'grid': []},
+    {'season': 2025, 'round': 9, 'grid': ['Max Verstappen']},
+    {'season': 'next', 'round': 9, 'grid': [{}]},
+    dict(body(), race_date='not a date'),
+])
+def test_bad_bodies_are_rejected(bad):
+    with pytest.raises(BadRequest):
+        parse_race(bad)
+
+
+def test_cache_key_ignores_grid_order():
+    first = {'driver': 'A', 'grid': 1, 'qualifying_time': 80.0}
+    second = {'driver': 'B', 'grid': 2, 'qualifying_time': 80.5}
+    key = parse_race({'season': 2025, 'round': 9, 'grid': [first, second]}).key
+    assert parse_race({'season': 2025, 'round': 9, 'grid': [second, first]}).key == key
+    assert parse_race({'season': 2025, 'round': 9, 'grid': [first, dict(second, grid=3)]}).key != key
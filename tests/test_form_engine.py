@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_store import load_features
+from form_engine import FormEngine
+from form_kernel import FALLBACK_FORM, FORM_WINDOW
+
+
+@pytest.fixture(scope='module')
+def history():
+    df = load_features(columns=['season', 'round', 'date', 'circuit', 'driver', 'constructor', 'position'],
+                       seasons=[2024, 2025])
+    for col in ['circuit', 'driver', 'constructor']:
+        df[col] = df[col].astype(object)
+    return df
+
+
+def reference_forms(drivers, race_date, history):
+    # The original per-driver loop: mean of the last FORM_WINDOW results strictly before the race
+    driver_forms, constructor_forms = [], []
+    for driver in drivers:
+        rows = history[history['driver'] == driver].sort_values('date', kind='mergesort')
+        upto = rows[rows['date'] <= race_date]
+        constructor = (upto['constructor'].values[-1] if len(upto) else rows['constructor'].values[0]) if len(rows) else None
+        past_driver = rows[rows['date'] < race_date]
+        past_constructor = history[(history['constructor'] == constructor) & (history['date'] < race_date)]
+        past_constructor = past_constructor.sort_values('date', kind='mergesort')
+        driver_forms.append(past_driver['position'].iloc[-FORM_WINDOW:].mean()
+                            if len(past_driver) >= FORM_WINDOW else FALLBACK_FORM)
+        constructor_forms.append(past_constructor['position'].iloc[-FORM_WINDOW:].mean()
+                                 if len(past_constructor) >= FORM_WINDOW else FALLBACK_FORM)
+    return np.array(driver_forms), np.array(constructor_forms)
+
+
+def test_forms_match_reference_loop(history):
+    engine = FormEngine(history)
+    drivers = pd.DataFrame({'driver': list(history['driver'].unique()) + ['Nobody']})
+    mismatches = []
+    for season, round_no in history[['season', 'round']].drop_duplicates().itertuples(index=False):
+        race_date = engine.race_date(season, round_no)
+        expected_driver, expected_constructor = reference_forms(drivers['driver'], race_date, history)
+        got = engine.compute(drivers, race_date)
+        if not (np.allclose(got['driver_form'].values, expected_driver, equal_nan=True)
+                and np.allclose(got['constructor_form'].values, expected_constructor, equal_nan=True)):
+            mismatches.append((season, round_no))
+    assert mismatches == []
+
+
+def test_batch_matches_single_races(history):
+    engine = FormEngine(history)
+    batch = engine.compute_batch(history[['season', 'round', 'driver']])
+    for (season, round_no), race in batch.groupby(['season', 'round']):
+        single = engine.compute(race[['driver']], engine.race_date(season, round_no))
+        np.testing.assert_allclose(single['driver_form'].values, race['driver_form'].values)
+        np.testing.assert_allclose(single['constructor_form'].values, race['constructor_form'].values)
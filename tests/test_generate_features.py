@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from generate_2024_features import add_features, empty_state, load_rounds, write_rows
+
+
+@pytest.fixture(scope='module')
+def rounds():
+    return load_rounds([2024])
+
+
+def test_incremental_build_matches_full(rounds, tmp_path):
+    full_csv, incremental_csv = tmp_path / 'full.csv', tmp_path / 'incremental.csv'
+    write_rows(add_features(rounds, empty_state(), []), full_csv, append=False)
+
+    # Round by round, carrying the state and the circuit vocabulary between runs
+    state, circuits = empty_state(), []
+    for i, round_no in enumerate(sorted(rounds['round'].unique())):
+        batch = rounds[rounds['round'] == round_no].reset_index(drop=True)
+        write_rows(add_features(batch, state, circuits), incremental_csv, append=i > 0)
+
+    assert incremental_csv.read_bytes() == full_csv.read_bytes()
+    assert len(pd.read_csv(full_csv)) == len(rounds)
+
+
+def test_state_survives_a_json_round_trip(rounds, tmp_path):
+    import json
+
+    first, rest = rounds[rounds['round'] <= 5], rounds[rounds['round'] > 5].reset_index(drop=True)
+    state, circuits = empty_state(), []
+    add_features(first, state, circuits)
+    resumed = json.loads(json.dumps(state))
+
+    expected = add_features(rest, state, list(circuits))
+    got = add_features(rest, resumed, list(circuits))
+    pd.testing.assert_frame_equal(got, expected)
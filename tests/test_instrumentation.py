@@ -0,0 +1,35 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import span, trace
+
+
+def test_span_depth_in_worker_threads():
+    def stage(name):
+        with span(name):
+            with span(f'{name}.inner'):
+                pass
+
+    with trace('test', profile=False, memory=False, log_path=None) as t:
+        with span('outer'):
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                futures = [pool.submit(contextvars.copy_context().run, stage, f's{i}') for i in range(4)]
+                [f.result() for f in futures]
+
+    depths = {s['span']: s['depth'] for s in t.spans}
+    assert depths['outer'] == 0
+    assert all(depths[f's{i}'] == 1 and depths[f's{i}.inner'] == 2 for i in range(4))
+
+
+def test_concurrent_profiled_traces():
+    barrier = threading.Barrier(3)
+
+    def run(i):
+        with trace(f'test{i}', profile=True, memory=False, log_path=None) as t:
+            barrier.wait()
+        return t.profile
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        profiles = list(pool.map(run, range(3)))
+    assert sum(p.startswith('skipped') for p in profiles) == 2
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from model_registry import SchemaMismatch, list_versions, load_bundle, save_bundle
+
+FEATURES = ['grid', 'driver_form', 'qualifying_time']
+
+
+def fit_model(columns):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(40, len(columns))), columns=columns)
+    return xgb.XGBRegressor(n_estimators=5, max_depth=2).fit(X, rng.normal(size=40))
+
+
+def test_save_rejects_model_trained_on_other_features(tmp_path):
+    with pytest.raises(SchemaMismatch, match='trained on'):
+        save_bundle(fit_model(FEATURES[::-1]), 'position', FEATURES, circuits=[], registry_dir=tmp_path)
+    assert list_versions('position', tmp_path) == []
+
+
+def test_versions_and_latest(tmp_path):
+    save_bundle(fit_model(FEATURES), 'position', FEATURES, circuits=[], registry_dir=tmp_path)
+    assert load_bundle('position', registry_dir=tmp_path).version == 'v1'
+    save_bundle(fit_model(FEATURES), 'position', FEATURES, circuits=[], registry_dir=tmp_path)
+    assert list_versions('position', tmp_path) == ['v1', 'v2']
+    assert load_bundle('position', registry_dir=tmp_path).version == 'v2'
+    assert load_bundle('position', 'v1', registry_dir=tmp_path).version == 'v1'
+
+
+def test_validate_orders_columns_and_fails_fast(tmp_path):
+    bundle = save_bundle(fit_model(FEATURES), 'position', FEATURES, circuits=[], registry_dir=tmp_path)
+    X = pd.DataFrame({'qualifying_time': [80.1, 81.2], 'driver': ['A', 'B'], 'grid': [1, 2], 'driver_form': [3.0, 4.0]})
+
+    validated = bundle.validate(X)
+    assert list(validated.columns) == FEATURES
+    assert (validated.dtypes == 'float64').all()
+    np.testing.assert_array_equal(bundle.predict(X), bundle.predict(X[FEATURES]))
+
+    with pytest.raises(SchemaMismatch, match='missing features'):
+        bundle.validate(X.drop(columns='driver_form'))
+    with pytest.raises(SchemaMismatch, match='non-numeric'):
+        bundle.validate(X.assign(grid=['P1', 'P2']))
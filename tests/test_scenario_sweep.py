@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from model_registry import save_bundle
+from scenario_sweep import build_axes, run_sweep
+from train import FEATURES
+
+N_DRIVERS = 12
+DRIVERS = [f"Driver {i}" for i in range(N_DRIVERS)]
+
+
+@pytest.fixture(scope='module')
+def model(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(400, len(FEATURES))), columns=FEATURES)
+    X['grid'] = rng.integers(1, 21, size=len(X))
+    X['driver_form'] = rng.uniform(1, 20, size=len(X))
+    X['grid_advantage'] = X['grid'] - X['driver_form']
+    y = X['grid'] + 0.5 * X['driver_form'] + 2 * X['humidity'] + rng.normal(size=len(X))
+    regressor = xgb.XGBRegressor(n_estimators=30, max_depth=3).fit(X, y)
+    return save_bundle(regressor, 'position', FEATURES, circuits=[], registry_dir=tmp_path_factory.mktemp('registry'))
+
+
+@pytest.fixture(scope='module')
+def race():
+    rng = np.random.default_rng(1)
+    race = pd.DataFrame({'driver': DRIVERS, 'grid': np.arange(1, N_DRIVERS + 1)})
+    for column in FEATURES:
+        if column not in race.columns:
+            race[column] = rng.normal(size=N_DRIVERS)
+    race['driver_form'] = rng.uniform(1, 20, size=N_DRIVERS)
+    race['grid_advantage'] = race['grid'] - race['driver_form']
+    return race
+
+
+def naive_places(model, race, axes, scenario):
+    # One scenario at a time: perturb a copy of the race, score every row, rank
+    arrays = {col: race[col].to_numpy(dtype=np.float64)[None, :].copy() for col in FEATURES}
+    arrays['grid'] = race['grid'].to_numpy(dtype=np.int16)[None, :].copy()
+    if axes:
+        digits = np.unravel_index([scenario], [axis.size for axis in axes])
+        for axis, picks in zip(axes, digits):
+            axis.apply(arrays, np.asarray(picks))
+    arrays['grid_advantage'] = arrays['grid'] - arrays['driver_form']
+    predicted = model.predict(pd.DataFrame({col: arrays[col][0].astype(np.float64) for col in FEATURES}))
+    places = np.empty(len(race), dtype=np.int16)
+    places[np.argsort(predicted, kind='stable')] = np.arange(1, len(race) + 1)
+    return places
+
+
+AXES = [
+    dict(penalties=['Driver 0:0,3,5'], weather={'humidity': '-1,0,1', 'air_temp': ''},
+         form_shifts=['Driver 2:-2:2:1']),
+    dict(permute_top=4, quali_delta='-1,0,1', form_shifts=['Driver 5:0,3']),
+    dict(permute_top=3, penalties=['Driver 1:0,2', 'Driver 7:0,10'], weather={'track_temp': '20:40:10'}),
+    dict(),
+]
+
+
+@pytest.mark.parametrize('axes_args', AXES)
+@pytest.mark.parametrize('chunk_rows', [50, 500_000])
+def test_sweep_matches_naive_scoring(model, race, axes_args, chunk_rows):
+    axes = build_axes(race['driver'].values, **axes_args)
+    result = run_sweep(model, race, axes, chunk_rows)
+
+    n_scenarios = int(np.prod([axis.size for axis in axes])) if axes else 1
+    assert result.places.shape == (n_scenarios, N_DRIVERS)
+    np.testing.assert_array_equal(result.baseline, naive_places(model, race, [], 0))
+
+    rng = np.random.default_rng(2)
+    for scenario in rng.choice(n_scenarios, size=min(n_scenarios, 40), replace=False):
+        np.testing.assert_array_equal(result.places[scenario], naive_places(model, race, axes, scenario))
+
+
+def test_penalty_and_permutation_keep_a_valid_grid(model, race):
+    axes = build_axes(race['driver'].values, permute_top=3, penalties=['Driver 1:0,2,20'])
+    for scenario in range(int(np.prod([axis.size for axis in axes]))):
+        arrays = {'grid': race['grid'].to_numpy(dtype=np.int16)[None, :].copy()}
+        for axis, picks in zip(axes, np.unravel_index([scenario], [axis.size for axis in axes])):
+            axis.apply(arrays, np.asarray(picks))
+        assert sorted(arrays['grid'][0]) == list(range(1, N_DRIVERS + 1))
+
+
+def test_axes_on_unused_columns_are_rejected(tmp_path, race):
+    features = ['grid', 'qualifying_time']
+    rng = np.random.default_rng(3)
+    X = pd.DataFrame({'grid': rng.integers(1, 21, size=100), 'qualifying_time': rng.normal(size=100)})
+    small = save_bundle(xgb.XGBRegressor(n_estimators=10, max_depth=2).fit(X, X['grid']), 'small', features,
+                        circuits=[], registry_dir=tmp_path)
+
+    with pytest.raises(ValueError, match="'humidity'"):
+        build_axes(race['driver'].values, weather={'humidity': '40,60'}, features=small.features)
+    with pytest.raises(ValueError, match="'driver_form'"):
+        build_axes(race['driver'].values, form_shifts=['Driver 2:-1,1'], features=small.features)
+
+    # Without grid_advantage / driver_form in the model the grid axes still sweep
+    axes = build_axes(race['driver'].values, permute_top=3, quali_delta='-1,0,1', features=small.features)
+    result = run_sweep(small, race[['driver'] + features], axes)
+    assert result.places.shape == (18, N_DRIVERS)
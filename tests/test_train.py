@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from train import rolling_origin_folds
+
+
+@pytest.fixture
+def races():
+    # Two seasons of 12 races, 5 rows each, in date order
+    keys = [(season, round_no) for season in (2024, 2025) for round_no in range(1, 13)]
+    return pd.DataFrame([(s, r, d) for s, r in keys for d in range(5)], columns=['season', 'round', 'driver'])
+
+
+def race_index(df, rows):
+    return set(map(tuple, df.iloc[rows][['season', 'round']].values))
+
+
+@pytest.mark.parametrize('n_folds,horizon,stop_horizon', [(4, 2, 2), (3, 1, 3), (6, 3, 1)])
+def test_folds_are_disjoint_and_time_ordered(races, n_folds, horizon, stop_horizon):
+    order = {key: i for i, key in enumerate(races[['season', 'round']].drop_duplicates().itertuples(index=False, name=None))}
+    folds = rolling_origin_folds(races, n_folds, horizon, stop_horizon)
+    assert len(folds) == n_folds
+
+    for fit, stop, valid in folds:
+        assert not set(fit) & set(stop) and not set(fit) & set(valid) and not set(stop) & set(valid)
+        fit_races, stop_races, valid_races = (race_index(races, rows) for rows in (fit, stop, valid))
+        assert len(stop_races) == stop_horizon and len(valid_races) == horizon
+        assert max(order[k] for k in fit_races) < min(order[k] for k in stop_races)
+        assert max(order[k] for k in stop_races) < min(order[k] for k in valid_races)
+
+    # Origins move forward and the last fold is scored on the final races
+    valid_starts = [races.iloc[valid[0]][['season', 'round']].tolist() for _, _, valid in folds]
+    assert valid_starts == sorted(valid_starts)
+    assert folds[-1][2][-1] == len(races) - 1
+
+
+def test_folds_without_enough_history_are_dropped(races):
+    few = races[races['season'] == 2024].head(5 * 4)
+    assert all(len(fit) for fit, _, _ in rolling_origin_folds(few, n_folds=4, horizon=1, stop_horizon=1))
+    assert len(rolling_origin_folds(few, n_folds=4, horizon=1, stop_horizon=1)) == 2